@@ -1,9 +1,17 @@
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
-from scipy.signal import butter, lfilter, find_peaks
+from scipy.signal import lfilter, find_peaks
 from pathlib import Path
 
+import sys
+
+# RingBuffer and pipeline_config are shared with the backend processor and live in
+# webdev/backend/common, so the scripts run from a full checkout of the repository
+sys.path.append(str(Path(__file__).resolve().parents[1] / "webdev" / "backend"))
+from common.RingBuffer import RingBuffer  # noqa: E402
+from common.pipeline_config import compile_pipeline  # noqa: E402
+
 # ==============================
 # CONFIG
 # ==============================
@@ -21,29 +29,53 @@ INPUT_CSV_FILE = "raw_data_8.csv"
 # raw_data_10    - target 100bpm, decrease over time
 
 
+# Filter chains and peak thresholds, see webdev/backend/common/pipeline_config.py
+PIPELINE = {
+    "chains": {
+        "heart": {
+            "filters": [
+                # MTI Highpass Filter
+                {"type": "highpass", "order": 3, "band": 0.3},
+                # Bandpass Filter: 48-150bpm range
+                {"type": "bandpass", "order": 6, "band": [0.8, 2.5]},
+            ],
+            "smoothing": 3,
+            "peaks": {"distance": 0.2, "prominence": 0.15},
+        },
+        "breath": {
+            "filters": [
+                # MTI Highpass filter
+                {"type": "highpass", "order": 3, "band": 0.07},
+                # Bandpass Filter: 4-24bpm range
+                {"type": "bandpass", "order": 3, "band": [0.07, 0.4]},
+            ],
+            "smoothing": 10,
+            "peaks": {"distance": 2.0, "prominence": 0.15},
+        },
+    }
+}
+
+
 # ==============================
 # SignalProcessor
 # ==============================
 class SignalProcessor:
     def __init__(self, sample_rate):
         self.sample_rate = sample_rate  # 15 frames per second
-        nyq = sample_rate / 2  # Nyquist rate
-
-        # Heart Filters
-        # MTI Highpass Filter
-        self.hp_b_heart, self.hp_a_heart = butter(3, 0.3 / nyq, "highpass")
-        # Bandpass Filter: 48-150bpm range
-        self.bp_b_heart, self.bp_a_heart = butter(6, [0.8 / nyq, 2.5 / nyq], "band")
 
-        # Breathing filters
-        # MTI Highpass filter
-        self.hp_b_breath, self.hp_a_breath = butter(3, 0.07 / nyq, "highpass")
-        # Bandpass Filter: 4-24bpm range
-        self.bp_b_breath, self.bp_a_breath = butter(3, [0.07 / nyq, 0.4 / nyq], "band")
+        # Filters of PIPELINE, designs are cached in pipeline_config
+        chains = compile_pipeline(PIPELINE, sample_rate)["chains"]
+        heart, breath = chains["heart"], chains["breath"]
+        (self.hp_b_heart, self.hp_a_heart), (self.bp_b_heart, self.bp_a_heart) = [
+            stage["ba"] for stage in heart["filters"]
+        ]
+        (self.hp_b_breath, self.hp_a_breath), (self.bp_b_breath, self.bp_a_breath) = [
+            stage["ba"] for stage in breath["filters"]
+        ]
 
         # Smoothing Window Kernels
-        self.kernel_heart = np.ones(3) / 3  # Window Size = 3
-        self.kernel_breath = np.ones(10) / 10  # Window Size = 10
+        self.kernel_heart = heart["kernel"]
+        self.kernel_breath = breath["kernel"]
 
     def process_signal_pipeline(self, raw_signal):
         # MTI (highpass)
@@ -120,7 +152,8 @@ frames = raw.reshape(NUM_FRAMES, NUM_CHIRPS, NUM_SAMPLES)
 processor = SignalProcessor(FRAME_RATE)
 
 # Create arrays for recording
-buffer = []
+# Rolling buffer (10 seconds)
+buffer = RingBuffer(FRAME_RATE * 10)
 heart_log = []
 breath_log = []
 time_log = []
@@ -132,13 +165,9 @@ for i, frame in enumerate(frames):
     # Add scalar to buffer
     buffer.append(scalar)
 
-    # Rolling buffer length (10 seconds)
-    if len(buffer) > FRAME_RATE * 10:
-        buffer.pop(0)
-
     # For heart rate and breathing rate:
     # Perform Signal Processing (MTI -> Bandpass -> Smoothing)
-    heart, breath = processor.process_signal_pipeline(np.array(buffer))
+    heart, breath = processor.process_signal_pipeline(buffer.window())
 
     # Log heart rate, breathing rate, and time
     heart_log.append(heart[-1])
@@ -177,7 +206,9 @@ def breathing_peak_detect(breath_filtered, fs_breath, window_sec=20):
         # This corresponds to max 30 breaths/min
         # prominence = 0.15 = minimum amplitude for peak detection = 0.15
         peaks, _ = find_peaks(
-            current_window, distance=int(2 * fs_breath), prominence=0.15
+            current_window,
+            distance=int(PIPELINE["chains"]["breath"]["peaks"]["distance"] * fs_breath),
+            prominence=PIPELINE["chains"]["breath"]["peaks"]["prominence"],
         )
         # Mumber of peaks
         num_breaths = len(peaks)
@@ -221,7 +252,11 @@ def heart_peak_detect(heart_filtered, fs_heart, window_sec=20):
 
         # Minimum distance between peaks = 0.4s = 1 sample at 2.5 Hz
         # This corresponds to max 150 bpm
-        peaks, _ = find_peaks(chunk, distance=int(0.2 * fs_heart), prominence=0.15)
+        peaks, _ = find_peaks(
+            chunk,
+            distance=int(PIPELINE["chains"]["heart"]["peaks"]["distance"] * fs_heart),
+            prominence=PIPELINE["chains"]["heart"]["peaks"]["prominence"],
+        )
 
         num_beats = int(len(peaks))
 
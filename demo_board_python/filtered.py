@@ -7,13 +7,21 @@ import argparse
 import matplotlib.pyplot as plt
 import numpy as np
 import time
-from scipy.signal import butter, filtfilt, find_peaks, welch, windows, lfilter
+from scipy.signal import filtfilt, find_peaks, welch, windows, lfilter
 from scipy import signal
 
 from ifxradarsdk import get_version_full
 from ifxradarsdk.fmcw import DeviceFmcw
 from ifxradarsdk.fmcw.types import FmcwSimpleSequenceConfig, FmcwMetrics
 from helpers.DopplerAlgo import *
+from pathlib import Path
+import sys
+
+# RingBuffer and pipeline_config are shared with the backend processor and live in
+# webdev/backend/common, so the scripts run from a full checkout of the repository
+sys.path.append(str(Path(__file__).resolve().parents[1] / "webdev" / "backend"))
+from common.RingBuffer import RingBuffer  # noqa: E402
+from common.pipeline_config import compile_pipeline  # noqa: E402
 
 
 # Definitions for websocket client
@@ -28,16 +36,30 @@ WEBSOCKET_URL = "wss://cradlewave-351958736605.us-central1.run.app/ws/data_handl
 # -------------------------------------------------
 
 
+# Filter chain of SignalProcessor, see webdev/backend/common/pipeline_config.py
+PIPELINE = {
+    "chains": {
+        "heart": {
+            "filters": [
+                {"type": "highpass", "order": 3, "band": 0.3},
+                {"type": "bandpass", "order": 6, "band": [0.8, 2.5]},
+            ],
+        },
+    }
+}
+
+
 class SignalProcessor:
     """Implements signal processing pipeline"""
 
     def __init__(self, sample_rate):
         self.sample_rate = sample_rate
         self.nyquist = sample_rate / 2
-        self.hp_b, self.hp_a = butter(3, 0.3 / self.nyquist, "highpass")
-        self.bp_b, self.bp_a = butter(
-            6, [0.8 / self.nyquist, 2.5 / self.nyquist], "band"
-        )
+        # Designs are cached in pipeline_config, shared by every SignalProcessor
+        heart = compile_pipeline(PIPELINE, sample_rate)["chains"]["heart"]
+        (self.hp_b, self.hp_a), (self.bp_b, self.bp_a) = [
+            stage["ba"] for stage in heart["filters"]
+        ]
         # self.window_size = max(3, int(0.5 * self.sample_rate))
 
     # 1
@@ -192,7 +214,8 @@ class RealTimePlot:
         self._window_duration = window_duration
         self._max_points = int(window_duration * frate)
 
-        self._filtered_values = []
+        # Keeps only recent data
+        self._filtered_values = RingBuffer(self._max_points)
         self._absolute_frame_count = 0
 
         plt.ion()
@@ -219,10 +242,6 @@ class RealTimePlot:
         self._filtered_values.append(filtered_value)
         self._absolute_frame_count += 1
 
-        # Keep only recent data
-        if len(self._filtered_values) > self._max_points:
-            self._filtered_values.pop(0)
-
         # Update time axis
         current_time = self._absolute_frame_count / self._frate
         start_time = max(0, current_time - self._window_duration)
@@ -230,12 +249,12 @@ class RealTimePlot:
         time_axis = np.linspace(start_time, current_time, len(self._filtered_values))
 
         # Update filtered signal plot
-        self._filtered_line.set_data(time_axis, self._filtered_values)
+        self._filtered_line.set_data(time_axis, self._filtered_values.window())
         self._ax.set_xlim(start_time, current_time)
 
         if len(self._filtered_values) > 0:
-            y_min = min(self._filtered_values)
-            y_max = max(self._filtered_values)
+            y_min = self._filtered_values.window().min()
+            y_max = self._filtered_values.window().max()
             y_margin = (y_max - y_min) * 0.1
             self._ax.set_ylim(y_min - y_margin, y_max + y_margin)
 
@@ -354,7 +373,8 @@ async def main():
             }
         )
 
-        raw_signal_buffer = []
+        # Latest samples: the whole collection phase, or the plot window if that is longer
+        raw_signal_buffer = RingBuffer(max(collect_frames, rt_plot._max_points))
 
         # Phase 1: Collect initial data
         for frame_number in range(collect_frames):
@@ -406,7 +426,7 @@ async def main():
         print(f"{'='*60}\n")
 
         # Process initial buffer
-        initial_result = processor.process_signal_pipeline(np.array(raw_signal_buffer))
+        initial_result = processor.process_signal_pipeline(raw_signal_buffer.window())
 
         # Initialize plot with processed data
         for filt in initial_result["smoothed"]:  # smoothed
@@ -455,11 +475,8 @@ async def main():
                     }
                 )
 
-                if len(raw_signal_buffer) > rt_plot._max_points:
-                    raw_signal_buffer.pop(0)
-
                 # Process signal
-                result = processor.process_signal_pipeline(np.array(raw_signal_buffer))
+                result = processor.process_signal_pipeline(raw_signal_buffer.window())
                 rt_plot.add_data(result["smoothed"][-1])  # smoothed
                 # print(f"Debug: Frame {frame_counter}, Filtered Value: {result['mti_filtered'][-1]:.3f}")
                 # Send the frame_countner and the result(and array with a couple different values) to backedn via websocket
@@ -8,7 +8,6 @@ import matplotlib.pyplot as plt
 import numpy as np
 import time
 from scipy.signal import (
-    butter,
     filtfilt,
     find_peaks,
     welch,
@@ -24,6 +23,14 @@ from ifxradarsdk import get_version_full
 from ifxradarsdk.fmcw import DeviceFmcw
 from ifxradarsdk.fmcw.types import FmcwSimpleSequenceConfig, FmcwMetrics
 from helpers.DopplerAlgo import *
+from pathlib import Path
+import sys
+
+# RingBuffer and pipeline_config are shared with the backend processor and live in
+# webdev/backend/common, so the scripts run from a full checkout of the repository
+sys.path.append(str(Path(__file__).resolve().parents[1] / "webdev" / "backend"))
+from common.RingBuffer import RingBuffer  # noqa: E402
+from common.pipeline_config import compile_pipeline  # noqa: E402
 
 from helpers.sock import WebSocketClient
 import asyncio
@@ -36,22 +43,44 @@ WEBSOCKET_URL = "wss://cradlewave-351958736605.us-central1.run.app/ws/data_handl
 # -------------------------------------------------
 
 
+# Filter chains of SignalProcessor, see webdev/backend/common/pipeline_config.py
+PIPELINE = {
+    "chains": {
+        "heart": {
+            "filters": [
+                {"type": "highpass", "order": 3, "band": 0.3},
+                {"type": "bandpass", "order": 6, "band": [0.8, 2.5]},
+            ],
+            "smoothing": 5,
+        },
+        "breath": {
+            "filters": [
+                {"type": "highpass", "order": 3, "band": 0.07},
+                {"type": "bandpass", "order": 3, "band": [0.07, 0.4]},
+            ],
+            "smoothing": 3,
+        },
+    }
+}
+
+
 class SignalProcessor:
     # Implements signal processing pipeline
 
     def __init__(self, sample_rate):
         self.sample_rate = sample_rate
         self.nyquist = sample_rate / 2
-        self.hp_b_heart, self.hp_a_heart = butter(3, 0.3 / self.nyquist, "highpass")
-        self.bp_b_heart, self.bp_a_heart = butter(
-            6, [0.8 / self.nyquist, 2.5 / self.nyquist], "band"
-        )
-        self.hp_b_breath, self.hp_a_breath = butter(3, 0.07 / self.nyquist, "highpass")
-        self.bp_b_breath, self.bp_a_breath = butter(
-            3, [0.07 / self.nyquist, 0.4 / self.nyquist], "band"
-        )
-        self.kernel_heart = np.ones(5) / 5
-        self.kernel_breath = np.ones(3) / 3
+        # Designs are cached in pipeline_config, shared by every SignalProcessor
+        chains = compile_pipeline(PIPELINE, sample_rate)["chains"]
+        heart, breath = chains["heart"], chains["breath"]
+        (self.hp_b_heart, self.hp_a_heart), (self.bp_b_heart, self.bp_a_heart) = [
+            stage["ba"] for stage in heart["filters"]
+        ]
+        (self.hp_b_breath, self.hp_a_breath), (self.bp_b_breath, self.bp_a_breath) = [
+            stage["ba"] for stage in breath["filters"]
+        ]
+        self.kernel_heart = heart["kernel"]
+        self.kernel_breath = breath["kernel"]
         # self.window_size = max(3, int(0.5 * self.sample_rate))
 
     # 1
@@ -239,7 +268,8 @@ class RealTimePlot:
         self._window_duration = window_duration
         self._max_points = int(window_duration * frate)
         
-        self._filtered_values = []
+        # Keeps only recent data
+        self._filtered_values = RingBuffer(self._max_points)
         self._absolute_frame_count = 0
         
         plt.ion()
@@ -265,10 +295,6 @@ class RealTimePlot:
         self._filtered_values.append(filtered_value)
         self._absolute_frame_count += 1
         
-        # Keep only recent data
-        if len(self._filtered_values) > self._max_points:
-            self._filtered_values.pop(0)
-        
         # Update time axis
         current_time = self._absolute_frame_count / self._frate
         start_time = max(0, current_time - self._window_duration)
@@ -276,12 +302,12 @@ class RealTimePlot:
         time_axis = np.linspace(start_time, current_time, len(self._filtered_values))
         
         # Update filtered signal plot
-        self._filtered_line.set_data(time_axis, self._filtered_values)
+        self._filtered_line.set_data(time_axis, self._filtered_values.window())
         self._ax.set_xlim(start_time, current_time)
         
         if len(self._filtered_values) > 0:
-            y_min = min(self._filtered_values)
-            y_max = max(self._filtered_values)
+            y_min = self._filtered_values.window().min()
+            y_max = self._filtered_values.window().max()
             y_margin = (y_max - y_min) * 0.1
             self._ax.set_ylim(y_min - y_margin, y_max + y_margin)
         
@@ -400,7 +426,8 @@ async def main():
             }
         )
 
-        raw_signal_buffer = []
+        # Latest samples: the whole collection phase, or 10 s if that is longer
+        raw_signal_buffer = RingBuffer(max(collect_frames, int(10 * 15)))
 
         # Phase 1: Collect initial data
         for frame_number in range(collect_frames):
@@ -443,7 +470,7 @@ async def main():
         print(f"{'='*60}\n")
 
         # Process initial buffer
-        # initial_result = processor.process_signal_pipeline(np.array(raw_signal_buffer))
+        # initial_result = processor.process_signal_pipeline(raw_signal_buffer.window())
 
         # Initialize plot with processed data
         # for filt in initial_result['bp_filtered']: # smoothed
@@ -487,11 +514,8 @@ async def main():
                     }
                 )
 
-                if len(raw_signal_buffer) > int(10 * 15):  # rt_plot._max_points:
-                    raw_signal_buffer.pop(0)
-
                 # Process signal
-                result = processor.process_signal_pipeline(np.array(raw_signal_buffer))
+                result = processor.process_signal_pipeline(raw_signal_buffer.window())
                 # rt_plot.add_data(result['bp_filtered'][-1]) # smoothed
 
                 frame_counter += 1
@@ -0,0 +1,63 @@
+# NOTE: This module is shared by the backend processor and the demo board scripts
+# (demo_board_python), which import it from this directory.
+
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Fixed-capacity buffer of the latest samples of a signal, for sliding windows.
+
+    Every sample is written twice, at its slot and one capacity further on, so the latest
+    samples are always one contiguous run of the backing array. append() is O(1) and
+    window() returns that run as a view, without the shift of an array or the pop(0) of a
+    list that make a sliding window O(window) per sample.
+    """
+
+    def __init__(self, capacity, dtype=float):
+        """
+        Parameters:
+            - capacity: Number of latest samples kept
+            - dtype: NumPy dtype of the samples
+        """
+        self.capacity = capacity
+        self._data = np.zeros(2 * capacity, dtype=dtype)
+        self._next = 0  # Slot of the next sample, in [0, capacity)
+        self._count = 0  # Samples held, at most capacity
+
+    def __len__(self):
+        return self._count
+
+    def append(self, value):
+        self._data[self._next] = value
+        self._data[self._next + self.capacity] = value
+        self._next = (self._next + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def extend(self, values):
+        """Appends a sequence of samples, O(len(values)) with a few slice copies."""
+        values = np.asarray(values, dtype=self._data.dtype)
+        # Only the last capacity samples can survive
+        values = values[max(len(values) - self.capacity, 0) :]
+        n = len(values)
+        if n == 0:
+            return
+
+        first = min(n, self.capacity - self._next)  # Samples before the slots wrap
+        for offset in (0, self.capacity):
+            start = self._next + offset
+            self._data[start : start + first] = values[:first]
+            self._data[offset : offset + n - first] = values[first:]
+        self._next = (self._next + n) % self.capacity
+        self._count = min(self._count + n, self.capacity)
+
+    def window(self):
+        """Returns the held samples, oldest first, as a read-only view of the buffer."""
+        end = self._next + self.capacity
+        view = self._data[end - self._count : end]
+        view.flags.writeable = False
+        return view
+
+    def clear(self):
+        self._next = 0
+        self._count = 0
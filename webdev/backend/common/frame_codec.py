@@ -0,0 +1,302 @@
+# Wire format for radar frames passed from the ingestor to the processor through Redis.
+#
+# The firmware publishes 4104 byte MQTT payloads (see station_example_main.c):
+#   - bytes(0 to 7)    = uint64_t timestamp_ms, little-endian
+#   - bytes(8 to 4103) = 2048 x uint16_t ADC samples, little-endian (32 chirps x 64 samples)
+#
+# Binary frames are stored in Redis as a 4 byte header, the timestamp, then the samples:
+#   - bytes(0 to 1) = magic b"CW"
+#   - byte 2        = format version
+#   - byte 3        = sample encoding (ENCODING_*)
+#   - bytes(4 to 11) = uint64_t timestamp_ms, little-endian
+#   - bytes(12 to ) = samples in the given encoding
+#
+# Sample encodings:
+#   - raw:      the firmware's 4096 bytes unchanged, decoded as a zero-copy view
+#   - packed12: the BGT60 ADC is 12-bit, so two samples are packed into 3 bytes (3072 bytes)
+#   - packed12 + zlib/zstd/lz4: fast-time deltas (mod 4096, zigzag) packed to 12 bits, then
+#     compressed. zlib is always available, zstd and lz4 need the zstandard / lz4 packages.
+#
+# Legacy JSON frames ({"timestamp": ..., "data": [...]}) are still understood by decode_message
+# so a processor can drain a queue that was filled by an older ingestor.
+#
+# Every malformed frame (truncated, corrupt payload, wrong sample count) raises ValueError,
+# so a consumer can skip it and keep the rest of its batch.
+#
+# NOTE: This module is shared by the ingestor and the processor. Both images are built from
+# webdev/backend and copy common/ next to the service code.
+
+import json
+import struct
+import zlib
+
+import numpy as np
+
+try:
+    import zstandard  # type: ignore
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame  # type: ignore
+except ImportError:
+    lz4 = None
+
+FRAME_MAGIC = b"CW"
+FRAME_VERSION = 1
+
+# Sample encodings (byte 3 of the header)
+ENCODING_RAW_U16 = 0
+ENCODING_PACKED12 = 1
+ENCODING_DELTA12_ZLIB = 2
+ENCODING_DELTA12_ZSTD = 3
+ENCODING_DELTA12_LZ4 = 4
+
+# FRAME_FORMAT names used by the ingestor
+ENCODINGS = {
+    "binary": ENCODING_RAW_U16,
+    "packed12": ENCODING_PACKED12,
+    "packed12+zlib": ENCODING_DELTA12_ZLIB,
+    "packed12+zstd": ENCODING_DELTA12_ZSTD,
+    "packed12+lz4": ENCODING_DELTA12_LZ4,
+}
+
+# Longest device ID (UTF-8 bytes) the processor carries with a frame's scalar (the
+# "device" field of a ScalarRing record). The ingestor drops frames from longer IDs.
+MAX_DEVICE_ID_BYTES = 128
+
+NUM_CHIRPS = 32
+NUM_SAMPLES = 64
+NUM_ELEMENTS = NUM_CHIRPS * NUM_SAMPLES  # 2048 samples per frame
+RAW_PAYLOAD_SIZE = 8 + NUM_ELEMENTS * 2  # 4104 bytes from the firmware
+PACKED12_SIZE = NUM_ELEMENTS * 3 // 2  # 3072 bytes
+ADC_MAX = 4096  # 12-bit ADC
+
+HEADER = struct.Struct("<2sBB")  # magic, version, encoding
+TIMESTAMP = struct.Struct("<Q")  # uint64_t timestamp_ms
+
+# One firmware payload as a NumPy record, used to decode many payloads in one pass
+PAYLOAD_DTYPE = np.dtype([("timestamp", "<u8"), ("data", "<u2", (NUM_ELEMENTS,))])
+
+
+# ==============================
+# 12-bit packing
+# ==============================
+
+
+def pack12(samples):
+    """
+    Packs 12-bit samples two to every 3 bytes.
+
+    samples: (..., 2n) integer array with values below 4096
+    returns: (..., 3n) uint8 array. Leading axes are kept, so a whole batch packs in one call.
+    """
+    pairs = np.asarray(samples, dtype=np.uint16).reshape(*np.shape(samples)[:-1], -1, 2)
+    low = pairs[..., 0]
+    high = pairs[..., 1]
+
+    packed = np.empty(low.shape + (3,), dtype=np.uint8)
+    packed[..., 0] = low & 0xFF
+    packed[..., 1] = (low >> 8) | ((high & 0x0F) << 4)
+    packed[..., 2] = high >> 4
+    return packed.reshape(*low.shape[:-1], -1)
+
+
+def unpack12(packed, count=NUM_ELEMENTS):
+    """Inverse of pack12 for one frame: returns count uint16 samples from a bytes-like or uint8 array."""
+    triplets = np.frombuffer(packed, dtype=np.uint8, count=count * 3 // 2).reshape(
+        -1, 3
+    )
+    triplets = triplets.astype(np.uint16)
+
+    samples = np.empty((triplets.shape[0], 2), dtype=np.uint16)
+    samples[:, 0] = triplets[:, 0] | ((triplets[:, 1] & 0x0F) << 8)
+    samples[:, 1] = (triplets[:, 1] >> 4) | (triplets[:, 2] << 4)
+    return samples.reshape(-1)
+
+
+def delta12(samples):
+    """
+    Fast-time first differences (per chirp) mod 4096, zigzag mapped so small steps of
+    either sign become small numbers. Output stays 12-bit so it can be packed.
+    """
+    frames = np.asarray(samples, dtype=np.int32).reshape(-1, NUM_CHIRPS, NUM_SAMPLES)
+    deltas = np.diff(frames, axis=-1, prepend=0) % ADC_MAX
+    # Signed step in [-2048, 2047] -> zigzag in [0, 4095]
+    signed = np.where(deltas >= ADC_MAX // 2, deltas - ADC_MAX, deltas)
+    zigzag = np.where(signed >= 0, 2 * signed, -2 * signed - 1)
+    return zigzag.astype(np.uint16).reshape(np.shape(samples))
+
+
+def undelta12(zigzag):
+    """Inverse of delta12 for one frame."""
+    zigzag = zigzag.astype(np.int32).reshape(NUM_CHIRPS, NUM_SAMPLES)
+    signed = np.where(zigzag % 2 == 0, zigzag // 2, -(zigzag + 1) // 2)
+    return (np.cumsum(signed, axis=-1) % ADC_MAX).astype(np.uint16)
+
+
+def _compress(data, encoding):
+    if encoding == ENCODING_DELTA12_ZLIB:
+        return zlib.compress(data, 1)
+    if encoding == ENCODING_DELTA12_ZSTD:
+        if zstandard is None:
+            raise ValueError("packed12+zstd needs the zstandard package")
+        return zstandard.ZstdCompressor(level=1).compress(data)
+    if lz4 is None:
+        raise ValueError("packed12+lz4 needs the lz4 package")
+    return lz4.frame.compress(data)
+
+
+def _decompress(data, encoding):
+    if encoding == ENCODING_DELTA12_ZSTD and zstandard is None:
+        raise ValueError("packed12+zstd needs the zstandard package")
+    if encoding == ENCODING_DELTA12_LZ4 and lz4 is None:
+        raise ValueError("packed12+lz4 needs the lz4 package")
+
+    # zlib.error, zstandard.ZstdError and lz4's RuntimeError share no base class, a corrupt
+    # payload is reported as ValueError like every other malformed frame
+    try:
+        if encoding == ENCODING_DELTA12_ZLIB:
+            return zlib.decompress(data)
+        if encoding == ENCODING_DELTA12_ZSTD:
+            return zstandard.ZstdDecompressor().decompress(
+                data, max_output_size=PACKED12_SIZE
+            )
+        return lz4.frame.decompress(bytes(data))
+    except Exception as e:
+        raise ValueError(f"Corrupt compressed frame: {e}") from e
+
+
+def check_encoding(encoding):
+    """Raises ValueError if the encoding is unknown or its compressor isn't installed."""
+    if encoding not in ENCODINGS.values():
+        raise ValueError(f"Unsupported frame encoding {encoding}")
+    if encoding in (ENCODING_DELTA12_ZSTD, ENCODING_DELTA12_LZ4):
+        _compress(b"", encoding)
+
+
+# ==============================
+# Frames
+# ==============================
+
+
+def encode_frame(payload_bytes):
+    """Wraps a raw firmware payload in the versioned binary header without touching the samples."""
+    if len(payload_bytes) != RAW_PAYLOAD_SIZE:
+        raise ValueError(f"Expected {RAW_PAYLOAD_SIZE} bytes, got {len(payload_bytes)}")
+
+    return HEADER.pack(FRAME_MAGIC, FRAME_VERSION, ENCODING_RAW_U16) + bytes(
+        payload_bytes
+    )
+
+
+def encode_frames(payloads, timestamps, samples, encoding):
+    """
+    Encodes a decoded batch (see decode_payload_batch) in one of the packed encodings.
+    The 12-bit packing runs once over the whole (N, 2048) batch.
+
+    Frames with samples outside 12 bits can't be packed losslessly, they are kept raw.
+    """
+    if encoding == ENCODING_RAW_U16:
+        return [encode_frame(payload) for payload in payloads]
+
+    fits_12_bits = samples.max(axis=1) < ADC_MAX
+    if encoding == ENCODING_PACKED12:
+        packed = pack12(samples)
+    else:
+        packed = pack12(delta12(samples))
+
+    header = HEADER.pack(FRAME_MAGIC, FRAME_VERSION, encoding)
+    frames = []
+    for i, timestamp_ms in enumerate(timestamps.tolist()):
+        if not fits_12_bits[i]:
+            frames.append(encode_frame(payloads[i]))
+        elif encoding == ENCODING_PACKED12:
+            frames.append(header + TIMESTAMP.pack(timestamp_ms) + packed[i].tobytes())
+        else:
+            frames.append(
+                header
+                + TIMESTAMP.pack(timestamp_ms)
+                + _compress(packed[i].tobytes(), encoding)
+            )
+    return frames
+
+
+def decode_payload_batch(payloads):
+    """
+    Decodes a list of raw firmware payloads in a single vectorized pass.
+
+    payloads: list of 4104 byte payloads (lengths must already be validated)
+
+    returns: (timestamps, samples) where timestamps is a (N,) uint64 array and samples is a
+    (N, 2048) uint16 array, both views into one joined buffer.
+    """
+    records = np.frombuffer(b"".join(payloads), dtype=PAYLOAD_DTYPE)
+    return records["timestamp"], records["data"]
+
+
+def is_binary_frame(msg):
+    """True if msg carries the binary frame header (as opposed to a legacy JSON frame)."""
+    return isinstance(msg, (bytes, bytearray, memoryview)) and msg[:2] == FRAME_MAGIC
+
+
+def decode_frame(msg):
+    """
+    Decodes a binary frame in any encoding.
+
+    returns: (timestamp_ms, frame) where frame is a (32, 64) uint16 array. For raw frames it
+    is a read-only view into msg (no copy of the samples), the caller must copy if it needs
+    to write to the frame.
+    """
+    if len(msg) < HEADER.size + TIMESTAMP.size:
+        raise ValueError(
+            f"Truncated frame: {len(msg)} bytes, header is {HEADER.size + TIMESTAMP.size}"
+        )
+
+    magic, version, encoding = HEADER.unpack_from(msg, 0)
+    if magic != FRAME_MAGIC:
+        raise ValueError(f"Bad frame magic {magic!r}")
+    if version != FRAME_VERSION:
+        raise ValueError(f"Unsupported frame version {version}")
+
+    timestamp_ms = TIMESTAMP.unpack_from(msg, HEADER.size)[0]
+    body = memoryview(msg)[HEADER.size + TIMESTAMP.size :]
+
+    if encoding == ENCODING_RAW_U16:
+        if len(body) != NUM_ELEMENTS * 2:
+            raise ValueError(
+                f"Expected {HEADER.size + RAW_PAYLOAD_SIZE} bytes, got {len(msg)}"
+            )
+        frame = np.frombuffer(body, dtype="<u2", count=NUM_ELEMENTS)
+    elif encoding == ENCODING_PACKED12:
+        if len(body) != PACKED12_SIZE:
+            raise ValueError(f"Expected {PACKED12_SIZE} packed bytes, got {len(body)}")
+        frame = unpack12(body)
+    elif encoding in ENCODINGS.values():
+        packed = _decompress(body, encoding)
+        if len(packed) != PACKED12_SIZE:
+            raise ValueError(
+                f"Expected {PACKED12_SIZE} packed bytes, got {len(packed)}"
+            )
+        frame = undelta12(unpack12(packed))
+    else:
+        raise ValueError(f"Unsupported frame encoding {encoding}")
+
+    return timestamp_ms, frame.reshape(NUM_CHIRPS, NUM_SAMPLES)
+
+
+def decode_message(msg):
+    """Decodes either a binary frame or a legacy JSON frame into (timestamp_ms, (32, 64) frame)."""
+    if is_binary_frame(msg):
+        return decode_frame(msg)
+
+    msg_dict = json.loads(msg)
+    if not isinstance(msg_dict, dict):
+        raise ValueError(f"Expected a JSON object, got {type(msg_dict).__name__}")
+    try:
+        frame = np.array(msg_dict.get("data", []), dtype=float)
+    except TypeError as e:
+        raise ValueError(f"Bad frame samples: {e}") from e
+    if frame.size != NUM_ELEMENTS:
+        raise ValueError(f"Expected {NUM_ELEMENTS} samples, got {frame.size}")
+    return msg_dict.get("timestamp"), frame.reshape(NUM_CHIRPS, NUM_SAMPLES)
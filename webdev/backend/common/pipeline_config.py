@@ -0,0 +1,178 @@
+# NOTE: This module is shared by the backend processor and the demo board scripts
+# (demo_board_python), which import it from this directory.
+
+import copy
+import functools
+import json
+
+import numpy as np
+from scipy.signal import butter
+
+FILTER_TYPES = ("highpass", "lowpass", "bandpass", "bandstop")
+
+# The vitals pipeline of SignalProcessor. Each chain filters the slow-time signal through
+# its filters in order (the MTI high-pass, then the band of interest), smooths it with a
+# moving average of `smoothing` samples, and counts peaks at least `distance` seconds
+# apart with the given prominence. `spectrum` is the band searched for the dominant
+# frequency. Rates are counted over `rate_window` seconds.
+DEFAULT_PIPELINE = {
+    "chains": {
+        "heart": {
+            "filters": [
+                {"type": "highpass", "order": 3, "band": 0.3},
+                # 48-150 bpm
+                {"type": "bandpass", "order": 6, "band": [0.8, 2.5]},
+            ],
+            "smoothing": 3,
+            "peaks": {"distance": 0.2, "prominence": 0.035},
+            "spectrum": [0.8, 2.5],
+        },
+        "breath": {
+            "filters": [
+                {"type": "highpass", "order": 3, "band": 0.07},
+                # 4-24 breaths/min
+                {"type": "bandpass", "order": 3, "band": [0.07, 0.4]},
+            ],
+            "smoothing": 10,
+            "peaks": {"distance": 2.0, "prominence": 0.035},
+            "spectrum": [0.07, 0.4],
+        },
+    },
+    "rate_window": 20,
+}
+
+
+@functools.lru_cache(maxsize=None)
+def design_filter(filter_type, order, band, sample_rate, output="ba"):
+    """
+    Butterworth design, cached on its parameters so every pipeline in the process with the
+    same filter shares one design. The returned arrays are read-only.
+
+    Parameters:
+        - filter_type: One of FILTER_TYPES
+        - order: Filter order
+        - band: Cutoff (Hz), or a (low, high) tuple for bandpass and bandstop
+        - sample_rate: Samples per second
+        - output: "ba" for (b, a), "sos" for second-order sections
+    """
+    nyquist = sample_rate / 2
+    design = butter(order, np.asarray(band) / nyquist, filter_type, output=output)
+    arrays = design if output == "ba" else (design,)
+    for array in arrays:
+        array.flags.writeable = False
+    return design
+
+
+def merge_pipeline(spec, base=DEFAULT_PIPELINE):
+    """
+    Returns base with spec laid over it: chains in spec replace the keys they set in the
+    base chain of the same name (or are added), other top-level keys replace base's.
+    """
+    merged = copy.deepcopy(base)
+    for key, value in spec.items():
+        if key != "chains":
+            merged[key] = value
+            continue
+        for name, chain in value.items():
+            merged["chains"].setdefault(name, {}).update(copy.deepcopy(chain))
+    return merged
+
+
+def load_pipeline(path=None):
+    """DEFAULT_PIPELINE, overridden by the JSON spec at path if there is one."""
+    if not path:
+        return copy.deepcopy(DEFAULT_PIPELINE)
+    with open(path) as f:
+        return merge_pipeline(json.load(f))
+
+
+def compile_pipeline(spec, sample_rate):
+    """
+    Turns a pipeline spec into the filters SignalProcessor runs, raising ValueError if the
+    spec is invalid.
+
+    returns: {"chains": {name: chain}, "rate_window": seconds}, every chain with
+        - filters: its stages, {"type", "order", "band", "ba": (b, a)} in order
+        - sos: the whole cascade as second-order sections, for streaming
+        - kernel: the moving average kernel
+        - peaks: {"distance": samples, "prominence"}, if the spec has peaks
+        - spectrum: (low, high) Hz, if the spec has a spectrum band
+    """
+    nyquist = sample_rate / 2
+    chains = {}
+    for name, chain in spec.get("chains", {}).items():
+        if not chain.get("filters"):
+            raise ValueError(f"Pipeline chain '{name}' has no filters")
+
+        stages = []
+        for stage in chain["filters"]:
+            filter_type = stage.get("type")
+            if filter_type not in FILTER_TYPES:
+                raise ValueError(
+                    f"Unsupported filter type '{filter_type}' in chain '{name}'"
+                )
+            band = stage.get("band")
+            if filter_type in ("bandpass", "bandstop"):
+                if not isinstance(band, (list, tuple)) or len(band) != 2:
+                    raise ValueError(
+                        f"{filter_type} in chain '{name}' needs a [low, high] band"
+                    )
+                band = (float(band[0]), float(band[1]))
+                edges = band
+            else:
+                if isinstance(band, (list, tuple)) or band is None:
+                    raise ValueError(
+                        f"{filter_type} in chain '{name}' needs one cutoff"
+                    )
+                band = float(band)
+                edges = (band,)
+            in_range = all(0 < edge < nyquist for edge in edges)
+            if not in_range or list(edges) != sorted(edges):
+                raise ValueError(
+                    f"Band {band} of chain '{name}' must be increasing and within "
+                    f"(0, {nyquist}) Hz"
+                )
+            order = int(stage.get("order", 0))
+            if order < 1:
+                raise ValueError(f"{filter_type} in chain '{name}' needs an order >= 1")
+
+            stages.append(
+                {
+                    "type": filter_type,
+                    "order": order,
+                    "band": band,
+                    "ba": design_filter(filter_type, order, band, sample_rate),
+                }
+            )
+
+        smoothing = int(chain.get("smoothing", 1))
+        if smoothing < 1:
+            raise ValueError(f"Smoothing of chain '{name}' must be at least 1 sample")
+
+        compiled = {
+            "filters": stages,
+            "sos": np.vstack(
+                [
+                    design_filter(
+                        stage["type"],
+                        stage["order"],
+                        stage["band"],
+                        sample_rate,
+                        output="sos",
+                    )
+                    for stage in stages
+                ]
+            ),
+            "kernel": np.ones(smoothing) / smoothing,
+        }
+        if "peaks" in chain:
+            compiled["peaks"] = {
+                "distance": int(chain["peaks"]["distance"] * sample_rate),
+                "prominence": float(chain["peaks"]["prominence"]),
+            }
+        if "spectrum" in chain:
+            low, high = chain["spectrum"]
+            compiled["spectrum"] = (float(low), float(high))
+        chains[name] = compiled
+
+    return {"chains": chains, "rate_window": spec.get("rate_window", 20)}
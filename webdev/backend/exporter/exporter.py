@@ -19,6 +19,22 @@ db = firestore.client()
 # Global Threading event to signal shutdown
 shutdown_flag = threading.Event()
 
+# Redis keys shared with the ingestor and processor
+# per-device list "processed_data:<device_id>"
+PROCESSED_QUEUE_PREFIX = "processed_data"
+DEVICE_INDEX = "active_devices"  # sorted set of device_id -> last frame time (epoch s)
+
+# How often the device index is checked for new and idle devices
+DEVICE_REFRESH_INTERVAL = 5.0
+# Devices without a frame for this long are dropped from the index and their worker stops
+# once it has drained their queue. Keep it the same as the processor's DEVICE_TIMEOUT.
+DEVICE_TIMEOUT = float(os.environ.get("DEVICE_TIMEOUT", 300))
+# Firestore gets at most one data point per device every FIRESTORE_INTERVAL seconds. The
+# processor exports every VITALS_HOP (1 s), each with the whole 20 s filtered window, so
+# writing them all would grow every hourly document about 20 times faster. 20 s matches
+# the window, i.e. the rate the processor exported at before the hop.
+FIRESTORE_INTERVAL = float(os.environ.get("FIRESTORE_INTERVAL", 20))
+
 
 def send_vitals_to_firestore_batch(device: str, collection: str, vitals_list: list):
     """
@@ -43,6 +59,12 @@ def send_vitals_to_firestore_batch(device: str, collection: str, vitals_list: li
                 "breathing_rate": v["breathing_rate"],
                 "filtered_breath": v.get("filtered_breath", None),
                 "filtered_heart": v.get("filtered_heart", None),
+                "range_gate": v.get("range_gate", None),
+                "mode": v.get("mode", "doppler"),
+                "heart_beats": v.get("heart_beats", None),
+                "breaths": v.get("breaths", None),
+                "heart_rate_fft": v.get("heart_rate_fft", None),
+                "breathing_rate_fft": v.get("breathing_rate_fft", None),
             }
         )
 
@@ -62,6 +84,34 @@ def send_vitals_to_firestore_batch(device: str, collection: str, vitals_list: li
     batch.commit()
 
 
+def thin_vitals(vitals_list, state, interval):
+    """
+    Keeps the data points at least `interval` seconds after the previous kept one. The
+    beats and breaths of a dropped point are moved to the next point, so each one still
+    reaches Firestore exactly once.
+
+    state: {"last_written": timestamp of the last kept point or None, "pending": the
+    newest dropped point or None}, carried between batches and updated in place
+    """
+    kept = []
+    for v in vitals_list:
+        pending = state["pending"]
+        if pending is not None:
+            for key in ("heart_beats", "breaths"):
+                v[key] = (pending.get(key) or []) + (v.get(key) or [])
+
+        last_written = state["last_written"]
+        if last_written is None or (
+            (v["timestamp"] - last_written).total_seconds() >= interval
+        ):
+            kept.append(v)
+            state["last_written"] = v["timestamp"]
+            state["pending"] = None
+        else:
+            state["pending"] = v
+    return kept
+
+
 import json
 import time
 from datetime import datetime
@@ -75,11 +125,14 @@ def redis_firestore_batch_worker(
     redis_name,
     batch_size=100,
     wait_time=2.0,
+    stop_flag=None,
 ):
     """
     Continuously listens to the Redis list. When an item arrives, it waits
     a couple of seconds to allow the queue to build up, then flushes out of
-    Redis in bulk.
+    Redis in bulk, thinned to one point per FIRESTORE_INTERVAL (see thin_vitals).
+    Once stop_flag is set the worker exits as soon as the list is empty, so
+    nothing already queued is left behind.
     """
 
     # Connect to Redis once. The redis-py client will automatically try to
@@ -88,12 +141,22 @@ def redis_firestore_batch_worker(
     logger.info(
         f"Worker initialized. Listening to Redis queue '{redis_name}' for device '{device}'..."
     )
+    thinning = {"last_written": None, "pending": None}
 
     while not shutdown_flag.is_set():
         try:
             # 1. Block until at least one item is available
             result = redis_conn.brpop(redis_name, timeout=2)
             if not result:
+                if stop_flag is not None and stop_flag.is_set():
+                    # Device went idle and its queue is drained, its newest point is
+                    # written even if it came too soon after the previous one
+                    if thinning["pending"] is not None:
+                        send_vitals_to_firestore_batch(
+                            device, collection, [thinning["pending"]]
+                        )
+                        thinning["pending"] = None
+                    break
                 continue  # Timeout occurred, loop back and check shutdown_flag
             _, data = result
 
@@ -139,7 +202,9 @@ def redis_firestore_batch_worker(
                     except Exception as parse_e:
                         logger.error(f"Error parsing JSON/Date: {parse_e}")
 
-            # 5. Send to Firestore
+            # 5. Send to Firestore, thinned to one point per FIRESTORE_INTERVAL
+            previous_thinning = dict(thinning)
+            batch = thin_vitals(batch, thinning, FIRESTORE_INTERVAL)
             if batch:
                 try:
                     send_vitals_to_firestore_batch(device, collection, batch)
@@ -148,6 +213,8 @@ def redis_firestore_batch_worker(
                     )
                 except Exception as e:
                     logger.error(f"Error sending batch to Firestore: {e}")
+                    # The items are read again, so the thinning starts over from before them
+                    thinning.update(previous_thinning)
                     # Push everything back into Redis if Firestore fails so no data is lost
                     if raw_items:
                         redis_conn.lpush(redis_name, *raw_items)
@@ -159,6 +226,56 @@ def redis_firestore_batch_worker(
             logger.error(f"Error in batch consumer: {e}", exc_info=True)
             time.sleep(1)  # Back off on error
 
+    redis_conn.close()
+    logger.info(f"Worker for device '{device}' stopped.")
+
+
+def sync_device_workers(index_conn, redis_host, redis_port, device_workers):
+    """
+    Keeps one Firestore batch worker per active device: prunes devices idle for longer
+    than DEVICE_TIMEOUT from the index, stops their workers and reaps the ones that have
+    exited, and starts workers for devices that don't have one yet.
+
+    device_workers: {device: (thread, stop event)}, updated in place
+    """
+    cutoff = time.time() - DEVICE_TIMEOUT
+    # The ingestor refreshes the score of every device on each batch, nothing else
+    # removes them, so the index would otherwise keep every device ever seen
+    index_conn.zremrangebyscore(DEVICE_INDEX, "-inf", f"({cutoff}")
+    active = set(index_conn.zrangebyscore(DEVICE_INDEX, cutoff, "+inf"))
+
+    for device, (worker, stop) in list(device_workers.items()):
+        if not worker.is_alive():
+            del device_workers[device]
+        elif device in active:
+            stop.clear()  # Came back before its worker exited
+        elif not stop.is_set():
+            logger.info(f"Device '{device}' went idle. Stopping its Firestore worker.")
+            stop.set()
+
+    for device in active:
+        if device in device_workers:
+            continue
+
+        logger.info(f"Starting Firestore worker for new device '{device}'.")
+        stop = threading.Event()
+        worker = threading.Thread(
+            target=redis_firestore_batch_worker,
+            args=(
+                redis_host,
+                redis_port,
+                device,
+                "filtered_data",
+                f"{PROCESSED_QUEUE_PREFIX}:{device}",
+                250,
+                5.0,
+                stop,
+            ),
+            daemon=True,
+        )
+        worker.start()
+        device_workers[device] = (worker, stop)
+
 
 if __name__ == "__main__":
     redis_host = os.environ.get("REDIS_HOST", "127.0.0.1")
@@ -168,27 +285,21 @@ if __name__ == "__main__":
         f"Starting exporter. Connecting to Redis on {redis_host}:{redis_port}..."
     )
 
-    redis_firestore_worker = threading.Thread(
-        target=redis_firestore_batch_worker,
-        args=(
-            redis_host,
-            redis_port,
-            "demo_pcb",
-            "filtered_data",
-            "processed_data",
-            250,
-            5.0,
-        ),
-        daemon=True,
-    )
-    redis_firestore_worker.start()
+    # One batch worker per device, started as devices show up in the index
+    device_workers = {}
+    index_conn = redis.Redis(host=redis_host, port=redis_port, decode_responses=True)
 
     try:
         # Loop to keep main thread alive until shutdown flag is flipped
         while not shutdown_flag.is_set():
-            time.sleep(1)
+            try:
+                sync_device_workers(index_conn, redis_host, redis_port, device_workers)
+            except redis.ConnectionError as e:
+                logger.warning(f"Redis connection error reading device index: {e}")
+            time.sleep(DEVICE_REFRESH_INTERVAL)
     except KeyboardInterrupt:
         logger.info("Shutdown signal received (Ctrl+C). Terminating gracefully...")
         shutdown_flag.set()
-        redis_firestore_worker.join(timeout=5)  # Wait for the thread to exit cleanly
+        for worker, _ in device_workers.values():
+            worker.join(timeout=5)  # Wait for the threads to exit cleanly
         logger.info("Worker shutdown complete.")
@@ -0,0 +1,151 @@
+"""
+Load test for the ingestor without AWS IoT Core.
+
+Publishes synthetic 4104 byte frames for a fleet of fake devices through the in-process
+MQTT broker, runs the real on_message_received / redis_batch_worker path (or the asyncio
+mode) against the Redis at REDIS_HOST and reports the sustained rates.
+
+    REDIS_HOST=127.0.0.1 python bench_ingestor.py --devices 200 --fps 15 --seconds 20
+    REDIS_HOST=127.0.0.1 python bench_ingestor.py --devices 50 --fps 0 --mode asyncio
+
+Frames are pushed to raw_sensor_data:bench-<n> (or the stream equivalent) and deleted afterwards.
+"""
+
+import argparse, asyncio, os, struct, threading, time
+
+import numpy as np
+import redis
+
+os.environ["MQTT_BACKEND"] = "inprocess"
+
+import ingestor  # noqa: E402
+from helpers.IngestQueue import IngestQueue  # noqa: E402
+from helpers.MqttTransport import default_broker  # noqa: E402
+
+
+def publish_frames(devices, fps, seconds, stop_event):
+    """Publishes one frame per device per tick, at fps ticks per second (0 = as fast as possible)."""
+    rng = np.random.default_rng(0)
+    samples = rng.integers(0, 4096, size=2048, dtype="<u2").tobytes()
+    topics = [f"{ingestor.RAW_TOPIC}/bench-{n}" for n in range(devices)]
+
+    published = 0
+    start = time.time()
+    tick = 0
+    # Each tick gets its own timestamp: with --fps 0 many ticks fall in the same millisecond
+    # and would otherwise be dropped by the ingestor's deduplicator
+    timestamp_ms = 0
+    while time.time() - start < seconds and not stop_event.is_set():
+        timestamp_ms = max(int(time.time() * 1000), timestamp_ms + 1)
+        payload = struct.pack("<Q", timestamp_ms) + samples
+        for topic in topics:
+            default_broker.publish(topic, payload)
+        published += devices
+        tick += 1
+
+        if fps > 0:
+            # Sleep until the next tick so the offered load stays at devices * fps
+            delay = start + tick / fps - time.time()
+            if delay > 0:
+                time.sleep(delay)
+
+    return published
+
+
+def count_pushed(redis_conn, devices):
+    pipe = redis_conn.pipeline()
+    for n in range(devices):
+        if ingestor.FRAME_TRANSPORT == "stream":
+            pipe.xlen(f"{ingestor.RAW_STREAM_PREFIX}:bench-{n}")
+        else:
+            pipe.llen(ingestor.raw_queue_key(f"bench-{n}"))
+    return sum(pipe.execute())
+
+
+def cleanup(redis_conn, devices):
+    pipe = redis_conn.pipeline()
+    for n in range(devices):
+        pipe.delete(
+            ingestor.raw_queue_key(f"bench-{n}"),
+            f"{ingestor.RAW_STREAM_PREFIX}:bench-{n}",
+        )
+        pipe.zrem(ingestor.DEVICE_INDEX, f"bench-{n}")
+    pipe.execute()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the ingestor with an in-process MQTT broker"
+    )
+    parser.add_argument(
+        "--devices", type=int, default=100, help="Number of fake devices"
+    )
+    parser.add_argument(
+        "--fps",
+        type=float,
+        default=15,
+        help="Frames per second per device, 0 = unthrottled",
+    )
+    parser.add_argument("--seconds", type=float, default=10, help="Publishing duration")
+    parser.add_argument("--mode", choices=["threads", "asyncio"], default="threads")
+    parser.add_argument("--batch-size", type=int, default=250)
+    args = parser.parse_args()
+
+    redis_host = os.environ.get("REDIS_HOST", "127.0.0.1")
+    redis_conn = redis.Redis(host=redis_host, port=6379)
+    redis_conn.ping()
+    cleanup(redis_conn, args.devices)
+
+    payload_queue = IngestQueue(
+        ingestor.INGEST_QUEUE_SIZE,
+        policy=ingestor.INGEST_QUEUE_POLICY,
+        per_device=ingestor.INGEST_QUEUE_PER_DEVICE,
+        key=lambda item: ingestor.device_from_topic(item[0]),
+        block_timeout=0 if args.mode == "asyncio" else 1.0,
+    )
+
+    stop_event = threading.Event()
+    start = time.time()
+
+    if args.mode == "asyncio":
+        # async_main connects to the in-process broker itself, publish from a thread
+        def publish_then_stop():
+            # Give async_main time to subscribe before publishing
+            time.sleep(0.5)
+            publish_then_stop.published = publish_frames(
+                args.devices, args.fps, args.seconds, stop_event
+            )
+            ingestor.shutdown_flag.set()
+
+        publisher = threading.Thread(target=publish_then_stop)
+        publisher.start()
+        asyncio.run(ingestor.async_main(redis_host, payload_queue))
+        publisher.join()
+        published = publish_then_stop.published
+    else:
+        worker_thread = threading.Thread(
+            target=ingestor.redis_batch_worker,
+            args=(redis_conn, payload_queue),
+            kwargs={"batch_size": args.batch_size, "flush_interval": 0.5},
+        )
+        worker_thread.start()
+        transport = ingestor.connect_mqtt(
+            lambda topic, payload: ingestor.on_message_received(
+                topic, payload, queue=payload_queue
+            )
+        )
+
+        published = publish_frames(args.devices, args.fps, args.seconds, stop_event)
+        transport.disconnect()  # Waits for the broker to deliver everything published
+        ingestor.shutdown_flag.set()
+        worker_thread.join()
+
+    elapsed = time.time() - start
+    pushed = count_pushed(redis_conn, args.devices)
+    cleanup(redis_conn, args.devices)
+
+    print(
+        f"mode={args.mode} devices={args.devices} fps={args.fps} format={ingestor.FRAME_FORMAT} transport={ingestor.FRAME_TRANSPORT}\n"
+        f"  published {published} frames, pushed {pushed} to Redis, dropped {payload_queue.total_dropped} in {elapsed:.1f}s\n"
+        f"  offered {published / args.seconds:.0f} frames/s, sustained {pushed / elapsed:.0f} frames/s"
+    )
@@ -0,0 +1,106 @@
+import threading
+import time
+from collections import deque
+
+
+class FrameDeduplicator:
+    """
+    Drops frames that were already seen, keyed on (device, timestamp_ms).
+
+    QoS 1 with a persistent session redelivers in-flight frames after a reconnect. Each
+    device keeps a ring of its last `window` timestamps (plus a set for O(1) lookups),
+    and devices that sent nothing for `idle_timeout` seconds are forgotten, so memory
+    stays bounded no matter how long the ingestor runs or how many devices come and go.
+    """
+
+    def __init__(self, window=450, idle_timeout=300.0):
+        """
+        Parameters:
+            - window: Number of recent timestamps remembered per device (450 = 30 s at 15 fps)
+            - idle_timeout: Seconds without frames after which a device is forgotten
+        """
+        self.window = window
+        self.idle_timeout = idle_timeout
+        # device_id -> (deque of timestamps, set of the same timestamps)
+        self._recent = {}
+        # device_id -> time.monotonic() of its last frame
+        self._last_seen = {}
+        self._last_sweep = None
+
+        # Duplicate counters: total since start, and per device since the last pop_duplicate_counts()
+        self.total_duplicates = 0
+        self._duplicate_counts = {}
+        self._counts_lock = threading.Lock()
+
+    def filter(self, devices, timestamps, now=None):
+        """
+        Records a batch of frames and returns the indices of the ones not seen before.
+        Duplicates within the same batch are caught too.
+
+        now: time.monotonic() of the batch, defaults to the current time
+        """
+        now = time.monotonic() if now is None else now
+        if self._last_sweep is None:
+            self._last_sweep = now
+        unique = []
+        duplicates = {}
+
+        for i, (device_id, timestamp_ms) in enumerate(zip(devices, timestamps)):
+            self._last_seen[device_id] = now
+            recent = self._recent.get(device_id)
+            if recent is None:
+                recent = self._recent[device_id] = (deque(), set())
+            order, seen = recent
+
+            if timestamp_ms in seen:
+                duplicates[device_id] = duplicates.get(device_id, 0) + 1
+                continue
+
+            order.append(timestamp_ms)
+            seen.add(timestamp_ms)
+            if len(order) > self.window:
+                seen.discard(order.popleft())
+            unique.append(i)
+
+        if duplicates:
+            with self._counts_lock:
+                for device_id, count in duplicates.items():
+                    self._duplicate_counts[device_id] = (
+                        self._duplicate_counts.get(device_id, 0) + count
+                    )
+                    self.total_duplicates += count
+
+        # Sweep idle devices at most once per timeout, from the thread that calls filter()
+        if now - self._last_sweep >= self.idle_timeout:
+            self._last_sweep = now
+            self.evict_idle(now)
+
+        return unique
+
+    def evict_idle(self, now=None):
+        """Forgets every device that sent no frame in the last idle_timeout seconds."""
+        now = time.monotonic() if now is None else now
+        for device_id, last_seen in list(self._last_seen.items()):
+            if now - last_seen > self.idle_timeout:
+                del self._last_seen[device_id]
+                self._recent.pop(device_id, None)
+
+    def discard(self, devices, timestamps):
+        """
+        Forgets frames recorded by filter(), e.g. a batch that never reached Redis, so
+        their redelivery isn't dropped as a duplicate.
+        """
+        for device_id, timestamp_ms in zip(devices, timestamps):
+            recent = self._recent.get(device_id)
+            if recent is None or timestamp_ms not in recent[1]:
+                continue
+            order, seen = recent
+            seen.discard(timestamp_ms)
+            order.remove(timestamp_ms)
+
+    def pop_duplicate_counts(self):
+        """Returns {device_id: duplicate frames} since the previous call and resets it."""
+        with self._counts_lock:
+            duplicate_counts = self._duplicate_counts
+            self._duplicate_counts = {}
+            return duplicate_counts
@@ -0,0 +1,159 @@
+import queue, threading, time
+from collections import deque, OrderedDict
+
+
+class IngestQueue:
+    """
+    Bounded queue between the MQTT callback and redis_batch_worker.
+
+    Drop-in for the get/get_nowait/empty subset of queue.Queue used by the worker.
+    When the queue is full, incoming frames are handled according to the policy:
+        - block:             wait up to block_timeout for space, then drop the new frame
+        - drop_oldest:       evict the oldest queued frame to make room
+        - drop_newest:       drop the new frame
+        - latest_per_device: keep only the latest per_device frames for each device
+    Every dropped frame is counted against the device it came from.
+    """
+
+    POLICIES = ("block", "drop_oldest", "drop_newest", "latest_per_device")
+
+    def __init__(
+        self, maxsize, policy="drop_oldest", per_device=150, key=None, block_timeout=1.0
+    ):
+        """
+        Parameters:
+            - maxsize:       Maximum number of frames held across all devices
+            - policy:        One of POLICIES
+            - per_device:    Frames kept per device with the latest_per_device policy
+            - key:           Maps a queued item to its device ID (for drop counts and per-device limits)
+            - block_timeout: Seconds put() waits for space with the block policy
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(
+                f"Unknown queue policy '{policy}', expected one of {self.POLICIES}"
+            )
+        if maxsize < 1:
+            raise ValueError(f"maxsize must be at least 1, got {maxsize}")
+        if per_device < 1:
+            raise ValueError(f"per_device must be at least 1, got {per_device}")
+
+        self.maxsize = maxsize
+        self.policy = policy
+        self.per_device = per_device
+        self.key = key if key is not None else (lambda item: None)
+        self.block_timeout = block_timeout
+
+        # latest_per_device keeps one FIFO per device, served round robin.
+        # The other policies only need a single FIFO.
+        self._devices = OrderedDict()
+        self._items = deque()
+        self._size = 0
+
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+
+        # Drop counters: total since start, and per device since the last pop_drop_counts()
+        self.total_dropped = 0
+        self._drop_counts = {}
+
+    def _count_drop(self, item):
+        device_id = self.key(item)
+        self._drop_counts[device_id] = self._drop_counts.get(device_id, 0) + 1
+        self.total_dropped += 1
+
+    def put(self, item):
+        """Queues item. Returns False if the new item was dropped instead."""
+        with self._lock:
+            if self.policy == "latest_per_device":
+                device_id = self.key(item)
+                device_items = self._devices.get(device_id)
+                if device_items is None:
+                    device_items = self._devices[device_id] = deque()
+
+                if len(device_items) >= self.per_device:
+                    # Replace this device's oldest frame, total size is unchanged
+                    self._count_drop(device_items.popleft())
+                    self._size -= 1
+                elif self._size >= self.maxsize:
+                    # Over the global cap, shed from the device that has waited longest to be served
+                    oldest_id, oldest_items = next(iter(self._devices.items()))
+                    self._count_drop(oldest_items.popleft())
+                    self._size -= 1
+                    if not oldest_items and oldest_id != device_id:
+                        del self._devices[oldest_id]
+
+                device_items.append(item)
+            else:
+                if self._size >= self.maxsize:
+                    if self.policy == "block":
+                        deadline = time.monotonic() + self.block_timeout
+                        while self._size >= self.maxsize:
+                            remaining = deadline - time.monotonic()
+                            if remaining <= 0:
+                                break
+                            self._not_full.wait(remaining)
+
+                    if self._size >= self.maxsize:
+                        if self.policy == "drop_oldest":
+                            self._count_drop(self._items.popleft())
+                            self._size -= 1
+                        else:
+                            # drop_newest, or block timed out
+                            self._count_drop(item)
+                            return False
+
+                self._items.append(item)
+
+            self._size += 1
+            self._not_empty.notify()
+            return True
+
+    def get(self, block=True, timeout=None):
+        """Removes and returns the next item, raising queue.Empty like queue.Queue.get()."""
+        with self._lock:
+            if not block:
+                if self._size == 0:
+                    raise queue.Empty
+            elif timeout is None:
+                while self._size == 0:
+                    self._not_empty.wait()
+            else:
+                deadline = time.monotonic() + timeout
+                while self._size == 0:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise queue.Empty
+                    self._not_empty.wait(remaining)
+
+            if self.policy == "latest_per_device":
+                # Serve devices round robin: take from the first device and move it to the back
+                device_id, device_items = next(iter(self._devices.items()))
+                item = device_items.popleft()
+                if device_items:
+                    self._devices.move_to_end(device_id)
+                else:
+                    del self._devices[device_id]
+            else:
+                item = self._items.popleft()
+
+            self._size -= 1
+            self._not_full.notify()
+            return item
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def qsize(self):
+        with self._lock:
+            return self._size
+
+    def empty(self):
+        return self.qsize() == 0
+
+    def pop_drop_counts(self):
+        """Returns {device_id: dropped frames} since the previous call and resets it."""
+        with self._lock:
+            drop_counts = self._drop_counts
+            self._drop_counts = {}
+            return drop_counts
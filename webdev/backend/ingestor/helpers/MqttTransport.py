@@ -0,0 +1,190 @@
+import abc, queue, threading
+
+
+class MqttTransport(abc.ABC):
+    """
+    Minimal MQTT client interface used by the ingestor.
+
+    on_message callbacks are called as on_message(topic, payload) from the transport's
+    own thread, like the awscrt event loop thread.
+    """
+
+    @abc.abstractmethod
+    def connect(self):
+        pass
+
+    @abc.abstractmethod
+    def subscribe(self, topic, on_message):
+        pass
+
+    @abc.abstractmethod
+    def disconnect(self):
+        pass
+
+
+class _CrtTransport(MqttTransport):
+    """Shared subscribe/disconnect for transports built on an awscrt mqtt.Connection."""
+
+    def __init__(self):
+        self.connection = None
+
+    @abc.abstractmethod
+    def _build_connection(self):
+        """Returns the unconnected awscrt mqtt.Connection."""
+
+    def connect(self):
+        self.connection = self._build_connection()
+        self.connection.connect().result()
+
+    def subscribe(self, topic, on_message):
+        from awscrt import mqtt  # type: ignore
+
+        # Subscribe with QoS 1 (at least once delivery)
+        subscribe_future, packet_id = self.connection.subscribe(
+            topic=topic,
+            qos=mqtt.QoS.AT_LEAST_ONCE,
+            callback=lambda topic, payload, dup, qos, retain, **kwargs: on_message(
+                topic, payload
+            ),
+        )
+        subscribe_future.result()
+
+    def disconnect(self):
+        if self.connection is not None:
+            self.connection.disconnect().result()
+
+
+class AwsIotTransport(_CrtTransport):
+    """AWS IoT Core over mutual TLS (the production broker)."""
+
+    def __init__(
+        self, endpoint, cert_filepath, pri_key_filepath, ca_filepath, client_id
+    ):
+        super().__init__()
+        self.endpoint = endpoint
+        self.cert_filepath = cert_filepath
+        self.pri_key_filepath = pri_key_filepath
+        self.ca_filepath = ca_filepath
+        self.client_id = client_id
+
+    def _build_connection(self):
+        from awsiot import mqtt_connection_builder  # type: ignore
+
+        return mqtt_connection_builder.mtls_from_path(
+            endpoint=self.endpoint,
+            cert_filepath=self.cert_filepath,
+            pri_key_filepath=self.pri_key_filepath,
+            ca_filepath=self.ca_filepath,
+            client_id=self.client_id,  # Ensure this is unique across your fleet
+            clean_session=False,
+            keep_alive_secs=30,
+        )
+
+
+class PlainMqttTransport(_CrtTransport):
+    """Any MQTT 3.1.1 broker without TLS, e.g. a local mosquitto for development and load tests."""
+
+    def __init__(self, host, port, client_id):
+        super().__init__()
+        self.host = host
+        self.port = port
+        self.client_id = client_id
+
+    def _build_connection(self):
+        from awscrt import mqtt  # type: ignore
+
+        return mqtt.Connection(
+            client=mqtt.Client(),
+            host_name=self.host,
+            port=self.port,
+            client_id=self.client_id,
+            clean_session=False,
+            keep_alive_secs=30,
+        )
+
+
+def topic_matches(topic_filter, topic):
+    """MQTT topic filter matching with the + (one level) and # (remaining levels) wildcards."""
+    filter_levels = topic_filter.split("/")
+    topic_levels = topic.split("/")
+
+    for i, level in enumerate(filter_levels):
+        if level == "#":
+            return True
+        if i >= len(topic_levels):
+            return False
+        if level != "+" and level != topic_levels[i]:
+            return False
+
+    return len(filter_levels) == len(topic_levels)
+
+
+class InProcessBroker:
+    """
+    Fake broker living in the ingestor process, for benchmarks without any network.
+
+    publish() puts messages on an internal queue and a single delivery thread calls the
+    matching subscribers, mirroring how awscrt delivers on its own event loop thread.
+    """
+
+    def __init__(self, maxsize=0):
+        self._subscriptions = []
+        self._subscriptions_lock = threading.Lock()
+        self._messages = queue.Queue(maxsize)
+        self._delivery_thread = None
+        self.delivered_count = 0
+
+    def start(self):
+        if self._delivery_thread is None:
+            self._delivery_thread = threading.Thread(target=self._deliver, daemon=True)
+            self._delivery_thread.start()
+
+    def stop(self):
+        if self._delivery_thread is not None:
+            self._messages.put(None)
+            self._delivery_thread.join()
+            self._delivery_thread = None
+
+    def subscribe(self, topic_filter, on_message):
+        with self._subscriptions_lock:
+            self._subscriptions.append((topic_filter, on_message))
+
+    def publish(self, topic, payload):
+        self._messages.put((topic, payload))
+
+    def pending(self):
+        return self._messages.qsize()
+
+    def _deliver(self):
+        while True:
+            message = self._messages.get()
+            if message is None:
+                break
+            topic, payload = message
+
+            with self._subscriptions_lock:
+                subscriptions = list(self._subscriptions)
+            for topic_filter, on_message in subscriptions:
+                if topic_matches(topic_filter, topic):
+                    on_message(topic, payload)
+            self.delivered_count += 1
+
+
+# Shared by the ingestor and any in-process publisher (see bench_ingestor.py)
+default_broker = InProcessBroker()
+
+
+class InProcessTransport(MqttTransport):
+    """Transport backed by an InProcessBroker."""
+
+    def __init__(self, broker=None):
+        self.broker = broker if broker is not None else default_broker
+
+    def connect(self):
+        self.broker.start()
+
+    def subscribe(self, topic, on_message):
+        self.broker.subscribe(topic, on_message)
+
+    def disconnect(self):
+        self.broker.stop()
@@ -1,10 +1,29 @@
 import json
 
-from awsiot import mqtt_connection_builder  # type: ignore
-from awscrt import mqtt  # type: ignore
-import redis, os, queue, logging, time, threading, struct
+import redis, os, sys, queue, logging, time, threading, asyncio
+import redis.asyncio as aioredis
 import humanize  # For better logging of data sizes
 
+from helpers.IngestQueue import IngestQueue
+from helpers.FrameDeduplicator import FrameDeduplicator
+from helpers.MqttTransport import (
+    AwsIotTransport,
+    PlainMqttTransport,
+    InProcessTransport,
+)
+
+# Modules shared with the processor live in webdev/backend/common. The Docker image copies
+# them next to this file, in a checkout they are one directory up.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.frame_codec import (  # noqa: E402
+    encode_frames,
+    decode_payload_batch,
+    check_encoding,
+    ENCODINGS,
+    MAX_DEVICE_ID_BYTES,
+    RAW_PAYLOAD_SIZE,
+)
+
 ROOT_CA_PATH = os.environ.get("AWS_ROOT_CA", "./AmazonRootCA1.pem")
 PRIVATE_KEY_PATH = os.environ.get("AWS_PRIVATE_KEY", "./private.pem.key")
 CERT_PATH = os.environ.get("AWS_CERT", "./certificate.pem.crt")
@@ -12,6 +31,52 @@ AWS_ENDPOINT = os.environ.get(
     "AWS_ENDPOINT", "a1py3mdrrjrz1-ats.iot.us-east-1.amazonaws.com"
 )
 
+# "aws" connects to AWS IoT Core, "mqtt" to a plain MQTT broker at MQTT_HOST:MQTT_PORT
+# (e.g. a local mosquitto), "inprocess" to a fake broker in this process (see bench_ingestor.py)
+MQTT_BACKEND = os.environ.get("MQTT_BACKEND", "aws")
+MQTT_HOST = os.environ.get("MQTT_HOST", "127.0.0.1")
+MQTT_PORT = int(os.environ.get("MQTT_PORT", 1883))
+MQTT_CLIENT_ID = os.environ.get("MQTT_CLIENT_ID", "cradlewave-ingestor")
+# "binary" pushes the raw payload behind a small header (see common/frame_codec.py),
+# "packed12" packs the 12-bit samples into 3 bytes per pair (25% smaller),
+# "packed12+zlib" / "packed12+zstd" / "packed12+lz4" also delta code and compress them,
+# "json" keeps the legacy {"timestamp": ..., "data": [...]} text frames
+FRAME_FORMAT = os.environ.get("FRAME_FORMAT", "binary")
+
+# Devices publish to "<RAW_TOPIC>/<device_id>". Frames on the bare legacy topic
+# (firmware without a device suffix) are attributed to DEFAULT_DEVICE.
+RAW_TOPIC = os.environ.get("RAW_TOPIC", "raw_sensor_data")
+DEFAULT_DEVICE = os.environ.get("DEFAULT_DEVICE", "demo_pcb")
+
+# "list" LPUSHes frames to per-device lists, "stream" XADDs them to per-device
+# Redis Streams for consumer-group reads with acknowledgement (see processor.py)
+FRAME_TRANSPORT = os.environ.get("FRAME_TRANSPORT", "list")
+# Approximate cap on entries kept per device stream (1800 = 2 minutes at 15 fps)
+STREAM_MAXLEN = int(os.environ.get("STREAM_MAXLEN", 1800))
+
+# "threads" runs the callback queue, batch worker and monitor as threads,
+# "asyncio" runs them on one event loop with several Redis pipelines in flight
+INGESTOR_MODE = os.environ.get("INGESTOR_MODE", "threads")
+ASYNC_MAX_IN_FLIGHT = int(os.environ.get("ASYNC_MAX_IN_FLIGHT", 4))
+
+# Bound on frames buffered between the MQTT callback and Redis, and what to shed when
+# it is full: block, drop_oldest, drop_newest or latest_per_device (see helpers/IngestQueue.py)
+INGEST_QUEUE_SIZE = int(os.environ.get("INGEST_QUEUE_SIZE", 5000))
+INGEST_QUEUE_POLICY = os.environ.get("INGEST_QUEUE_POLICY", "drop_oldest")
+INGEST_QUEUE_PER_DEVICE = int(os.environ.get("INGEST_QUEUE_PER_DEVICE", 150))
+
+# Timestamps remembered per device to drop QoS 1 redeliveries (450 = 30 s at 15 fps), 0 disables
+DEDUP_WINDOW = int(os.environ.get("DEDUP_WINDOW", 450))
+# Seconds without frames after which a device's dedup timestamps are forgotten. Same
+# default as the processor's DEVICE_TIMEOUT for the active_devices index.
+DEVICE_TIMEOUT = float(os.environ.get("DEVICE_TIMEOUT", 300))
+
+# Redis keys shared with the processor and exporter
+RAW_QUEUE_PREFIX = "raw_sensor_data"  # per-device list "raw_sensor_data:<device_id>"
+# per-device stream "raw_sensor_stream:<device_id>"
+RAW_STREAM_PREFIX = "raw_sensor_stream"
+DEVICE_INDEX = "active_devices"  # sorted set of device_id -> last frame time (epoch s)
+
 
 # Global variables
 # hold persistent connection
@@ -39,87 +104,105 @@ latest_batch_size = 0
 latest_batch_len = 0
 latest_batch_preview = None
 
+# Drops frames already pushed (same device and timestamp), used only by the batch worker
+frame_deduplicator = (
+    FrameDeduplicator(DEDUP_WINDOW, DEVICE_TIMEOUT) if DEDUP_WINDOW > 0 else None
+)
+
 # Global Threading event to signal shutdown
 shutdown_flag = threading.Event()
 
 
-def logging_monitor():
-    """Runs in the background and wakes every 5 seconds to log the current throughput and previews."""
+def log_health(time_elapsed, ingestion_queue):
+    """Logs the throughput, drops and previews since the last call, then resets the counters."""
     global message_count, message_length
-    global latest_raw_topic, latest_raw_payload, latest_unpacked_timestamp, latest_unpacked_data
-    global latest_batch_size, latest_batch_len, latest_batch_preview
 
-    last_log_time = time.time()
+    if message_count == 0:
+        return
 
-    while True:
-        shutdown_flag.wait(timeout=5)  # Waits for 5 seconds or until shutdown
+    logger.info(
+        f"Health Check: Received {message_count} messages from the {MQTT_BACKEND} broker in the last {time_elapsed:.1f} seconds. Payload handled per second: {humanize.naturalsize((message_length)/time_elapsed)}/s"
+    )
 
-        current_time = time.time()
-        time_elapsed = current_time - last_log_time
-        with message_lock:
-            if message_count > 0:
-                logger.info(
-                    f"Health Check: Received {message_count} messages from AWS in the last {time_elapsed:.1f} seconds. Payload handled per second: {humanize.naturalsize((message_length)/time_elapsed)}/s"
-                )
+    # Log frames shed by the bounded ingestion queue
+    drop_counts = ingestion_queue.pop_drop_counts()
+    if drop_counts:
+        logger.warning(
+            f"Ingestion queue full ({ingestion_queue.qsize()}/{ingestion_queue.maxsize}, policy={ingestion_queue.policy}): "
+            f"dropped {sum(drop_counts.values())} frames in the last {time_elapsed:.1f} seconds "
+            f"({ingestion_queue.total_dropped} total). Per device: {drop_counts}"
+        )
 
-                # Log the MQTT In Preview
-                if latest_raw_payload is not None:
-                    logger.info(
-                        f"MQTT In Preview -> topic='{latest_raw_topic}', raw payload={repr(latest_raw_payload[:50])}... (Total {len(latest_raw_payload)} bytes)"
-                    )
+    # Log redelivered frames dropped by the deduplicator
+    if frame_deduplicator is not None:
+        duplicate_counts = frame_deduplicator.pop_duplicate_counts()
+        if duplicate_counts:
+            logger.info(
+                f"Dropped {sum(duplicate_counts.values())} duplicate frames in the last {time_elapsed:.1f} seconds "
+                f"({frame_deduplicator.total_duplicates} total). Per device: {duplicate_counts}"
+            )
+
+    # Log the MQTT In Preview
+    if latest_raw_payload is not None:
+        logger.info(
+            f"MQTT In Preview -> topic='{latest_raw_topic}', raw payload={repr(latest_raw_payload[:50])}... (Total {len(latest_raw_payload)} bytes)"
+        )
 
-                # Log the Unpacked Data Preview
-                if latest_unpacked_data is not None:
-                    logger.info(
-                        f"Unpacked Preview -> timestamp={latest_unpacked_timestamp}, parsed data={latest_unpacked_data}... (Total 2048 elements)"
-                    )
+    # Log the Unpacked Data Preview
+    if latest_unpacked_data is not None:
+        logger.info(
+            f"Unpacked Preview -> timestamp={latest_unpacked_timestamp}, parsed data={latest_unpacked_data}... (Total 2048 elements, format={FRAME_FORMAT})"
+        )
 
-                # Log the Redis Export Preview
-                if latest_batch_preview is not None:
-                    logger.info(
-                        f"Redis Export Preview -> Pushed batch of {latest_batch_len} items (Total size: {humanize.naturalsize(latest_batch_size)}). Data: {latest_batch_preview}"
-                    )
+    # Log the Redis Export Preview
+    if latest_batch_preview is not None:
+        logger.info(
+            f"Redis Export Preview -> Pushed batch of {latest_batch_len} items (Total size: {humanize.naturalsize(latest_batch_size)}). Data: {latest_batch_preview}"
+        )
 
-                # Reset the counters
-                message_count = 0
-                message_length = 0
+    # Reset the counters
+    message_count = 0
+    message_length = 0
 
-            last_log_time = current_time
 
+def logging_monitor(ingestion_queue):
+    """Runs in the background and wakes every 5 seconds to log the current throughput and previews."""
+    last_log_time = time.time()
+
+    while True:
+        shutdown_flag.wait(timeout=5)  # Waits for 5 seconds or until shutdown
+
+        current_time = time.time()
+        time_elapsed = current_time - last_log_time
+        with message_lock:
+            log_health(time_elapsed, ingestion_queue)
 
-def unpack_cradlewave(payload_bytes):
-    if len(payload_bytes) != 4104:
-        raise ValueError(f"Expected 4104 bytes, got {len(payload_bytes)}")
+        last_log_time = current_time
 
-    # Unpack the timestamp using struct as 64-bit uint
-    timestamp_ms = struct.unpack("<Q", payload_bytes[:8])[0]
 
-    # Unpack samples directly using struct
-    # '<2048H' means 2048 Little-Endian, Unsigned 16-bit integers
-    samples_tuple = struct.unpack("<2048H", payload_bytes[8:])
+def record_message(topic, payload):
+    """Updates the throughput counters and raw preview for one received message."""
+    global message_count, message_length
+    global latest_raw_topic, latest_raw_payload
 
-    return timestamp_ms, samples_tuple
+    message_count += 1
+    message_length += len(payload)
+    latest_raw_topic = topic
+    latest_raw_payload = payload
 
 
 # Callback function for when a message is received
 def on_message_received(topic, payload, **kwargs):
-    global message_count, message_length
-    global latest_raw_topic, latest_raw_payload, latest_unpacked_timestamp, latest_unpacked_data
-
+    """
+    Runs on the awscrt event loop thread, so it only enqueues the raw bytes.
+    All decoding is done per batch in redis_batch_worker.
+    """
     try:
-        timestamp, sensor_data = unpack_cradlewave(payload)
-
-        payload_dict = {"timestamp": timestamp, "data": list(sensor_data)}
-        kwargs.get("queue").put(json.dumps(payload_dict))
+        kwargs.get("queue").put((topic, payload))
 
         with message_lock:
             # --- Logging Logic ---
-            message_count += 1
-            message_length += len(payload)
-            latest_raw_topic = topic
-            latest_raw_payload = payload
-            latest_unpacked_timestamp = timestamp
-            latest_unpacked_data = list(sensor_data[:5])
+            record_message(topic, payload)
 
     except Exception as e:
         logger.error(
@@ -127,12 +210,137 @@ def on_message_received(topic, payload, **kwargs):
         )
 
 
-def redis_batch_worker(redis_conn, ingestion_queue, batch_size=100, flush_interval=1.0):
-    """WS_ENDPOINT
-    periodically flushes the queue into Redis in bulk.
+def device_from_topic(topic):
+    """Maps "raw_sensor_data/<device_id>" to "<device_id>", the bare legacy topic maps to DEFAULT_DEVICE."""
+    _, sep, device_id = topic.rpartition("/")
+    return device_id if sep and device_id else DEFAULT_DEVICE
+
+
+def raw_queue_key(device_id):
+    return f"{RAW_QUEUE_PREFIX}:{device_id}"
+
+
+def push_frames(pipe, devices, items):
+    """Queues the push of every encoded frame onto its device's list or stream."""
+    if FRAME_TRANSPORT == "stream":
+        for device_id, item in zip(devices, items):
+            # Approximate trimming lets Redis drop whole macro nodes, which is much cheaper
+            pipe.xadd(
+                f"{RAW_STREAM_PREFIX}:{device_id}",
+                {"frame": item},
+                maxlen=STREAM_MAXLEN,
+                approximate=True,
+            )
+    else:
+        for device_id, item in zip(devices, items):
+            # LPUSH for FIFO (paired with RPOP on the consumer side)
+            pipe.lpush(raw_queue_key(device_id), item)
+
+
+def encode_batch(payloads, timestamps, samples):
     """
+    Encodes a decoded batch (see decode_payload_batch) for Redis.
+
+    returns: list of items ready to push in FRAME_FORMAT.
+    """
+    if FRAME_FORMAT == "json":
+        return [
+            json.dumps({"timestamp": timestamp, "data": data})
+            for timestamp, data in zip(timestamps.tolist(), samples.tolist())
+        ]
+
+    # Binary modes: raw payloads are pushed unchanged behind the frame header,
+    # packed encodings pack the whole batch in one vectorized pass
+    return encode_frames(payloads, timestamps, samples, ENCODINGS[FRAME_FORMAT])
+
+
+def prepare_batch(batch):
+    """
+    Validates, decodes and deduplicates a batch of (topic, payload) items from the ingestion queue.
+
+    returns: (devices, items, timestamps, samples), or None if nothing is left to push.
+    """
+    # Drop malformed payloads before joining them into one buffer
+    entries = [
+        (topic, payload) for topic, payload in batch if len(payload) == RAW_PAYLOAD_SIZE
+    ]
+    if len(entries) < len(batch):
+        logger.warning(
+            f"Dropped {len(batch) - len(entries)} payloads with unexpected size (expected {RAW_PAYLOAD_SIZE} bytes)"
+        )
+    if not entries:
+        return None
+
+    devices = [device_from_topic(topic) for topic, _ in entries]
+    if any(len(device_id.encode()) > MAX_DEVICE_ID_BYTES for device_id in devices):
+        kept = [
+            i
+            for i, device_id in enumerate(devices)
+            if len(device_id.encode()) <= MAX_DEVICE_ID_BYTES
+        ]
+        logger.warning(
+            f"Dropped {len(entries) - len(kept)} frames from device IDs longer than {MAX_DEVICE_ID_BYTES} bytes"
+        )
+        if not kept:
+            return None
+        entries = [entries[i] for i in kept]
+        devices = [devices[i] for i in kept]
+    payloads = [payload for _, payload in entries]
+    # One vectorized pass over the whole batch
+    timestamps, samples = decode_payload_batch(payloads)
+
+    # Drop QoS 1 redeliveries before any per-frame encoding work is spent on them
+    if frame_deduplicator is not None:
+        unique = frame_deduplicator.filter(devices, timestamps.tolist())
+        if not unique:
+            return None
+        if len(unique) < len(entries):
+            devices = [devices[i] for i in unique]
+            payloads = [payloads[i] for i in unique]
+            timestamps = timestamps[unique]
+            samples = samples[unique]
+
+    items = encode_batch(payloads, timestamps, samples)
+    return devices, items, timestamps, samples
+
+
+def queue_batch(pipe, devices, items):
+    """Queues a prepared batch and the device index update on a (sync or async) pipeline."""
+    push_frames(pipe, devices, items)
+
+    # Register every device seen in this batch so consumers can discover it
+    now = time.time()
+    pipe.zadd(DEVICE_INDEX, {device_id: now for device_id in set(devices)})
+
+
+def record_batch(items, timestamps, samples):
+    """Updates the unpacked and Redis export previews after a batch was pushed."""
     global latest_batch_len, latest_batch_size, latest_batch_preview
+    global latest_unpacked_timestamp, latest_unpacked_data
+
+    latest_unpacked_timestamp = int(timestamps[-1])
+    latest_unpacked_data = samples[-1, :5].tolist()
+    latest_batch_len = len(items)
+    latest_batch_size = sum(len(item) for item in items)
+    if isinstance(items[0], bytes):
+        latest_batch_preview = f"{items[0][:50]!r}..."
+    else:
+        latest_batch_preview = (
+            items[0][:150] + "... ]}" if len(items[0]) > 150 else items[0]
+        )
+
+
+def forget_batch(devices, timestamps):
+    """Takes a batch whose pipeline failed back out of the deduplicator, so a redelivery gets through."""
+    if frame_deduplicator is not None:
+        frame_deduplicator.discard(devices, timestamps.tolist())
 
+
+def redis_batch_worker(redis_conn, ingestion_queue, batch_size=100, flush_interval=1.0):
+    """
+    Collects raw MQTT payloads from the queue, decodes them as one batch and
+    periodically flushes them into Redis in bulk.
+    """
     while not shutdown_flag.is_set() or not ingestion_queue.empty():
         batch = []
         # Collect up to batch_size items
@@ -151,86 +359,259 @@ def redis_batch_worker(redis_conn, ingestion_queue, batch_size=100, flush_interv
             # No items arrived within flush_interval, loop again
             continue
 
-        if batch:
+        try:
+            prepared = prepare_batch(batch)
+            if prepared is None:
+                continue
+            devices, items, timestamps, samples = prepared
+
+            # Use a pipeline for O(1) network trip
+            pipe = redis_conn.pipeline()
+            queue_batch(pipe, devices, items)
             try:
-                # Use a pipeline for O(1) network trip
-                pipe = redis_conn.pipeline()
-                for item in batch:
-                    # LPUSH for FIFO (paired with RPOP on the consumer side)
-                    pipe.lpush("raw_sensor_data", item)
                 pipe.execute()
+            except Exception:
+                forget_batch(devices, timestamps)
+                raise
 
-                with message_lock:
-                    latest_batch_len = len(batch)
-                    latest_batch_size = sum(len(item) for item in batch)
-                    latest_batch_preview = (
-                        batch[0][:150] + "... ]}" if len(batch[0]) > 150 else batch[0]
-                    )
+            with message_lock:
+                record_batch(items, timestamps, samples)
 
-                # Mark queue tasks as done
-                for _ in range(len(batch)):
-                    ingestion_queue.task_done()
+        except Exception as e:
+            logger.error(f"Redis Batch Error: {e}")
+            # Optional: Re-queue items or handle retry logic
 
-            except Exception as e:
-                logger.error(f"Redis Batch Error: {e}")
-                # Optional: Re-queue items or handle retry logic
 
+# ==============================
+# asyncio mode
+# ==============================
 
-if __name__ == "__main__":
-    payload_queue = queue.Queue()
 
-    monitor_thread = threading.Thread(target=logging_monitor, daemon=True)
-    monitor_thread.start()
+async def async_logging_monitor(ingestion_queue):
+    """Task version of logging_monitor. Shares the event loop with the callbacks, so no lock is needed."""
+    last_log_time = time.time()
+
+    while not shutdown_flag.is_set():
+        await asyncio.sleep(5)
 
-    # Setup Redis Connection
-    redis_conn = None
-    redis_host = os.environ.get("REDIS_HOST", "127.0.0.1")
-    redis_conn = redis.Redis(host=redis_host, port=6379, decode_responses=True)
-    redis_conn.ping()
-    logger.info("Connected to Redis successfully.")
-
-    # Setup the worker that will batch received MQTT messages from
-    worker_thread = threading.Thread(
-        target=redis_batch_worker,
-        args=(redis_conn, payload_queue),
-        kwargs={"batch_size": 250, "flush_interval": 0.5},
-        daemon=False,
-    )
-    worker_thread.start()
-
-    # --- Startup: Connect to IoT Core ---
-    mqtt_conn = None
-
-    mqtt_conn = mqtt_connection_builder.mtls_from_path(
-        endpoint=AWS_ENDPOINT,
-        cert_filepath=CERT_PATH,
-        pri_key_filepath=PRIVATE_KEY_PATH,
-        ca_filepath=ROOT_CA_PATH,
-        client_id="cradlewave-ingestor",  # Ensure this is unique across your fleet
-        clean_session=False,
-        keep_alive_secs=30,
-    )
+        current_time = time.time()
+        log_health(current_time - last_log_time, ingestion_queue)
+        last_log_time = current_time
 
-    mqtt_conn.connect().result()
 
-    subscribe_topic = "raw_sensor_data"
+async def async_flush_batch(redis_conn, prepared, in_flight):
+    """Pushes one prepared batch through its own pipeline and releases its in-flight slot."""
+    devices, items, timestamps, samples = prepared
+    try:
+        async with redis_conn.pipeline() as pipe:
+            queue_batch(pipe, devices, items)
+            try:
+                await pipe.execute()
+            except Exception:
+                forget_batch(devices, timestamps)
+                raise
 
-    # Subscribe with QoS 1 (at least once delivery)
-    subscribe_future, packet_id = mqtt_conn.subscribe(
-        topic=subscribe_topic,
-        qos=mqtt.QoS.AT_LEAST_ONCE,
-        callback=lambda topic, payload, dup, qos, retain, **kwargs: on_message_received(
-            topic, payload, queue=payload_queue
-        ),
+        record_batch(items, timestamps, samples)
+    except Exception as e:
+        logger.error(f"Redis Batch Error: {e}")
+    finally:
+        in_flight.release()
+
+
+async def async_redis_batch_worker(
+    redis_conn,
+    ingestion_queue,
+    frame_ready,
+    batch_size=100,
+    flush_interval=1.0,
+    max_in_flight=4,
+):
+    """
+    asyncio version of redis_batch_worker. Up to max_in_flight pipelines are sent at once,
+    so Redis round trips overlap instead of running one after another.
+
+    Batches in flight at the same time may land in any order. Downstream ordering is by
+    frame timestamp, set max_in_flight=1 for strict push order.
+    """
+    in_flight = asyncio.Semaphore(max_in_flight)
+    flush_tasks = set()
+
+    while not shutdown_flag.is_set() or not ingestion_queue.empty():
+        if ingestion_queue.empty():
+            # Wait for at least one item to avoid a busy loop
+            frame_ready.clear()
+            try:
+                await asyncio.wait_for(frame_ready.wait(), timeout=flush_interval)
+            except asyncio.TimeoutError:
+                continue  # No items arrived within flush_interval, loop again
+
+        # Grab items if available, up to batch_size
+        batch = []
+        while len(batch) < batch_size:
+            try:
+                batch.append(ingestion_queue.get_nowait())
+            except queue.Empty:
+                break
+
+        try:
+            prepared = prepare_batch(batch)
+        except Exception as e:
+            logger.error(f"Redis Batch Error: {e}")
+            continue
+        if prepared is None:
+            continue
+
+        # Wait for a free slot, then send without waiting for the reply
+        await in_flight.acquire()
+        task = asyncio.create_task(async_flush_batch(redis_conn, prepared, in_flight))
+        flush_tasks.add(task)
+        task.add_done_callback(flush_tasks.discard)
+
+    await asyncio.gather(*flush_tasks)
+
+
+async def async_main(redis_host, ingestion_queue):
+    """Runs the ingestor on one event loop: MQTT callbacks are bridged in with call_soon_threadsafe."""
+    loop = asyncio.get_running_loop()
+    frame_ready = asyncio.Event()
+
+    redis_conn = aioredis.Redis(host=redis_host, port=6379)
+    await redis_conn.ping()
+    logger.info("Connected to Redis successfully (asyncio mode).")
+
+    def enqueue(topic, payload):
+        # Runs on the event loop thread, the same thread as the worker and monitor
+        ingestion_queue.put((topic, payload))
+        record_message(topic, payload)
+        frame_ready.set()
+
+    def on_message(topic, payload):
+        # Runs on the awscrt thread, hand the message to the event loop and return
+        loop.call_soon_threadsafe(enqueue, topic, payload)
+
+    monitor_task = asyncio.create_task(async_logging_monitor(ingestion_queue))
+    worker_task = asyncio.create_task(
+        async_redis_batch_worker(
+            redis_conn,
+            ingestion_queue,
+            frame_ready,
+            batch_size=250,
+            flush_interval=0.5,
+            max_in_flight=ASYNC_MAX_IN_FLIGHT,
+        )
     )
-    subscribe_result = subscribe_future.result()
+
+    # Connecting blocks on awscrt futures, keep it off the event loop
+    mqtt_conn = await asyncio.to_thread(connect_mqtt, on_message)
 
     try:
         while not shutdown_flag.is_set():
-            time.sleep(1)
-    except KeyboardInterrupt:
+            await asyncio.sleep(1)
+    except asyncio.CancelledError:
+        # asyncio.run cancels this task on Ctrl+C
         logger.info("Shutting down workers...")
-        mqtt_conn.disconnect().result()
+    finally:
+        await asyncio.to_thread(mqtt_conn.disconnect)
         shutdown_flag.set()
-        worker_thread.join()  # Waits for the thread to exit cleanly
+        await worker_task  # Flushes whatever is still queued
+        monitor_task.cancel()
+        await redis_conn.aclose()
         logger.info("Worker shutdown complete.")
+
+
+def create_transport():
+    """Builds the MQTT transport selected by MQTT_BACKEND."""
+    if MQTT_BACKEND == "aws":
+        return AwsIotTransport(
+            endpoint=AWS_ENDPOINT,
+            cert_filepath=CERT_PATH,
+            pri_key_filepath=PRIVATE_KEY_PATH,
+            ca_filepath=ROOT_CA_PATH,
+            client_id=MQTT_CLIENT_ID,
+        )
+    if MQTT_BACKEND == "mqtt":
+        return PlainMqttTransport(
+            host=MQTT_HOST, port=MQTT_PORT, client_id=MQTT_CLIENT_ID
+        )
+    if MQTT_BACKEND == "inprocess":
+        return InProcessTransport()
+    raise ValueError(f"Unknown MQTT_BACKEND '{MQTT_BACKEND}'")
+
+
+def connect_mqtt(on_message, transport=None):
+    """Connects the MQTT transport and subscribes on_message(topic, payload) to the raw frame topics."""
+    if transport is None:
+        transport = create_transport()
+    transport.connect()
+
+    # Every device topic, plus the bare legacy topic used by firmware without a device suffix
+    for subscribe_topic in (f"{RAW_TOPIC}/+", RAW_TOPIC):
+        transport.subscribe(subscribe_topic, on_message)
+        logger.info(f"Subscribed to '{subscribe_topic}' ({MQTT_BACKEND}).")
+
+    return transport
+
+
+if __name__ == "__main__":
+    # Fail fast on a typo or a missing compressor rather than on the first batch
+    if FRAME_FORMAT != "json":
+        if FRAME_FORMAT not in ENCODINGS:
+            raise ValueError(
+                f"Unknown FRAME_FORMAT '{FRAME_FORMAT}', expected json or one of {list(ENCODINGS)}"
+            )
+        check_encoding(ENCODINGS[FRAME_FORMAT])
+
+    payload_queue = IngestQueue(
+        INGEST_QUEUE_SIZE,
+        policy=INGEST_QUEUE_POLICY,
+        per_device=INGEST_QUEUE_PER_DEVICE,
+        key=lambda item: device_from_topic(item[0]),
+        # The event loop must never block in put(), so "block" degrades to drop_newest there
+        block_timeout=0 if INGESTOR_MODE == "asyncio" else 1.0,
+    )
+
+    redis_host = os.environ.get("REDIS_HOST", "127.0.0.1")
+
+    if INGESTOR_MODE == "asyncio":
+        try:
+            asyncio.run(async_main(redis_host, payload_queue))
+        except KeyboardInterrupt:
+            pass
+    else:
+        monitor_thread = threading.Thread(
+            target=logging_monitor, args=(payload_queue,), daemon=True
+        )
+        monitor_thread.start()
+
+        # Setup Redis Connection
+        redis_conn = None
+        redis_conn = redis.Redis(host=redis_host, port=6379, decode_responses=True)
+        redis_conn.ping()
+        logger.info("Connected to Redis successfully.")
+
+        # Setup the worker that will batch received MQTT messages from
+        worker_thread = threading.Thread(
+            target=redis_batch_worker,
+            args=(redis_conn, payload_queue),
+            kwargs={"batch_size": 250, "flush_interval": 0.5},
+            daemon=False,
+        )
+        worker_thread.start()
+
+        # --- Startup: Connect to the MQTT broker (AWS IoT Core by default) ---
+        mqtt_conn = None
+        mqtt_conn = connect_mqtt(
+            lambda topic, payload: on_message_received(
+                topic, payload, queue=payload_queue
+            )
+        )
+
+        try:
+            while not shutdown_flag.is_set():
+                time.sleep(1)
+        except KeyboardInterrupt:
+            logger.info("Shutting down workers...")
+            mqtt_conn.disconnect()
+            shutdown_flag.set()
+            worker_thread.join()  # Waits for the thread to exit cleanly
+            logger.info("Worker shutdown complete.")
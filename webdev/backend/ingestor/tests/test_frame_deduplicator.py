@@ -0,0 +1,124 @@
+import asyncio
+import queue
+import struct
+import threading
+
+import ingestor
+from helpers.FrameDeduplicator import FrameDeduplicator
+from common.frame_codec import NUM_ELEMENTS
+
+
+def payload(timestamp_ms):
+    return struct.pack("<Q", timestamp_ms) + bytes(NUM_ELEMENTS * 2)
+
+
+class FakePipeline:
+    """Records the frames pushed through it, its first `failures` executes raise."""
+
+    def __init__(self, redis_conn):
+        self.redis_conn = redis_conn
+        self.pushed = []
+
+    def lpush(self, key, *items):
+        self.pushed.extend(items)
+
+    def zadd(self, key, mapping):
+        pass
+
+    def execute(self):
+        if self.redis_conn.failures:
+            self.redis_conn.failures -= 1
+            raise ConnectionError("Redis went away")
+        self.redis_conn.pushed.extend(self.pushed)
+
+
+class FakeAsyncPipeline(FakePipeline):
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def execute(self):
+        FakePipeline.execute(self)
+
+
+class FakeRedis:
+    def __init__(self, failures=0, pipeline=FakePipeline):
+        self.failures = failures
+        self.pushed = []
+        self._pipeline = pipeline
+
+    def pipeline(self):
+        return self._pipeline(self)
+
+
+def drain(monkeypatch, redis_conn, frames):
+    """Runs the threaded batch worker until the frames in the queue are handled."""
+    stop = threading.Event()
+    stop.set()
+    monkeypatch.setattr(ingestor, "shutdown_flag", stop)
+    ingestion_queue = queue.Queue()
+    for frame in frames:
+        ingestion_queue.put(frame)
+    ingestor.redis_batch_worker(redis_conn, ingestion_queue, flush_interval=0.01)
+
+
+def test_discard_forgets_only_the_given_frames():
+    deduplicator = FrameDeduplicator(window=4)
+    assert deduplicator.filter(["a", "a", "b"], [1, 2, 1]) == [0, 1, 2]
+
+    deduplicator.discard(["a", "c"], [2, 1])
+
+    assert deduplicator.filter(["a", "a", "b"], [1, 2, 1]) == [1]
+
+
+def test_failed_pipeline_lets_the_redelivery_through(monkeypatch):
+    monkeypatch.setattr(ingestor, "frame_deduplicator", FrameDeduplicator())
+    monkeypatch.setattr(ingestor, "FRAME_TRANSPORT", "list")
+    frames = [
+        ("raw_sensor_data/a", payload(1000)),
+        ("raw_sensor_data/a", payload(1066)),
+    ]
+    redis_conn = FakeRedis(failures=1)
+
+    drain(monkeypatch, redis_conn, frames)
+    assert redis_conn.pushed == []
+
+    # QoS 1 redelivers the frames that never made it into Redis
+    drain(monkeypatch, redis_conn, frames)
+    assert len(redis_conn.pushed) == 2
+
+    # Once they are in, another redelivery is a duplicate
+    drain(monkeypatch, redis_conn, frames)
+    assert len(redis_conn.pushed) == 2
+
+
+def test_failed_async_pipeline_lets_the_redelivery_through(monkeypatch):
+    monkeypatch.setattr(ingestor, "frame_deduplicator", FrameDeduplicator())
+    monkeypatch.setattr(ingestor, "FRAME_TRANSPORT", "list")
+    frames = [("raw_sensor_data/a", payload(1000))]
+    redis_conn = FakeRedis(failures=1, pipeline=FakeAsyncPipeline)
+
+    async def flush():
+        in_flight = asyncio.Semaphore(1)
+        await in_flight.acquire()
+        await ingestor.async_flush_batch(
+            redis_conn, ingestor.prepare_batch(frames), in_flight
+        )
+
+    asyncio.run(flush())
+    assert redis_conn.pushed == []
+    asyncio.run(flush())
+    assert len(redis_conn.pushed) == 1
+
+
+def test_idle_devices_are_forgotten():
+    deduplicator = FrameDeduplicator(window=4, idle_timeout=10)
+    deduplicator.filter(["a", "b"], [1, 1], now=0)
+    deduplicator.filter(["a"], [2], now=8)
+
+    # The sweep at 12 s drops b (idle 12 s) but keeps a (idle 4 s)
+    deduplicator.filter(["c"], [1], now=12)
+    assert sorted(deduplicator._recent) == ["a", "c"]
+    assert deduplicator.filter(["a", "b"], [1, 1], now=13) == [1]
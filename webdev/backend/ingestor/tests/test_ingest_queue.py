@@ -0,0 +1,18 @@
+import pytest
+
+from helpers.IngestQueue import IngestQueue
+
+
+def test_per_device_must_hold_a_frame():
+    # A zero per-device quota would pop from the device's empty FIFO on every put()
+    with pytest.raises(ValueError):
+        IngestQueue(10, policy="latest_per_device", per_device=0)
+
+
+def test_latest_per_device_keeps_the_newest_frames():
+    ingest_queue = IngestQueue(
+        10, policy="latest_per_device", per_device=1, key=lambda item: item[0]
+    )
+    for item in [("a", 1), ("a", 2), ("b", 1)]:
+        ingest_queue.put(item)
+    assert sorted(ingest_queue.get_nowait() for _ in range(2)) == [("a", 2), ("b", 1)]
@@ -0,0 +1,102 @@
+"""
+Compares the hand-off between the frame and signal stages: the shared memory ring buffer
+(helpers/ScalarRing.py) against a multiprocessing.Queue.
+
+A producer process puts {"device", "data", "timestamp"} items like handle_frames does and
+a consumer process gets them like signal_processor does. Each item carries its send time
+(time.perf_counter is system wide on Linux), so the consumer measures the latency.
+
+    python bench_signal_queue.py --items 200000            # throughput, unthrottled
+    python bench_signal_queue.py --items 20000 --rate 3000 # latency at 200 devices x 15 fps
+"""
+
+import argparse, multiprocessing, os, sys, time
+
+import numpy as np
+
+# webdev/backend, for the modules shared between services (common.X)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers.ScalarRing import ScalarRing  # noqa: E402
+
+
+def produce(signal_queue, items, devices, rate):
+    start = time.perf_counter()
+    for i in range(items):
+        if rate > 0:
+            # Sleep until this item is due so the offered load stays at rate items/s
+            delay = start + i / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        signal_queue.put(
+            {
+                "device": f"bench-{i % devices}",
+                "data": time.perf_counter(),
+                "timestamp": 1_700_000_000_000 + i,
+            }
+        )
+
+
+def consume(signal_queue, items, results):
+    latencies = np.empty(items)
+    start = None
+    for i in range(items):
+        item = signal_queue.get(timeout=10)
+        latencies[i] = time.perf_counter() - item["data"]
+        if start is None:
+            start = time.perf_counter()
+    elapsed = time.perf_counter() - start
+    results.put((items / elapsed if elapsed > 0 else 0, latencies))
+
+
+def run(kind, items, devices, rate, capacity):
+    if kind == "ring":
+        signal_queue = ScalarRing(capacity=capacity)
+    else:
+        signal_queue = multiprocessing.Queue()
+    results = multiprocessing.Queue()
+
+    consumer = multiprocessing.Process(
+        target=consume, args=(signal_queue, items, results)
+    )
+    producer = multiprocessing.Process(
+        target=produce, args=(signal_queue, items, devices, rate)
+    )
+    consumer.start()
+    producer.start()
+    throughput, latencies = results.get()
+    producer.join()
+    consumer.join()
+
+    if kind == "ring":
+        signal_queue.close()
+        signal_queue.unlink()
+
+    latencies_us = latencies * 1e6
+    print(
+        f"{kind:>5}: {throughput:>10,.0f} items/s | latency p50 {np.percentile(latencies_us, 50):.1f} us, "
+        f"p99 {np.percentile(latencies_us, 99):.1f} us, max {latencies_us.max():.1f} us"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the frame -> signal stage hand-off"
+    )
+    parser.add_argument(
+        "--items", type=int, default=100000, help="Items sent through each queue"
+    )
+    parser.add_argument(
+        "--devices", type=int, default=200, help="Number of fake devices"
+    )
+    parser.add_argument(
+        "--rate", type=float, default=0, help="Items per second, 0 = unthrottled"
+    )
+    parser.add_argument("--capacity", type=int, default=4096, help="Ring buffer size")
+    args = parser.parse_args()
+
+    print(
+        f"items={args.items} devices={args.devices} rate={args.rate or 'unthrottled'}"
+    )
+    for kind in ("queue", "ring"):
+        run(kind, args.items, args.devices, args.rate, args.capacity)
@@ -0,0 +1,143 @@
+"""
+Compares the two vitals modes of the frame stage on synthetic frames: the Doppler scalar
+(frame_to_scalar, batched and range gated) against the phase of the subject's range bin.
+
+The scene is a chest at range bin 12 breathing and beating at known rates, seen by a
+60 GHz radar (5 mm wavelength), plus static clutter near the antenna and ADC noise. The
+chest displacement moves the phase of the target's beat tone, and slightly its amplitude.
+
+Cost is the time per frame to reduce a batch of FRAME_BATCH_SIZE frames. Accuracy is the
+correlation of each slow-time signal with the true displacement, and the rates that
+SignalProcessor estimates from 20 s windows of it, as the signal stage does.
+
+    python bench_vitals_mode.py
+    python bench_vitals_mode.py --noise 200 --breathing 0.3 --heart 1.4
+"""
+
+import argparse, os, sys, time
+
+import numpy as np
+
+# webdev/backend, for the modules shared between services (common.X)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers.RangeGate import RangeGate  # noqa: E402
+from helpers.SignalProcessor import SignalProcessor  # noqa: E402
+from processor import FRAME_BATCH_SIZE, frame_to_scalar, frames_to_scalars  # noqa: E402
+
+FRAME_RATE = 15
+WAVELENGTH_MM = 5.0
+CHIRP_PERIOD_S = 0.4e-3
+TARGET_BIN = 12.3
+WINDOW = 20 * FRAME_RATE  # Samples per SignalProcessor window, as in signal_processor
+
+
+def displacement_mm(t, breathing_hz, heart_hz):
+    return 4.0 * np.sin(2 * np.pi * breathing_hz * t) + 0.25 * np.sin(
+        2 * np.pi * heart_hz * t
+    )
+
+
+def synthetic_frames(num_frames, breathing_hz, heart_hz, noise, seed=0):
+    """Returns ((num_frames, 32, 64) uint16 frames, (num_frames,) displacement in mm)."""
+    rng = np.random.default_rng(seed)
+    chirps, samples = np.meshgrid(np.arange(32), np.arange(64), indexing="ij")
+    frame_times = np.arange(num_frames) / FRAME_RATE
+
+    frames = np.empty((num_frames, 32, 64), dtype=np.uint16)
+    for i, t in enumerate(frame_times):
+        # The chest keeps moving during the 32 chirps of a frame
+        d = displacement_mm(t + chirps * CHIRP_PERIOD_S, breathing_hz, heart_hz)
+        phase = 4 * np.pi * d / WAVELENGTH_MM
+        target = (
+            600 * (1 + 0.02 * d) * np.cos(2 * np.pi * TARGET_BIN * samples / 64 + phase)
+        )
+        clutter = 400 * np.cos(2 * np.pi * 1.5 * samples / 64)
+        adc = 2048 + target + clutter + rng.normal(0, noise, size=(32, 64))
+        frames[i] = np.clip(adc, 0, 4095)
+    return frames, displacement_mm(frame_times, breathing_hz, heart_hz)
+
+
+def time_per_frame(reduce, frames, repeats):
+    """Best of repeats, in microseconds per frame."""
+    best = np.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for batch in range(0, len(frames), FRAME_BATCH_SIZE):
+            reduce(frames[batch : batch + FRAME_BATCH_SIZE])
+        best = min(best, time.perf_counter() - start)
+    return best / len(frames) * 1e6
+
+
+def rates(signal, processor):
+    """(breathing, heart) rates per minute estimated on consecutive 20 s windows."""
+    breathing, heart = [], []
+    previous_heart = previous_breath = 0
+    for start in range(0, len(signal) - WINDOW + 1, WINDOW):
+        result = processor.process_signal_pipeline(
+            signal[start : start + WINDOW], previous_heart, previous_breath
+        )
+        previous_heart = result["heart_rate_bpm"][0][1]
+        previous_breath = result["breathing_rate"][0][1]
+        heart.append(previous_heart)
+        breathing.append(previous_breath)
+    return np.array(breathing), np.array(heart)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the vitals modes")
+    parser.add_argument(
+        "--seconds", type=int, default=120, help="Length of the synthetic recording"
+    )
+    parser.add_argument(
+        "--noise", type=float, default=80, help="ADC noise standard deviation (LSB)"
+    )
+    parser.add_argument(
+        "--breathing", type=float, default=0.25, help="Breathing rate (Hz)"
+    )
+    parser.add_argument("--heart", type=float, default=1.2, help="Heart rate (Hz)")
+    parser.add_argument("--repeats", type=int, default=5, help="Timing repeats")
+    args = parser.parse_args()
+
+    frames, truth = synthetic_frames(
+        args.seconds * FRAME_RATE, args.breathing, args.heart, args.noise
+    )
+    device_ids = ["bench"] * FRAME_BATCH_SIZE
+
+    def gated_scalars(batch):
+        return RangeGate().scalars(device_ids[: len(batch)], batch)[0]
+
+    def phases(batch):
+        return RangeGate().phases(device_ids[: len(batch)], batch)[0]
+
+    modes = {
+        "frame_to_scalar": lambda batch: [frame_to_scalar(frame) for frame in batch],
+        "doppler (batched)": lambda batch: frames_to_scalars(batch, "float64"),
+        "doppler (gated)": gated_scalars,
+        "phase": phases,
+    }
+
+    # One tracker over the whole recording so the gate settles like it does in service.
+    # The jitter buffer unwraps the phases in the pipeline, here they are already in order.
+    signals = {
+        "frame_to_scalar": np.array([frame_to_scalar(frame) for frame in frames]),
+        "doppler (batched)": frames_to_scalars(frames, "float64"),
+        "doppler (gated)": RangeGate().scalars(["bench"] * len(frames), frames)[0],
+        "phase": np.unwrap(RangeGate().phases(["bench"] * len(frames), frames)[0]),
+    }
+
+    processor = SignalProcessor(sample_rate=FRAME_RATE)
+    print(
+        f"{args.seconds} s at {FRAME_RATE} fps, noise {args.noise} LSB | truth "
+        f"BR {args.breathing * 60:.0f}/min, HR {args.heart * 60:.0f}/min"
+    )
+    for name, reduce in modes.items():
+        cost = time_per_frame(reduce, frames, args.repeats)
+        signal = signals[name]
+        correlation = abs(np.corrcoef(signal, truth)[0, 1])
+        breathing, heart = rates(signal, processor)
+        print(
+            f"{name:>18}: {cost:7.1f} us/frame | |corr| with displacement {correlation:.3f} | "
+            f"BR {np.mean(np.abs(breathing - args.breathing * 60)):5.1f}/min off, "
+            f"HR {np.mean(np.abs(heart - args.heart * 60)):5.1f}/min off"
+        )
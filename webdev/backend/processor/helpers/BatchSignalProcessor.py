@@ -0,0 +1,251 @@
+import numpy as np
+from scipy.signal import sosfilt, sosfilt_zi
+
+from helpers.PeakDetector import PeakDetector
+from helpers.SignalProcessor import SignalProcessor
+from helpers.SlidingDFT import SlidingDFTBank
+
+
+class BatchSignalProcessor(SignalProcessor):
+    """
+    Streaming process_signal_pipeline for many devices at once.
+
+    Filter state is kept per device between calls, so each call only filters the samples
+    that arrived since the previous one and feeds them to incremental peak detectors and
+    sliding spectra. The cost grows with the new samples rather than the window, no
+    window starts with a filter transient and every beat is counted exactly once.
+
+    Every device gets a row (slot) of stacked filter state, and a call takes a
+    (devices, samples) matrix of new samples: both filter cascades, the moving averages
+    and the heart and breathing spectra run once along the last axis for all the rows,
+    so the fixed cost of a scipy call is paid per call rather than per device. Only the
+    peak detectors, which are sequential state machines, still run per device.
+
+    Rows of a matrix must have the same number of new samples. A device still warming up
+    (its first window) usually has a different count from the devices that are hopping,
+    so callers group devices by count and make one call per group. Until a device's
+    window has filled, its rates are over the samples seen so far.
+    """
+
+    def __init__(self, sample_rate, window_size=300, pipeline=None):
+        """
+        Parameters:
+            - sample_rate: Samples per second of every device's slow-time signal
+            - window_size: Samples in the rate window and the spectra
+            - pipeline: Pipeline spec, as for SignalProcessor
+        """
+        super().__init__(sample_rate, pipeline)
+        self.window_size = window_size
+
+        # device_id -> row, and the rows of devices that have been forgotten
+        self._slots = {}
+        self._free = []
+        self._rows = 0
+
+        # Filter delay lines (sections, rows, 2) and moving average inputs (rows, taps)
+        self._zi_heart = np.zeros((len(self.sos_heart), 0, 2))
+        self._zi_breath = np.zeros((len(self.sos_breath), 0, 2))
+        self._tail_heart = np.zeros((0, len(self.kernel_heart) - 1))
+        self._tail_breath = np.zeros((0, len(self.kernel_breath) - 1))
+        self._started = np.zeros(0, dtype=bool)  # Delay lines set up from a sample
+
+        self._heart_peaks = []
+        self._breath_peaks = []
+        self._heart_spectrum = SlidingDFTBank(
+            sample_rate, *self.heart["spectrum"], window_size
+        )
+        self._breath_spectrum = SlidingDFTBank(
+            sample_rate, *self.breath["spectrum"], window_size
+        )
+
+    def _new_peak_detectors(self):
+        # Same constraints as heart_peak_detect and breathing_peak_detect
+        return (
+            PeakDetector(window=self.window_size, **self.heart["peaks"]),
+            PeakDetector(window=self.window_size, **self.breath["peaks"]),
+        )
+
+    def _grow(self):
+        """Doubles the number of rows."""
+        extra = max(self._rows, 8)
+        self._zi_heart = np.concatenate(
+            (self._zi_heart, np.zeros((len(self.sos_heart), extra, 2))), axis=1
+        )
+        self._zi_breath = np.concatenate(
+            (self._zi_breath, np.zeros((len(self.sos_breath), extra, 2))), axis=1
+        )
+        self._tail_heart = np.vstack(
+            (self._tail_heart, np.zeros((extra, self._tail_heart.shape[1])))
+        )
+        self._tail_breath = np.vstack(
+            (self._tail_breath, np.zeros((extra, self._tail_breath.shape[1])))
+        )
+        self._started = np.concatenate((self._started, np.zeros(extra, dtype=bool)))
+        self._heart_peaks.extend([None] * extra)
+        self._breath_peaks.extend([None] * extra)
+        self._free.extend(range(self._rows + extra - 1, self._rows - 1, -1))
+        self._rows += extra
+        self._heart_spectrum.resize(self._rows)
+        self._breath_spectrum.resize(self._rows)
+
+    def _slot(self, device_id):
+        slot = self._slots.get(device_id)
+        if slot is None:
+            if not self._free:
+                self._grow()
+            slot = self._slots[device_id] = self._free.pop()
+            self._clear(slot)
+        return slot
+
+    def _clear(self, slot):
+        self._started[slot] = False
+        self._tail_heart[slot] = 0
+        self._tail_breath[slot] = 0
+        self._heart_peaks[slot], self._breath_peaks[slot] = self._new_peak_detectors()
+        self._heart_spectrum.reset([slot])
+        self._breath_spectrum.reset([slot])
+
+    def reset(self, device_id):
+        """Starts a device's signal over, e.g. after a gap or a vitals mode switch."""
+        if device_id in self._slots:
+            self._clear(self._slots[device_id])
+
+    def retain(self, device_ids):
+        """Frees the rows of every device not in device_ids."""
+        keep = set(device_ids)
+        for device_id in list(self._slots):
+            if device_id not in keep:
+                self._free.append(self._slots.pop(device_id))
+
+    def process(
+        self,
+        device_ids,
+        new_samples,
+        prev_heart_vals,
+        prev_breath_vals,
+        timestamps=None,
+    ):
+        """
+        Filters the new samples of every device, continuing from its previous call, and
+        estimates the rates over its latest window.
+
+        device_ids: (k,) devices, no repeats, new ones get a row
+        new_samples: (k, n) raw samples of each device since its previous call, n >= 1
+        prev_heart_vals, prev_breath_vals: (k,) previous exported rates, 0 for none
+        timestamps: (k, n) timestamp of every new sample, reported with the beats
+
+        returns: dict of per-device results, row i for device_ids[i]
+            - filtered_heart, filtered_breath: (k, n) filtered new samples
+            - heart_rate_bpm, breathing_rate: (k,) int rates per minute
+            - heart_rate_fft, breathing_rate_fft: (k,) spectral rates, 0 if weak
+            - heart_beats, breaths: k lists of beat and breath timestamps
+        """
+        new_samples = np.asarray(new_samples, dtype=float).reshape(len(device_ids), -1)
+        slots = np.array(
+            [self._slot(device_id) for device_id in device_ids], dtype=np.intp
+        )
+
+        # Delay lines of new devices start settled on their first sample
+        new = slots[~self._started[slots]]
+        if len(new):
+            first = new_samples[~self._started[slots], 0]
+            self._zi_heart[:, new] = (
+                sosfilt_zi(self.sos_heart)[:, None, :] * first[:, None]
+            )
+            self._zi_breath[:, new] = (
+                sosfilt_zi(self.sos_breath)[:, None, :] * first[:, None]
+            )
+            self._started[new] = True
+
+        heart, self._zi_heart[:, slots] = sosfilt(
+            self.sos_heart, new_samples, axis=-1, zi=self._zi_heart[:, slots]
+        )
+        breath, self._zi_breath[:, slots] = sosfilt(
+            self.sos_breath, new_samples, axis=-1, zi=self._zi_breath[:, slots]
+        )
+        filtered_heart = self._smooth(heart, self._tail_heart, slots, self.kernel_heart)
+        filtered_breath = self._smooth(
+            breath, self._tail_breath, slots, self.kernel_breath
+        )
+
+        self._heart_spectrum.update(slots, filtered_heart)
+        self._breath_spectrum.update(slots, filtered_breath)
+
+        heart_beats, breaths = [], []
+        heart_counts = np.empty(len(slots))
+        breath_counts = np.empty(len(slots))
+        for i, slot in enumerate(slots):
+            row_timestamps = None if timestamps is None else timestamps[i]
+            heart_peaks = self._heart_peaks[slot]
+            breath_peaks = self._breath_peaks[slot]
+            heart_beats.append(
+                [
+                    timestamp
+                    for _, timestamp in heart_peaks.update(
+                        filtered_heart[i], row_timestamps
+                    )
+                ]
+            )
+            breaths.append(
+                [
+                    timestamp
+                    for _, timestamp in breath_peaks.update(
+                        filtered_breath[i], row_timestamps
+                    )
+                ]
+            )
+            heart_counts[i] = heart_peaks.beats_in_window()
+            breath_counts[i] = breath_peaks.beats_in_window()
+
+        samples_seen = self._heart_spectrum.samples_seen[slots]
+        return {
+            "filtered_heart": filtered_heart,
+            "filtered_breath": filtered_breath,
+            "heart_rate_bpm": self._batch_rate(
+                heart_counts, samples_seen, prev_heart_vals
+            ),
+            "breathing_rate": self._batch_rate(
+                breath_counts, samples_seen, prev_breath_vals
+            ),
+            "heart_beats": heart_beats,
+            "breaths": breaths,
+            "heart_rate_fft": self._batch_spectral_rate(self._heart_spectrum, slots),
+            "breathing_rate_fft": self._batch_spectral_rate(
+                self._breath_spectrum, slots
+            ),
+        }
+
+    def _smooth(self, filtered, tails, slots, kernel):
+        """
+        Causal moving average of (k, n) samples, continuing from each row's last inputs.
+        The centred average of the batch pipeline would need future samples.
+        """
+        padded = np.concatenate((tails[slots], filtered), axis=1)
+        tails[slots] = padded[:, padded.shape[1] - tails.shape[1] :]
+        # One shifted slice per tap, the kernels are only a few taps long
+        n = filtered.shape[1]
+        smoothed = kernel[-1] * padded[:, :n]
+        for tap in range(1, len(kernel)):
+            smoothed += kernel[-1 - tap] * padded[:, tap : tap + n]
+        return smoothed
+
+    def _batch_rate(self, counts, samples_seen, prev_vals):
+        """
+        Beats in each row's window per minute, smoothed with the previous value like
+        heart_peak_detect.
+        """
+        window = np.minimum(samples_seen, self.window_size) / self.sample_rate
+        rates = counts / window * 60
+        prev_vals = np.asarray(prev_vals, dtype=float)
+        # Subsequent runs (2/3 * current_value + 1/3 * previous_value = new)
+        rates = np.where(prev_vals != 0, (rates * 2 + prev_vals) / 3, rates)
+        return rates.astype(int)
+
+    def _batch_spectral_rate(self, spectra, slots):
+        """
+        Rate per minute at each row's spectral peak, 0 before 60 samples or when the peak
+        isn't at least twice the band's mean, like estimate_heart_rate_fft.
+        """
+        frequencies, confidence = spectra.dominant(slots)
+        valid = (spectra.samples_seen[slots] >= 60) & (confidence >= 2)
+        return np.where(valid, frequencies * 60, 0.0)
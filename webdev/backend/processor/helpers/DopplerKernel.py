@@ -0,0 +1,109 @@
+import numpy as np
+
+try:
+    import numba  # type: ignore
+except ImportError:
+    numba = None
+
+NUM_CHIRPS = 32
+NUM_SAMPLES = 64
+TOP_K = 7
+# Bins shortlisted on squared magnitude before the exact |rd| ranking. Squaring can round
+# two nearly equal bins into the other order, a few spare candidates absorb that.
+NUM_CANDIDATES = 16
+
+
+def _top_power_numpy(spectrum, power, candidates):
+    """Indices of the NUM_CANDIDATES largest |rd|^2 bins of every frame (NumPy backend)."""
+    np.multiply(spectrum.real, spectrum.real, out=power)
+    power += spectrum.imag * spectrum.imag
+    candidates[:] = np.argpartition(power, -NUM_CANDIDATES, axis=1)[:, -NUM_CANDIDATES:]
+
+
+if numba is not None:
+
+    @numba.njit(cache=True, nogil=True)
+    def _top_power_numba(spectrum, power, candidates):
+        """Single pass over each spectrum keeping a running shortlist (Numba backend)."""
+        for n in range(spectrum.shape[0]):
+            best = power[n, :NUM_CANDIDATES]
+            for i in range(NUM_CANDIDATES):
+                best[i] = -1.0
+            lowest = 0
+            for i in range(spectrum.shape[1]):
+                value = spectrum[n, i]
+                p = value.real * value.real + value.imag * value.imag
+                if p > best[lowest]:
+                    best[lowest] = p
+                    candidates[n, lowest] = i
+                    # Find the new weakest entry of the shortlist
+                    lowest = 0
+                    for j in range(1, NUM_CANDIDATES):
+                        if best[j] < best[lowest]:
+                            lowest = j
+
+
+class DopplerKernel:
+    """
+    Fused frame -> scalar reduction for stacks of (32, 64) frames.
+
+    Same result as frame_to_scalar in processor.py (mean removal, /4096, 2D FFT, top-7
+    of 20*log10(|rd| + 1e-10), mean, sign flip) but without building the dB map:
+    log10 is monotonic, so the top bins are picked on |rd|^2 and only the 7 winners are
+    converted to dB. The per-bin values are computed exactly as frame_to_scalar does.
+
+    Scratch buffers are allocated once and grown when a larger batch arrives, so an
+    instance must only be used from one thread at a time.
+    """
+
+    backend = "numba" if numba is not None else "numpy"
+
+    def __init__(self, max_frames=64):
+        """
+        Parameters:
+            - max_frames: Batch size the scratch buffers are first allocated for
+        """
+        self._allocate(max_frames)
+
+    def _allocate(self, max_frames):
+        self.max_frames = max_frames
+        self._frames = np.empty((max_frames, NUM_CHIRPS, NUM_SAMPLES))
+        self._means = np.empty((max_frames, 1, 1))
+        self._spectrum = np.empty((max_frames, NUM_CHIRPS, NUM_SAMPLES), np.complex128)
+        self._power = np.empty((max_frames, NUM_CHIRPS * NUM_SAMPLES))
+        self._candidates = np.empty((max_frames, NUM_CANDIDATES), np.intp)
+
+    def scalars(self, frames):
+        """
+        frames: (N, 32, 64) or (N, 2048) array of raw ADC samples
+
+        returns: (N,) float64 array, one integrated scalar per frame
+        """
+        frames = np.asarray(frames).reshape(-1, NUM_CHIRPS, NUM_SAMPLES)
+        n = frames.shape[0]
+        if n > self.max_frames:
+            self._allocate(n)
+
+        # Remove DC Offset (per frame mean) and Normalize by the 12-bit ADC max value
+        frames_float = self._frames[:n]
+        frames_float[...] = frames
+        means = np.mean(frames_float, axis=(1, 2), keepdims=True, out=self._means[:n])
+        np.subtract(frames_float, means, out=frames_float)
+        np.divide(frames_float, 4096.0, out=frames_float)
+
+        # 2D FFT of every frame. No fftshift, the bin order doesn't matter for the top-7.
+        spectrum = np.fft.fft2(frames_float, axes=(1, 2), out=self._spectrum[:n])
+        spectrum = spectrum.reshape(n, -1)
+
+        candidates = self._candidates[:n]
+        if numba is not None:
+            _top_power_numba(spectrum, self._power[:n], candidates)
+        else:
+            _top_power_numpy(spectrum, self._power[:n], candidates)
+
+        # Exact |rd| of the shortlist, top-7 of those, then dB for the 7 winners only
+        magnitudes = np.abs(np.take_along_axis(spectrum, candidates, axis=1))
+        top = np.partition(magnitudes, -TOP_K, axis=1)[:, -TOP_K:]
+        integrated = 20 * np.log10(top + 1e-10)
+        # Invert sign - doppler values record negative
+        return -np.mean(integrated, axis=1)
@@ -0,0 +1,140 @@
+import heapq
+import math
+import time
+from collections import deque
+
+
+class JitterBuffer:
+    """
+    Per-device jitter buffer keyed on the firmware timestamp_ms of each frame scalar.
+
+    Every scalar is held for `delay` seconds after it arrives, when that runs out its
+    device releases its oldest pending timestamp. This puts frames handed over out of
+    order (by a pool of frame workers, or redelivered by MQTT) back in order with a
+    bounded latency. A scalar older than one already released for its device is dropped
+    and counted in late_frames, as are repeated timestamps.
+
+    Released scalars are linearly interpolated onto a uniform 1 / frame_rate grid that
+    starts at the device's first frame, so the slow-time signal follows real time rather
+    than arrival order. Frames lost on the way (QoS 0 drops) become interpolated samples.
+    Gaps longer than max_gap aren't bridged, the grid restarts at the next frame. Lost
+    frames are counted in missing_frames either way.
+
+    Phase scalars (mode "phase") are unwrapped here, the first place that sees a device's
+    frames in timestamp order: each one is moved by whole turns to within pi of the
+    previous released phase, so interpolation and the slow-time signal stay continuous.
+    Doppler scalars and phases don't mix: the first frame after a device switches modes
+    restarts its grid, like a gap, instead of being unwrapped or interpolated against the
+    other mode's last value.
+    """
+
+    def __init__(self, frame_rate=15, delay=0.5, max_gap=1.0):
+        """
+        Parameters:
+            - frame_rate: Output sample rate (Hz), the firmware frame rate
+            - delay: Seconds a scalar waits for older frames of its device
+            - max_gap: Longest gap (s) filled by interpolation
+        """
+        self.period_ms = 1000.0 / frame_rate
+        self.delay = delay
+        self.max_gap_ms = max_gap * 1000.0
+        # device_id -> {"pending": heap of (timestamp, arrival number, item),
+        #               "previous": (timestamp, scalar) last released, "next_grid": ms}
+        self._devices = {}
+        # (arrival time, device_id) of every held scalar, in arrival order
+        self._arrivals = deque()
+        self._arrival_count = 0
+        # Legacy frames without a timestamp can't be placed, they skip the buffer
+        self._untimed = []
+
+        self.late_frames = 0
+        self.missing_frames = 0
+
+    def push(self, item, now=None):
+        """Adds a {"device", "data", "timestamp"} item."""
+        device_id = item["device"]
+        timestamp = item["timestamp"]
+        if timestamp is None:
+            self._untimed.append(item)
+            return
+
+        state = self._devices.get(device_id)
+        if state is None:
+            state = self._devices[device_id] = {
+                "pending": [],
+                "previous": None,
+                "next_grid": 0.0,
+                "mode": None,  # Vitals mode of the previous released frame
+            }
+        if state["previous"] is not None and timestamp <= state["previous"][0]:
+            self.late_frames += 1
+            return
+
+        self._arrival_count += 1
+        heapq.heappush(state["pending"], (timestamp, self._arrival_count, item))
+        self._arrivals.append((time.time() if now is None else now, device_id))
+
+    def pop_ready(self, now=None):
+        """
+        Returns the grid samples whose frames' hold time has passed, as items like the
+        pushed ones in timestamp order per device.
+        """
+        now = time.time() if now is None else now
+        ready = self._untimed
+        self._untimed = []
+        while self._arrivals and self._arrivals[0][0] + self.delay <= now:
+            device_id = self._arrivals.popleft()[1]
+            state = self._devices[device_id]
+            timestamp, _, item = heapq.heappop(state["pending"])
+            self._resample(state, timestamp, item, ready)
+        return ready
+
+    def _resample(self, state, timestamp, item, ready):
+        scalar = item["data"]
+        previous = state["previous"]
+        if previous is not None and timestamp <= previous[0]:
+            # Pushed before an older frame of the same device was released
+            self.late_frames += 1
+            return
+
+        mode = item.get("mode", "doppler")
+        if mode != state["mode"]:
+            # New mode, nothing to unwrap or interpolate against
+            previous = None
+            state["mode"] = mode
+
+        if previous is not None and mode == "phase":
+            # Unwrap: take the step from the previous phase in [-pi, pi)
+            step = (scalar - previous[1] + math.pi) % (2 * math.pi) - math.pi
+            scalar = previous[1] + step
+
+        if previous is not None:
+            missed = round((timestamp - previous[0]) / self.period_ms) - 1
+            self.missing_frames += max(missed, 0)
+
+        if previous is None or timestamp - previous[0] > self.max_gap_ms:
+            # First frame, or a gap too long to bridge: restart the grid here
+            previous = (timestamp, scalar)
+            state["next_grid"] = float(timestamp)
+
+        previous_timestamp, previous_scalar = previous
+        while state["next_grid"] <= timestamp:
+            grid_time = state["next_grid"]
+            if timestamp == previous_timestamp:
+                value = scalar
+            else:
+                weight = (grid_time - previous_timestamp) / (
+                    timestamp - previous_timestamp
+                )
+                value = previous_scalar + (scalar - previous_scalar) * weight
+            # Other fields (e.g. range_gate) are taken from the newer frame
+            ready.append({**item, "data": value, "timestamp": round(grid_time)})
+            state["next_grid"] += self.period_ms
+
+        state["previous"] = (timestamp, scalar)
+
+    def forget(self, device_id):
+        """Drops the state of a device that left the fleet."""
+        state = self._devices.get(device_id)
+        if state is not None and not state["pending"]:
+            del self._devices[device_id]
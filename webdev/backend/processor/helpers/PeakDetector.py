@@ -0,0 +1,111 @@
+from collections import deque
+
+
+class PeakDetector:
+    """
+    Incremental peak detector for a filtered slow-time signal, one per device and signal.
+
+    Samples are consumed as they arrive and every detected peak (a heartbeat or a breath)
+    is emitted once as a (sample index, timestamp) event, so beats that straddle the edge
+    of a window are neither lost nor counted twice and nothing is rescanned.
+
+    The constraints follow the scipy.signal.find_peaks call of the batch pipeline:
+        - prominence: a peak must rise this far above the lowest point since the previous
+          peak, and the signal must fall this far below it before it is confirmed
+        - distance: of two peaks closer than this many samples, only the higher one counts
+    A peak is emitted once no later peak can be within distance of it, a few samples after
+    the signal turns. State is a handful of scalars plus the beats inside the rate window.
+    """
+
+    def __init__(self, distance, prominence, window):
+        """
+        Parameters:
+            - distance: Minimum number of samples between peaks
+            - prominence: Minimum rise and fall around a peak
+            - window: Samples over which beats_in_window() counts
+        """
+        self.distance = max(distance, 1)
+        self.prominence = prominence
+        self.window = window
+
+        self._index = -1  # Index of the last sample consumed
+        # Running extreme: the highest sample while rising, the lowest while falling.
+        # The stream starts falling, so the first peak also needs a rise from a trough.
+        self._rising = False
+        self._extreme = None  # (index, value, timestamp)
+        # Confirmed peak still waiting out `distance` for a higher neighbour
+        self._pending = None
+        # (index, timestamp) of the emitted beats inside the window
+        self._beats = deque()
+
+    def update(self, samples, timestamps=None):
+        """
+        Consumes new samples (and their timestamps, if any).
+
+        returns: list of (sample index, timestamp) of the beats emitted by these samples
+        """
+        events = []
+        prominence = self.prominence
+        for i, value in enumerate(samples):
+            self._index += 1
+            timestamp = None if timestamps is None else timestamps[i]
+            extreme = self._extreme
+
+            if extreme is None:
+                self._extreme = (self._index, value, timestamp)
+            elif self._rising:
+                if value > extreme[1]:
+                    self._extreme = (self._index, value, timestamp)
+                elif value < extreme[1] - prominence:
+                    # Fell far enough: the maximum is a peak, now look for the trough
+                    self._confirm(extreme, events)
+                    self._rising = False
+                    self._extreme = (self._index, value, timestamp)
+            else:
+                if value < extreme[1]:
+                    self._extreme = (self._index, value, timestamp)
+                elif value > extreme[1] + prominence:
+                    # Rose far enough from the trough: look for the next maximum
+                    self._rising = True
+                    self._extreme = (self._index, value, timestamp)
+
+            # Later peaks can't be before the running extreme, so once it's `distance` past
+            # the pending peak nothing can replace that one any more
+            pending = self._pending
+            if pending is not None and self._extreme[0] - pending[0] >= self.distance:
+                self._emit(pending, events)
+                self._pending = None
+
+        # Beats that slid out of the window
+        while self._beats and self._beats[0][0] <= self._index - self.window:
+            self._beats.popleft()
+        return events
+
+    def _confirm(self, peak, events):
+        pending = self._pending
+        if pending is not None and peak[0] - pending[0] < self.distance:
+            # Too close to the pending peak, keep the higher of the two
+            if peak[1] > pending[1]:
+                self._pending = peak
+            return
+        if pending is not None:
+            self._emit(pending, events)
+        self._pending = peak
+
+    def _emit(self, peak, events):
+        beat = (peak[0], peak[2])
+        events.append(beat)
+        self._beats.append(beat)
+
+    def beats_in_window(self):
+        """Number of beats emitted within the last `window` samples."""
+        return len(self._beats)
+
+    def intervals(self):
+        """Sample gaps between consecutive beats in the window."""
+        indices = [index for index, _ in self._beats]
+        return [later - earlier for earlier, later in zip(indices, indices[1:])]
+
+    @property
+    def samples_seen(self):
+        return self._index + 1
@@ -0,0 +1,119 @@
+import numpy as np
+
+NUM_CHIRPS = 32
+NUM_SAMPLES = 64
+NUM_RANGE_BINS = NUM_SAMPLES // 2 + 1  # Non-redundant bins of the real range FFT
+
+
+class RangeGate:
+    """
+    Adaptive range gate: tracks the subject's range bin for every device and reduces
+    frames to scalars over a few range bins around it instead of the whole Doppler map.
+
+    The gate follows DistanceAlgo.compute_distance on the demo board: the range FFT
+    magnitude is averaged over the chirps of a frame, the nearest `skip` bins (antenna
+    leakage) are ignored and the strongest remaining bin is the subject. Here the profile
+    is also smoothed with an exponential moving average over `interval` seconds, so the
+    gate moves slowly and isn't pulled around by single frames.
+
+    The scalar is the same integration as frame_to_scalar (top-7 dB bins of the 2D FFT
+    of the mean removed, /4096 frame) restricted to the gated range bins. Range bins with
+    a mirrored twin in the full map are counted twice, as they are there, so a gate over
+    every bin gives exactly the frame_to_scalar value.
+
+    phases() is the alternative phase-based reduction: the unit tracks the same subject bin
+    and returns the phase of the chirp-averaged range FFT there, which follows the chest
+    displacement (4 pi d / wavelength) instead of the Doppler energy.
+    """
+
+    def __init__(self, num_bins=5, interval=10.0, frame_rate=15, skip=4):
+        """
+        Parameters:
+            - num_bins: Range bins covered by the gate, centred on the subject
+            - interval: Time constant (s) of the range profile average
+            - frame_rate: Frames per second, to turn the interval into frames
+            - skip: Nearest range bins never picked as the subject
+        """
+        self.num_bins = min(num_bins, NUM_RANGE_BINS)
+        self.alpha = 1.0 / max(interval * frame_rate, 1.0)
+        self.skip = skip
+        # device_id -> smoothed (33,) range profile
+        self._profiles = {}
+
+    def scalars(self, device_ids, frames):
+        """
+        device_ids: device of every frame, frames of a device in time order
+        frames: (N, 32, 64) array of raw ADC samples
+
+        returns: (scalars, gates), a (N,) float64 array and the (N,) gate centre bins
+        """
+        frames = np.asarray(frames).reshape(-1, NUM_CHIRPS, NUM_SAMPLES)
+        frames_float = frames.astype(float)
+        frames_normalized = (
+            frames_float - np.mean(frames_float, axis=(1, 2), keepdims=True)
+        ) / 4096.0
+
+        # Range FFT of every chirp, then the per-frame range profile
+        range_fft = np.fft.rfft(frames_normalized, axis=2)
+        profiles = np.abs(range_fft).mean(axis=1)
+
+        gates = self._track(device_ids, profiles)
+
+        # Gate window, shifted inwards at the edges of the range axis
+        start = np.clip(gates - self.num_bins // 2, 0, NUM_RANGE_BINS - self.num_bins)
+        columns = start[:, None] + np.arange(self.num_bins)
+        gated = np.take_along_axis(range_fft, columns[:, None, :], axis=2)
+
+        # Doppler FFT over the chirps of the gated range bins only
+        magnitudes = np.abs(np.fft.fft(gated, axis=1))
+
+        # DC and Nyquist range bins have no mirrored twin, the others count twice
+        has_twin = (columns > 0) & (columns < NUM_RANGE_BINS - 1)
+        twins = np.where(has_twin[:, None, :], magnitudes, -np.inf)
+        cells = np.concatenate((magnitudes, twins), axis=2).reshape(len(frames), -1)
+
+        # Integration: average the 7 highest energy cells, dB for those 7 only
+        top = np.partition(cells, -7, axis=1)[:, -7:]
+        integrated = 20 * np.log10(top + 1e-10)
+        # Invert sign - doppler values record negative
+        return -np.mean(integrated, axis=1), gates
+
+    def phases(self, device_ids, frames):
+        """
+        device_ids: device of every frame, frames of a device in time order
+        frames: (N, 32, 64) array of raw ADC samples
+
+        returns: (phases, gates), the (N,) wrapped phases in (-pi, pi] of the subject bin
+        and the (N,) subject bins. Unwrapping over slow time is left to the consumer, which
+        sees every device's frames in timestamp order.
+        """
+        frames = np.asarray(frames).reshape(-1, NUM_CHIRPS, NUM_SAMPLES)
+        # The range FFT is linear, so averaging the chirps first gives the chirp-averaged
+        # range FFT with a single 64 point transform per frame. The mean removal only
+        # touches the DC bin, which is never the subject.
+        chirp_mean = frames.mean(axis=1) / 4096.0
+        range_fft = np.fft.rfft(chirp_mean, axis=1)
+
+        # Coherent profile: a still subject peaks in the same bin as in the mean of the
+        # per-chirp magnitudes used by scalars(), so both share the tracked profile
+        gates = self._track(device_ids, np.abs(range_fft))
+        return np.angle(range_fft[np.arange(len(frames)), gates]), gates
+
+    def _track(self, device_ids, profiles):
+        """Folds each frame's (33,) range profile into its device's average, returns the gates."""
+        gates = np.empty(len(profiles), dtype=np.intp)
+        for i, device_id in enumerate(device_ids):
+            profile = self._profiles.get(device_id)
+            if profile is None:
+                profile = self._profiles[device_id] = profiles[i].copy()
+            else:
+                profile += self.alpha * (profiles[i] - profile)
+            gates[i] = np.argmax(profile[self.skip :]) + self.skip
+        return gates
+
+    def retain(self, device_ids):
+        """Forgets the range profile of every device not in device_ids."""
+        keep = set(device_ids)
+        for device_id in list(self._profiles):
+            if device_id not in keep:
+                del self._profiles[device_id]
@@ -0,0 +1,142 @@
+import multiprocessing
+import queue
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from common.frame_codec import MAX_DEVICE_ID_BYTES
+
+# One frame scalar on its way from the frame stage to the signal stage
+RECORD_DTYPE = np.dtype(
+    [
+        ("timestamp", "<i8"),
+        ("scalar", "<f8"),
+        ("range_gate", "<i2"),
+        ("mode", "<i1"),
+        ("device", f"S{MAX_DEVICE_ID_BYTES}"),
+    ]
+)
+# Stored when a (legacy JSON) frame carried no timestamp
+NO_TIMESTAMP = -1
+# Stored when the scalar integrated the whole Doppler map
+NO_RANGE_GATE = -1
+# Frame reductions, stored as their index (see VITALS_MODES in processor.py)
+MODES = ("doppler", "phase")
+
+
+class ScalarRing:
+    """
+    Single-consumer ring buffer of frame scalars in shared memory. With one producer
+    (the default) put() takes no lock, a pool of producers shares a lock around it.
+
+    Drop-in for the multiprocessing.Queue between frame_processor and signal_processor:
+    put() takes and get() returns the same {"device", "data", "timestamp", "range_gate",
+    "mode"} dicts, but records are written straight into a fixed-size NumPy array
+    instead of being pickled and sent through a feeder thread and a pipe.
+
+    Two semaphores count the filled and free slots, so a consumer waiting on an empty ring
+    (or a producer on a full one) sleeps in the kernel instead of spinning. They also
+    order the record writes against the reads across processes.
+    """
+
+    def __init__(self, capacity=4096, multi_producer=False):
+        """
+        Parameters:
+            - capacity: Number of records the ring holds before put() has to wait
+            - multi_producer: Serialize put() for several producer processes
+        """
+        self.capacity = capacity
+        self._put_lock = multiprocessing.Lock() if multi_producer else None
+        self._items = multiprocessing.Semaphore(0)
+        self._slots = multiprocessing.Semaphore(capacity)
+        self._shm = shared_memory.SharedMemory(
+            create=True, size=16 + capacity * RECORD_DTYPE.itemsize
+        )
+        self._map_views()
+        self._positions[:] = 0
+
+    def _map_views(self):
+        # [head, tail]: records read by the consumer, records written by the producer
+        self._positions = np.ndarray((2,), dtype=np.int64, buffer=self._shm.buf)
+        self._records = np.ndarray(
+            (self.capacity,), dtype=RECORD_DTYPE, buffer=self._shm.buf, offset=16
+        )
+
+    # Child processes started with spawn re-attach to the block by name
+    def __getstate__(self):
+        return {
+            "capacity": self.capacity,
+            "put_lock": self._put_lock,
+            "items": self._items,
+            "slots": self._slots,
+            "name": self._shm.name,
+        }
+
+    def __setstate__(self, state):
+        self.capacity = state["capacity"]
+        self._put_lock = state["put_lock"]
+        self._items = state["items"]
+        self._slots = state["slots"]
+        self._shm = shared_memory.SharedMemory(name=state["name"])
+        self._map_views()
+
+    def put(self, item, block=True, timeout=None):
+        """Producer side. Raises queue.Full if no slot frees up within timeout."""
+        device = item["device"].encode()
+        if len(device) > RECORD_DTYPE["device"].itemsize:
+            raise ValueError(f"Device id '{item['device']}' is too long for the ring")
+        if not self._slots.acquire(block, timeout):
+            raise queue.Full
+
+        if self._put_lock is not None:
+            self._put_lock.acquire()
+        try:
+            tail = int(self._positions[1])
+            record = self._records[tail % self.capacity]
+            timestamp = item["timestamp"]
+            record["timestamp"] = NO_TIMESTAMP if timestamp is None else timestamp
+            record["scalar"] = item["data"]
+            range_gate = item.get("range_gate")
+            record["range_gate"] = NO_RANGE_GATE if range_gate is None else range_gate
+            record["mode"] = MODES.index(item.get("mode", "doppler"))
+            record["device"] = device
+            self._positions[1] = tail + 1
+            # Published while still holding the lock so records are read in write order
+            self._items.release()
+        finally:
+            if self._put_lock is not None:
+                self._put_lock.release()
+
+    def get(self, block=True, timeout=None):
+        """Consumer side. Raises queue.Empty if nothing arrives within timeout."""
+        if not self._items.acquire(block, timeout):
+            raise queue.Empty
+
+        head = int(self._positions[0])
+        timestamp, scalar, range_gate, mode, device = self._records[
+            head % self.capacity
+        ].item()
+        self._positions[0] = head + 1
+
+        self._slots.release()
+        return {
+            "device": device.decode(),
+            "data": scalar,
+            "timestamp": None if timestamp == NO_TIMESTAMP else timestamp,
+            "range_gate": None if range_gate == NO_RANGE_GATE else range_gate,
+            "mode": MODES[mode],
+        }
+
+    def qsize(self):
+        return int(self._positions[1] - self._positions[0])
+
+    def empty(self):
+        return self.qsize() == 0
+
+    def close(self):
+        self._positions = self._records = None
+        self._shm.close()
+
+    def unlink(self):
+        """Frees the block, called once by the process that created it."""
+        self._shm.unlink()
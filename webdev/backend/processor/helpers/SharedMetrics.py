@@ -0,0 +1,143 @@
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Monotonic counters, one row per writer process
+COUNTERS = (
+    "process_data_count",
+    "process_data_length",
+    "frames_processed_count",
+    "processed_data_pushed_count",
+    "late_frame_count",
+    "missing_frame_count",
+)
+# Short text samples shown in the throughput log
+SAMPLES = ("ingested_frame", "processed_scalar", "range_gate", "pushed_output")
+SAMPLE_BYTES = 128
+
+
+class SharedMetrics:
+    """
+    Pipeline metrics in one multiprocessing.shared_memory block.
+
+    Every process writes only to its own slot (see slot()), so the hot path never takes a
+    lock or makes an IPC round trip. Counters only grow: the monitor sums all slots and
+    logs the difference since its previous read.
+
+    Samples are published under a per-slot sequence number (a seqlock): the writer makes
+    it odd while writing and even when done, a reader retries if it changed under it.
+    """
+
+    def __init__(self, num_slots, name=None):
+        """
+        Parameters:
+            - num_slots: Number of writer processes
+            - name: Attach to an existing block instead of creating one
+        """
+        self.num_slots = num_slots
+        size = self._layout_size(num_slots)
+        if name is None:
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+            self._shm.buf[:size] = bytes(size)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+        self._map_views()
+
+    @staticmethod
+    def _layout_size(num_slots):
+        return num_slots * (
+            8 * len(COUNTERS)  # counters, int64
+            + 8  # sequence number, int64
+            + 8 * len(SAMPLES)  # sample write times, float64
+            + 8 * len(SAMPLES)  # sample lengths, int64
+            + SAMPLE_BYTES * len(SAMPLES)  # sample text
+        )
+
+    def _map_views(self):
+        n = self.num_slots
+        offset = 0
+
+        def view(dtype, shape):
+            nonlocal offset
+            array = np.ndarray(shape, dtype=dtype, buffer=self._shm.buf, offset=offset)
+            offset += array.nbytes
+            return array
+
+        self._counters = view(np.int64, (n, len(COUNTERS)))
+        self._sequence = view(np.int64, (n,))
+        self._sample_times = view(np.float64, (n, len(SAMPLES)))
+        self._sample_lengths = view(np.int64, (n, len(SAMPLES)))
+        self._sample_bytes = view(np.uint8, (n, len(SAMPLES), SAMPLE_BYTES))
+
+    # Child processes started with spawn re-attach to the block by name
+    def __getstate__(self):
+        return {"num_slots": self.num_slots, "name": self._shm.name}
+
+    def __setstate__(self, state):
+        self.num_slots = state["num_slots"]
+        self._shm = shared_memory.SharedMemory(name=state["name"])
+        self._map_views()
+
+    def slot(self, index):
+        """Returns the writer for one process. Each slot must have a single writer."""
+        return MetricsSlot(self, index)
+
+    def totals(self):
+        """Returns {counter: value summed over all slots} since the block was created."""
+        summed = self._counters.sum(axis=0)
+        return {name: int(summed[i]) for i, name in enumerate(COUNTERS)}
+
+    def sample(self, name):
+        """Returns (text, write time) of the newest sample across slots, or (None, 0.0)."""
+        s = SAMPLES.index(name)
+        newest = (None, 0.0)
+        for slot in range(self.num_slots):
+            while True:
+                before = int(self._sequence[slot])
+                if before % 2:
+                    time.sleep(0)  # Writer is mid-update, let it finish
+                    continue
+                written_at = float(self._sample_times[slot, s])
+                length = int(self._sample_lengths[slot, s])
+                data = self._sample_bytes[slot, s, :length].tobytes()
+                if int(self._sequence[slot]) == before:
+                    break
+            if length and written_at > newest[1]:
+                newest = (data.decode(errors="replace"), written_at)
+        return newest
+
+    def close(self):
+        self._counters = self._sequence = None
+        self._sample_times = self._sample_lengths = self._sample_bytes = None
+        self._shm.close()
+
+    def unlink(self):
+        """Frees the block, called once by the process that created it."""
+        self._shm.unlink()
+
+
+class MetricsSlot:
+    """Single-writer view of one SharedMetrics slot."""
+
+    def __init__(self, metrics, index):
+        self.metrics = metrics
+        self.index = index
+
+    def add(self, name, amount=1):
+        self.metrics._counters[self.index, COUNTERS.index(name)] += amount
+
+    def get(self, name):
+        """Returns this slot's own counter value."""
+        return int(self.metrics._counters[self.index, COUNTERS.index(name)])
+
+    def set_sample(self, name, text):
+        s = SAMPLES.index(name)
+        data = np.frombuffer(text.encode()[:SAMPLE_BYTES], dtype=np.uint8)
+        metrics = self.metrics
+
+        metrics._sequence[self.index] += 1  # Odd: readers retry
+        metrics._sample_bytes[self.index, s, : len(data)] = data
+        metrics._sample_lengths[self.index, s] = len(data)
+        metrics._sample_times[self.index, s] = time.time()
+        metrics._sequence[self.index] += 1  # Even: sample is consistent again
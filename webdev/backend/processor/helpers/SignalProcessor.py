@@ -1,48 +1,62 @@
-from scipy.signal import butter, lfilter, find_peaks
+from scipy.signal import lfilter, find_peaks
 from scipy import signal
 import numpy as np
 
+from common.pipeline_config import DEFAULT_PIPELINE, compile_pipeline
+
 
 class SignalProcessor:
     # Implements signal processing pipeline
 
-    def __init__(self, sample_rate):
+    def __init__(self, sample_rate, pipeline=None):
+        """
+        Parameters:
+            - sample_rate: Samples per second of the slow-time signal
+            - pipeline: Pipeline spec (see common.pipeline_config), DEFAULT_PIPELINE if None
+        """
         self.sample_rate = sample_rate  # 15 frames per second default
         self.nyquist = sample_rate / 2  # Nyquist frequency
 
-        # Heart Filters
-        # MTI Highpass Filter
-        self.hp_b_heart, self.hp_a_heart = butter(3, 0.3 / self.nyquist, "highpass")
-        # Bandpass Filter: 48-150bpm range
-        self.bp_b_heart, self.bp_a_heart = butter(
-            6, [0.8 / self.nyquist, 2.5 / self.nyquist], "band"
-        )
-
-        # Breathing filters
-        # MTI Highpass filter
-        self.hp_b_breath, self.hp_a_breath = butter(3, 0.07 / self.nyquist, "highpass")
-        # Bandpass Filter: 4-24bpm range
-        self.bp_b_breath, self.bp_a_breath = butter(
-            3, [0.07 / self.nyquist, 0.4 / self.nyquist], "band"
+        # Filter designs come from the shared cache, so processors with the same spec
+        # don't design them again
+        self.pipeline = compile_pipeline(
+            DEFAULT_PIPELINE if pipeline is None else pipeline, sample_rate
         )
+        self.heart = self.pipeline["chains"]["heart"]
+        self.breath = self.pipeline["chains"]["breath"]
+        self.rate_window = self.pipeline["rate_window"]
 
         # Smoothing Window Kernels
-        self.kernel_heart = np.ones(3) / 3  # Window Size = 3
-        self.kernel_breath = np.ones(10) / 10  # Window Size = 10
+        self.kernel_heart = self.heart["kernel"]
+        self.kernel_breath = self.breath["kernel"]
+
+        # Same filters as second-order sections for the streaming pipeline
+        # (BatchSignalProcessor), the 6th order band-pass (12 poles) loses precision as a
+        # single transfer function. The MTI high-pass and the band-pass of a chain are one
+        # cascade, filtered in one call.
+        self.sos_heart = self.heart["sos"]
+        self.sos_breath = self.breath["sos"]
+
+    def _lfilter_stages(self, chain, signal_data, highpass):
+        # The chain's high-pass (MTI) stages, or its other stages, in order
+        for stage in chain["filters"]:
+            if (stage["type"] == "highpass") == highpass:
+                signal_data = lfilter(*stage["ba"], signal_data)
+        return signal_data
 
     # 1
     def moving_target_indicator_heart(self, signal_data):
         # MTI filter to remove static clutter
-        # 3rd order butterworth high-pass filter
-        return lfilter(
-            self.hp_b_heart, self.hp_a_heart, signal_data - np.mean(signal_data)
+        # 3rd order butterworth high-pass filter by default
+        return self._lfilter_stages(
+            self.heart, signal_data - np.mean(signal_data), highpass=True
         )
 
     def moving_target_indicator_breath(self, signal_data):
         # MTI filter to remove static clutter
-        # 3rd order butterworth high-pass filter
-        return lfilter(
-            self.hp_b_breath, self.hp_a_breath, signal_data - np.mean(signal_data)
+        # 3rd order butterworth high-pass filter by default
+        return self._lfilter_stages(
+            self.breath, signal_data - np.mean(signal_data), highpass=True
         )
 
     # 2
@@ -51,12 +65,12 @@ class SignalProcessor:
         if len(signal_data) < 20:
             return signal_data
 
-        return lfilter(self.bp_b_heart, self.bp_a_heart, signal_data)
+        return self._lfilter_stages(self.heart, signal_data, highpass=False)
 
     def bandpass_filter_breath(self, signal_data):
         if len(signal_data) < 20:
             return signal_data
-        return lfilter(self.bp_b_breath, self.bp_a_breath, signal_data)
+        return self._lfilter_stages(self.breath, signal_data, highpass=False)
 
     # 3
     def sliding_average_filter_heart(self, signal_data, window_size=3):
@@ -96,8 +110,9 @@ class SignalProcessor:
         freqs = np.fft.rfftfreq(n_fft, 1 / self.sample_rate)
         # freqs = welch(signal_data, fs=self.sample_rate, nperseg=len(signal_data)//2)
 
-        # Focus on heartbeat frequency range (0.8-2.5 Hz = 48-150 bpm)
-        valid_idx = (freqs >= 0.8) & (freqs <= 2.5)
+        # Focus on heartbeat frequency range (0.8-2.5 Hz = 48-150 bpm by default)
+        low, high = self.heart["spectrum"]
+        valid_idx = (freqs >= low) & (freqs <= high)
         valid_freqs = freqs[valid_idx]
         valid_fft = np.abs(fft_vals[valid_idx])
 
@@ -138,7 +153,9 @@ class SignalProcessor:
             # Minimum distance between peaks = 0.4s = 1 sample at 2.5 Hz
             # This corresponds to max 150 bpm
             peaks, _ = find_peaks(
-                chunk, distance=int(0.2 * frame_rate), prominence=0.035
+                chunk,
+                distance=max(self.heart["peaks"]["distance"], 1),
+                prominence=self.heart["peaks"]["prominence"],
             )
 
             num_beats = int(len(peaks))
@@ -186,7 +203,9 @@ class SignalProcessor:
             # This corresponds to max 30 breaths/min
             # prominence = 0.15 = minimum amplitude for peak detection = 0.15
             peaks, _ = find_peaks(
-                current_window, distance=int(2 * frame_rate), prominence=0.035
+                current_window,
+                distance=max(self.breath["peaks"]["distance"], 1),
+                prominence=self.breath["peaks"]["prominence"],
             )
             # Mumber of peaks
             num_breaths = len(peaks)
@@ -231,10 +250,16 @@ class SignalProcessor:
 
         # Step 4: Estimate heart rate -ATTENTION: BASED ON 20 SAMPLE PARTITION WITHIN SIGNAL_DATA, SEE ABOVE COMMENT
         bpm = self.heart_peak_detect(
-            filtered_heart, self.sample_rate, window=20, prev_val=prev_heart_val
+            filtered_heart,
+            self.sample_rate,
+            window=self.rate_window,
+            prev_val=prev_heart_val,
         )
         breath = self.breathing_peak_detect(
-            filtered_breath, self.sample_rate, window=20, prev_val=prev_breath_val
+            filtered_breath,
+            self.sample_rate,
+            window=self.rate_window,
+            prev_val=prev_breath_val,
         )
 
         return {
@@ -0,0 +1,211 @@
+import functools
+import math
+
+import numpy as np
+
+
+@functools.lru_cache(maxsize=None)
+def _plan(sample_rate, low, high, window, zero_pad):
+    """
+    Bin frequencies and the matrices of a SlidingDFTBank, shared by every instance with
+    the same parameters and kept read-only.
+    """
+    spacing = sample_rate / (window * zero_pad)
+    # The band's bins, plus zero_pad on each side: Hann needs the bins 1 / window away
+    k = np.arange(
+        math.ceil(low / spacing) - zero_pad, math.floor(high / spacing) + zero_pad + 1
+    )
+    omega = 2 * np.pi * k / (window * zero_pad)  # rad/sample
+    m = np.arange(window)
+
+    plan = {
+        "frequencies": k[zero_pad:-zero_pad] * spacing,
+        "omega": omega,
+        # Sums are referenced to the oldest sample of the window, so the newest sample
+        # enters with phase -omega (window - 1)
+        "newest_phase": np.exp(-1j * omega * (window - 1)),
+        "rotation": np.exp(1j * omega),
+        # Full DFT of a window, for the periodic resync
+        "dft": np.exp(-1j * np.outer(omega, m)),
+        # Hann windowed spectrum of a constant 1, to take the window mean out
+        "hann_dc": (0.5 - 0.5 * np.cos(2 * np.pi * m / window))
+        @ np.exp(-1j * np.outer(omega[zero_pad:-zero_pad], m)).T,
+    }
+    for array in plan.values():
+        array.flags.writeable = False
+    return plan
+
+
+# Hops are normally all the same size, the cache only has to hold a few
+@functools.lru_cache(maxsize=16)
+def _step(sample_rate, low, high, window, zero_pad, count):
+    """(bins, count) phases e^(j omega (count - 1 - i)) and e^(j omega count), per hop size."""
+    omega = _plan(sample_rate, low, high, window, zero_pad)["omega"]
+    phases = np.exp(1j * np.outer(omega, np.arange(count - 1, -1, -1)))
+    shift = np.exp(1j * omega * count)
+    phases.flags.writeable = False
+    shift.flags.writeable = False
+    return phases, shift
+
+
+def _slide(plan, step, sums, samples, leaving):
+    """
+    Block form of S(n) = e^(j omega) (S(n - 1) - x(n - window)) + x(n) e^(-j omega (window - 1))
+    over the last axis of samples and leaving, for one window or a stack of them.
+    """
+    phases, shift = step
+    return (
+        shift * sums
+        + (samples @ phases.T) * plan["newest_phase"]
+        - (leaving @ phases.T) * plan["rotation"]
+    )
+
+
+def _magnitudes(plan, sums, means, zero_pad):
+    """Hann windowed magnitudes of the mean-removed window(s) from the band bins' sums."""
+    pad = zero_pad
+    hann = (
+        0.5 * sums[..., pad:-pad]
+        - 0.25 * sums[..., : -2 * pad]
+        - 0.25 * sums[..., 2 * pad :]
+    )
+    hann -= np.multiply.outer(means, plan["hann_dc"])
+    return np.abs(hann)
+
+
+def _peaks(frequencies, magnitudes):
+    """(frequencies, peak-to-mean ratios) of the strongest bin along the last axis."""
+    mean = magnitudes.mean(axis=-1)
+    peak = np.argmax(magnitudes, axis=-1)
+    strongest = magnitudes.max(axis=-1)
+    ratio = np.divide(strongest, mean, out=np.zeros_like(mean), where=mean > 0)
+    return np.where(mean > 0, frequencies[peak], 0.0), ratio
+
+
+class SlidingDFTBank:
+    """
+    Sliding DFTs over the bins of one frequency band, e.g. 0.8-2.5 Hz for the heart rate,
+    for many signals at once (one per device). Row i of every array is one signal's
+    window, so a call updates or reads any set of rows with a few matrix products.
+
+    Mirrors SignalProcessor.estimate_heart_rate_fft (mean removed, Hann window, zero padded
+    to zero_pad x the window, peak-to-mean check) without re-transforming the window: each
+    band bin's sum is updated with the samples that enter and leave the window, O(bins)
+    per sample, and dominant() reads the spectrum at any moment.
+
+    The Hann window is applied in the frequency domain, from the bins 1 / window either
+    side of each band bin (0.5 X[k] - 0.25 X[k - 1] - 0.25 X[k + 1] at the unpadded
+    spacing). Every window samples a row's sums are recomputed exactly, so rounding errors
+    don't build up.
+
+    Rows are allocated by the caller (see BatchSignalProcessor) and grow with resize().
+    """
+
+    def __init__(self, sample_rate, low, high, window, zero_pad=4, rows=0):
+        """
+        Parameters:
+            - sample_rate: Samples per second
+            - low, high: Band edges (Hz)
+            - window: Samples in the sliding window
+            - zero_pad: Frequency grid spacing is sample_rate / (zero_pad * window)
+            - rows: Number of signals to start with
+        """
+        self._key = (sample_rate, low, high, window, zero_pad)
+        self._plan = _plan(*self._key)
+        self.frequencies = self._plan["frequencies"]
+        self.window = window
+        self.zero_pad = zero_pad
+
+        # Every row is a double-write ring like common.RingBuffer: each sample is stored at
+        # its slot and one window further on, so a row's window is always the contiguous
+        # run _samples[row, _next[row] : _next[row] + window], oldest first. A RingBuffer
+        # holds one signal, here all the rows share one array so a call reads and writes
+        # any set of rows with a single fancy index instead of a loop over buffers.
+        self._samples = np.zeros((0, 2 * window))
+        self._next = np.zeros(0, dtype=np.intp)  # Slot of each row's next sample
+        self._sums = np.zeros((0, len(self._plan["omega"])), dtype=complex)
+        self._totals = np.zeros(0)
+        self._since_resync = np.zeros(0, dtype=np.intp)
+        self.samples_seen = np.zeros(0, dtype=np.intp)
+        self.resize(rows)
+
+    def resize(self, rows):
+        """Grows the bank to at least `rows` signals, new rows start as zeros."""
+        extra = rows - len(self._totals)
+        if extra <= 0:
+            return
+        self._samples = np.vstack((self._samples, np.zeros((extra, 2 * self.window))))
+        self._next = np.concatenate((self._next, np.zeros(extra, dtype=np.intp)))
+        self._sums = np.vstack(
+            (self._sums, np.zeros((extra, self._sums.shape[1]), dtype=complex))
+        )
+        self._totals = np.concatenate((self._totals, np.zeros(extra)))
+        self._since_resync = np.concatenate(
+            (self._since_resync, np.zeros(extra, dtype=np.intp))
+        )
+        self.samples_seen = np.concatenate(
+            (self.samples_seen, np.zeros(extra, dtype=np.intp))
+        )
+
+    def reset(self, rows):
+        """Starts the given rows over from an all-zero window."""
+        self._samples[rows] = 0
+        self._next[rows] = 0
+        self._sums[rows] = 0
+        self._totals[rows] = 0
+        self._since_resync[rows] = 0
+        self.samples_seen[rows] = 0
+
+    def update(self, rows, samples):
+        """
+        rows: (k,) row indices, no repeats
+        samples: (k, count) new samples of each row
+        """
+        rows = np.asarray(rows, dtype=np.intp)
+        samples = np.asarray(samples, dtype=float)
+        count = samples.shape[1]
+        if count == 0:
+            return
+        self.samples_seen[rows] += count
+        self._since_resync[rows] += count
+
+        # Each row's slots from its oldest sample on: the leaving samples are read from
+        # them and the new samples written over them (and their copies a window further on)
+        new = samples[:, -self.window :]
+        columns = self._next[rows, None] + np.arange(new.shape[1])
+        if count < self.window:
+            leaving = self._samples[rows[:, None], columns]
+            self._sums[rows] = _slide(
+                self._plan,
+                _step(*self._key, count),
+                self._sums[rows],
+                samples,
+                leaving,
+            )
+            self._totals[rows] += samples.sum(axis=1) - leaving.sum(axis=1)
+        columns %= self.window
+        self._samples[rows[:, None], columns] = new
+        self._samples[rows[:, None], columns + self.window] = new
+        self._next[rows] = (self._next[rows] + new.shape[1]) % self.window
+
+        # Exact sums once a window, for the rows due
+        rows = rows[self._since_resync[rows] >= self.window]
+        if len(rows):
+            columns = self._next[rows, None] + np.arange(self.window)
+            windows = self._samples[rows[:, None], columns]
+            self._sums[rows] = windows @ self._plan["dft"].T
+            self._totals[rows] = windows.sum(axis=1)
+            self._since_resync[rows] = 0
+
+    def spectrum(self, rows):
+        """(k, bins) Hann windowed magnitudes of the given rows at self.frequencies."""
+        return _magnitudes(
+            self._plan,
+            self._sums[rows],
+            self._totals[rows] / self.window,
+            self.zero_pad,
+        )
+
+    def dominant(self, rows):
+        """Returns the (k,) frequencies (Hz) and peak-to-mean ratios of the given rows."""
+        return _peaks(self.frequencies, self.spectrum(rows))
@@ -1,9 +1,23 @@
-import redis, os, time, json, logging, multiprocessing
+import redis, os, sys, time, json, logging, math, multiprocessing, socket, zlib
 import numpy as np
 import humanize, queue
+from scipy import fft as sp_fft
 
 from helpers.DopplerAlgo import DopplerAlgo  # For better logging of data sizes
-from helpers.SignalProcessor import SignalProcessor
+
+# Modules shared with the ingestor and the demo board live in webdev/backend/common. The
+# Docker image copies them next to this file, in a checkout they are one directory up.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.frame_codec import MAX_DEVICE_ID_BYTES, decode_message  # noqa: E402
+from common.pipeline_config import compile_pipeline, load_pipeline  # noqa: E402
+from common.RingBuffer import RingBuffer  # noqa: E402
+from helpers.BatchSignalProcessor import BatchSignalProcessor  # noqa: E402
+from helpers.DopplerKernel import DopplerKernel  # noqa: E402
+from helpers.SharedMetrics import SharedMetrics  # noqa: E402
+from helpers.ScalarRing import ScalarRing  # noqa: E402
+from helpers.JitterBuffer import JitterBuffer  # noqa: E402
+from helpers.RangeGate import RangeGate  # noqa: E402
 
 # Setup a basic logger
 logging.basicConfig(
@@ -11,16 +25,108 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Redis keys shared with the ingestor and exporter
+#   - raw_sensor_data:<device_id>   per-device list of raw frames
+#   - processed_data:<device_id>    per-device list of vitals
+#   - active_devices                sorted set of device_id -> last frame time (epoch s)
+#   - vitals_mode                   hash of device_id -> "doppler" | "phase" (optional)
+RAW_QUEUE_PREFIX = "raw_sensor_data"
+PROCESSED_QUEUE_PREFIX = "processed_data"
+DEVICE_INDEX = "active_devices"
+VITALS_MODE_KEY = "vitals_mode"
+
+# Most raw frames popped per Redis round trip and transformed in one batched FFT
+FRAME_BATCH_SIZE = int(os.environ.get("FRAME_BATCH_SIZE", 64))
+
+# "list" pops frames from per-device lists, "stream" reads per-device Redis Streams
+# through a consumer group so several processor replicas can share the load
+FRAME_TRANSPORT = os.environ.get("FRAME_TRANSPORT", "list")
+# per-device stream "raw_sensor_stream:<device_id>"
+RAW_STREAM_PREFIX = "raw_sensor_stream"
+STREAM_GROUP = "processors"
+# Replicas share the devices, not a device's frames: a device's stream is only read by the
+# consumer (frame worker) holding its lease "stream_owner:<device_id>", so its range gate,
+# jitter buffer and vitals live in one process. Leases are renewed on every device refresh and lapse
+# STREAM_LEASE_MS after their consumer stops (e.g. crashed), then another one takes over.
+STREAM_LEASE_PREFIX = "stream_owner"
+STREAM_CONSUMERS = "stream_consumers"  # sorted set of consumer -> last lease refresh
+STREAM_LEASE_MS = int(os.environ.get("STREAM_LEASE_MS", 15000))
+STREAM_READ_COUNT = int(os.environ.get("STREAM_READ_COUNT", FRAME_BATCH_SIZE))
+# Entries left unacknowledged this long (e.g. by a crashed replica) are claimed by another consumer
+STREAM_CLAIM_IDLE_MS = int(os.environ.get("STREAM_CLAIM_IDLE_MS", 30000))
+STREAM_CLAIM_INTERVAL = 10.0
+
+# "ring" hands scalars from the frame stage to the signal stage through a shared memory
+# ring buffer (helpers/ScalarRing.py), "queue" through a multiprocessing.Queue
+SIGNAL_QUEUE = os.environ.get("SIGNAL_QUEUE", "ring")
+SIGNAL_RING_SIZE = int(os.environ.get("SIGNAL_RING_SIZE", 4096))
+
+# "float64" runs the full complex 2D FFT in double precision (reference results),
+# "float32" runs a single precision real-input FFT over the non-redundant half spectrum
+FFT_PRECISION = os.environ.get("FFT_PRECISION", "float64")
+# Threads used by scipy.fft for the float32 path on a batch of frames
+FFT_WORKERS = int(os.environ.get("FFT_WORKERS", 1))
+# Largest difference (dB) allowed between float32 and float64 scalars in the startup check
+FFT_FLOAT32_TOLERANCE = 1e-3
+
+# Scratch buffers for the float64 frame -> scalar kernel, used by the frame processor only
+doppler_kernel = DopplerKernel(max_frames=FRAME_BATCH_SIZE)
+
+# How frames become the slow-time signal of a device:
+#   - "doppler" the dB scalar of the (range gated) Doppler map, see frame_to_scalar
+#   - "phase"   the unwrapped phase of the subject's range bin, i.e. the chest displacement
+# VITALS_MODE applies to every device without an entry in the VITALS_MODE_KEY hash
+VITALS_MODES = ("doppler", "phase")
+VITALS_MODE = os.environ.get("VITALS_MODE", "doppler")
+
+# Range bins around the tracked subject that the Doppler integration covers (e.g. 5), 0
+# (the default) integrates the whole map. The gate follows a range profile averaged over
+# RANGE_GATE_INTERVAL seconds and never sits on the RANGE_GATE_SKIP nearest bins (antenna
+# leakage). The phase mode reads the phase of the same tracked bin whatever the setting.
+# The gated integration always runs in float64 NumPy (helpers/RangeGate.py), FFT_PRECISION
+# and the DopplerKernel only apply to the whole map.
+RANGE_GATE_BINS = int(os.environ.get("RANGE_GATE_BINS", 0))
+RANGE_GATE_INTERVAL = float(os.environ.get("RANGE_GATE_INTERVAL", 10.0))
+RANGE_GATE_SKIP = int(os.environ.get("RANGE_GATE_SKIP", 4))
+# Each frame worker process tracks its own gates, so every device is served by exactly
+# one worker (see owned_devices, or leased_devices for streams) and its profile is never
+# split between processes
+range_gate = RangeGate(
+    num_bins=max(RANGE_GATE_BINS, 1),
+    interval=RANGE_GATE_INTERVAL,
+    frame_rate=15,
+    skip=RANGE_GATE_SKIP,
+)
+
+# The signal stage holds each scalar this long (s) to put every device's frames back in
+# timestamp order, and fills gaps up to JITTER_MAX_GAP (s) on the 15 Hz grid
+JITTER_DELAY = float(os.environ.get("JITTER_DELAY", 0.5))
+JITTER_MAX_GAP = float(os.environ.get("JITTER_MAX_GAP", 1.0))
+
+# Vitals are estimated over the last VITALS_WINDOW seconds of a device's signal, and a new
+# estimate is pushed every VITALS_HOP seconds once the first window has filled
+VITALS_WINDOW = float(os.environ.get("VITALS_WINDOW", 20.0))
+VITALS_HOP = float(os.environ.get("VITALS_HOP", 1.0))
+# JSON pipeline spec laid over DEFAULT_PIPELINE (filter bands and orders, smoothing, peak
+# thresholds), so a new tuning is a config file rather than a code change
+PIPELINE_CONFIG = os.environ.get("PIPELINE_CONFIG")
+
+# Devices that have not sent a frame for this long are no longer polled
+DEVICE_TIMEOUT = float(os.environ.get("DEVICE_TIMEOUT", 300))
+# How often the list of active devices is re-read from the index
+DEVICE_REFRESH_INTERVAL = 5.0
+
 
 def logging_monitor(
     shutdown_flag,
-    log_lock,
-    shared_state,
+    metrics,
 ):
     """Runs in the background and wakes every 5 seconds to log the current throughput."""
 
     last_log_time = time.time()
     health_check_idle_count = 0
+    # Counters in shared memory only grow, each window logs the difference
+    previous_totals = metrics.totals()
 
     # FIX: Exit loop gracefully if shutdown is triggered
     while not shutdown_flag.is_set():
@@ -29,43 +135,45 @@ def logging_monitor(
         current_time = time.time()
         time_elapsed = current_time - last_log_time
 
-        with log_lock:
-            # Check if any part of the pipeline had activity
-            if (
-                shared_state["process_data_count"] > 0
-                or shared_state["frames_processed_count"] > 0
-                or shared_state["processed_data_pushed_count"] > 0
-            ):
-                # Calculate MB/s, guarding against division by zero
-                bytes_per_sec = (
-                    shared_state["process_data_length"] / time_elapsed
-                    if time_elapsed > 0
-                    else 0
-                )
+        totals = metrics.totals()
+        window = {name: totals[name] - previous_totals[name] for name in totals}
 
-                logger.info(
-                    f"Throughput ({time_elapsed:.1f}s): "
-                    f"Ingested {shared_state['process_data_count']} msgs ({humanize.naturalsize(bytes_per_sec)}/s) | "
-                    f"Processed {shared_state['frames_processed_count']} queued frames | "
-                    f"Pushed {shared_state['processed_data_pushed_count']} outputs to Redis out-queue.\n"
-                    f"    Sample -> Frame Max: {shared_state.get('ingested_frame', 'N/A')} | Scalar: {shared_state.get('processed_scalar', 'N/A')} | Pushed: {shared_state.get('pushed_output', 'None')}"
-                )
+        # Check if any part of the pipeline had activity
+        if (
+            window["process_data_count"] > 0
+            or window["frames_processed_count"] > 0
+            or window["processed_data_pushed_count"] > 0
+        ):
+            # Calculate MB/s, guarding against division by zero
+            bytes_per_sec = (
+                window["process_data_length"] / time_elapsed if time_elapsed > 0 else 0
+            )
 
-                # Reset the counters and clear samples
-                shared_state["process_data_count"] = 0
-                shared_state["process_data_length"] = 0
-                shared_state["frames_processed_count"] = 0
-                shared_state["processed_data_pushed_count"] = 0
-                health_check_idle_count = 0
+            ingested_frame = metrics.sample("ingested_frame")[0] or "N/A"
+            processed_scalar = metrics.sample("processed_scalar")[0] or "N/A"
+            range_gate_sample = metrics.sample("range_gate")[0] or "N/A"
+            # Only show an output pushed during this window
+            pushed_output, pushed_at = metrics.sample("pushed_output")
+            if pushed_at < last_log_time:
+                pushed_output = None
 
-                shared_state["pushed_output"] = None
-            elif health_check_idle_count < 3:  # Limit idle logs to avoid spamming
-                # OPTIONAL FIX: Give a heartbeat even when idle so you know the thread is alive
-                logger.info("Health Check: System idle. 0 messages processed.")
-                health_check_idle_count += 1
+            logger.info(
+                f"Throughput ({time_elapsed:.1f}s): "
+                f"Ingested {window['process_data_count']} msgs ({humanize.naturalsize(bytes_per_sec)}/s) | "
+                f"Processed {window['frames_processed_count']} queued frames "
+                f"({window['late_frame_count']} late, {window['missing_frame_count']} missing) | "
+                f"Pushed {window['processed_data_pushed_count']} outputs to Redis out-queue.\n"
+                f"    Sample -> Frame Max: {ingested_frame} | Scalar: {processed_scalar} | Gate: {range_gate_sample} | Pushed: {pushed_output}"
+            )
+            health_check_idle_count = 0
+        elif health_check_idle_count < 3:  # Limit idle logs to avoid spamming
+            # OPTIONAL FIX: Give a heartbeat even when idle so you know the thread is alive
+            logger.info("Health Check: System idle. 0 messages processed.")
+            health_check_idle_count += 1
 
-            # FIX: Unconditionally reset the timer so math is accurate for the next window
-            last_log_time = current_time
+        previous_totals = totals
+        # FIX: Unconditionally reset the timer so math is accurate for the next window
+        last_log_time = current_time
 
 
 # ==============================
@@ -118,54 +226,444 @@ def frame_to_scalar(frame):
     return -scalar  # Invert sign - doppler values record negative
 
 
+# Input Raw Data Frames (N, 32, 64) -> Output |Doppler Maps| (N, 32, 64), float32
+def half_spectrum_magnitudes(frames):
+    """
+    Magnitudes of the 2D FFT of a stack of real frames, computed in float32 from rfft2.
+
+    Real input gives a Hermitian spectrum, bin (k, m) mirrors bin (-k, -m), so only the
+    33 non-negative fast-time bins are transformed. Bins 1 to 31 stand for themselves and
+    their mirrored twin and are repeated, DC and Nyquist (0 and 32) appear once, which
+    gives the same 2048 magnitudes as the full map, just not in fftshift order.
+    """
+    frames_float = frames.astype(np.float32)
+    frames_normalized = (
+        frames_float - np.mean(frames_float, axis=(1, 2), keepdims=True)
+    ) / np.float32(4096.0)
+
+    rd_half = sp_fft.rfft2(frames_normalized, axes=(1, 2), workers=FFT_WORKERS)
+    magnitudes = np.abs(rd_half)
+    return np.concatenate((magnitudes, magnitudes[:, :, 1:-1]), axis=2)
+
+
+# Input Raw Data Frames (N, 32, 64) -> Output Scalars (N,)
+def frames_to_scalars(frames, precision=None):
+    """
+    Batched frame_to_scalar: one 2D FFT call over a stack of frames and a vectorized
+    top-7 integration, giving one scalar per frame.
+
+    precision: "float64" or "float32", defaults to FFT_PRECISION
+    """
+    frames = np.asarray(frames).reshape(-1, 32, 64)
+
+    if (precision or FFT_PRECISION) == "float32":
+        # The top-7 integration doesn't depend on bin order, so no fftshift is needed.
+        # dB is monotonic, so only the 7 selected magnitudes are converted.
+        magnitudes = half_spectrum_magnitudes(frames).reshape(frames.shape[0], -1)
+        top = np.partition(magnitudes, -7, axis=1)[:, -7:]
+        integrated = 20 * np.log10(top + np.float32(1e-10))
+        # Invert sign - doppler values record negative
+        return -np.mean(integrated, axis=1, dtype=np.float64)
+
+    # Fused float64 kernel with preallocated buffers, matches frame_to_scalar
+    return doppler_kernel.scalars(frames)
+
+
+def check_fft_precision(precision=None, num_frames=64):
+    """
+    Compares the scalars of the given precision (defaults to FFT_PRECISION) against
+    frame_to_scalar on synthetic 12-bit frames (noise plus a moving target) and returns
+    the largest difference in dB.
+    """
+    rng = np.random.default_rng(0)
+    chirps, samples = np.meshgrid(np.arange(32), np.arange(64), indexing="ij")
+    frames = []
+    for i in range(num_frames):
+        target = 800 * np.cos(2 * np.pi * (0.11 * samples + 0.05 * i * chirps / 32))
+        noise = rng.normal(0, 40 + 10 * i, size=(32, 64))
+        frames.append(np.clip(2048 + target + noise, 0, 4095).astype(np.uint16))
+    frames = np.stack(frames)
+
+    reference = np.array([frame_to_scalar(frame) for frame in frames])
+    return float(np.max(np.abs(frames_to_scalars(frames, precision) - reference)))
+
+
+def active_devices(r):
+    """
+    Returns the IDs of every device that sent a frame within DEVICE_TIMEOUT seconds,
+    except IDs too long for a ScalarRing record, which are skipped with a warning.
+    """
+    device_ids = r.zrangebyscore(DEVICE_INDEX, time.time() - DEVICE_TIMEOUT, "+inf")
+    active = []
+    for device_id in device_ids:
+        device_id = device_id.decode() if isinstance(device_id, bytes) else device_id
+        if len(device_id.encode()) > MAX_DEVICE_ID_BYTES:
+            logger.warning(
+                f"Ignoring device '{device_id[:32]}...', its ID is longer than {MAX_DEVICE_ID_BYTES} bytes."
+            )
+            continue
+        active.append(device_id)
+    return active
+
+
+def owned_devices(device_ids, worker, num_workers):
+    """
+    Returns the devices frame worker `worker` of `num_workers` serves. Each device has
+    exactly one worker, picked by a stable hash of its ID, so its range gate and phase
+    tracking live in one process and its frames reach the signal stage in order.
+    """
+    return [
+        device_id
+        for device_id in device_ids
+        if zlib.crc32(device_id.encode()) % num_workers == worker
+    ]
+
+
+def leased_devices(r, device_ids, consumer):
+    """
+    Returns the devices whose stream lease `consumer` holds, out of device_ids (every
+    active device), after renewing its leases and taking free ones.
+
+    Every consumer holds at most its share of the devices, ceil(devices / live consumers),
+    so a replica that starts up gets devices too: consumers over their share release the
+    extra leases and the newcomer takes them on its next refresh.
+    """
+    now = time.time()
+    keys = [f"{STREAM_LEASE_PREFIX}:{device_id}" for device_id in device_ids]
+    pipe = r.pipeline(transaction=False)
+    # Consumers that refreshed within a lease period are alive
+    pipe.zadd(STREAM_CONSUMERS, {consumer: now})
+    pipe.zremrangebyscore(STREAM_CONSUMERS, "-inf", now - STREAM_LEASE_MS / 1000)
+    pipe.zcard(STREAM_CONSUMERS)
+    for key in keys:
+        pipe.get(key)
+    num_consumers, *owners = pipe.execute()[2:]
+    if not device_ids:
+        return []
+
+    share = math.ceil(len(device_ids) / num_consumers)
+    held = [i for i, owner in enumerate(owners) if owner == consumer.encode()]
+    free = [i for i, owner in enumerate(owners) if owner is None]
+    keep = held[:share]
+    take = free[: share - len(keep)]
+
+    pipe = r.pipeline(transaction=False)
+    for i in keep:
+        pipe.pexpire(keys[i], STREAM_LEASE_MS)
+    for i in held[share:]:
+        pipe.delete(keys[i])
+    for i in take:
+        pipe.set(keys[i], consumer, nx=True, px=STREAM_LEASE_MS)
+    taken = pipe.execute()[len(held) :]
+    return [
+        device_ids[i] for i in sorted(keep + [i for i, ok in zip(take, taken) if ok])
+    ]
+
+
+def release_leases(r, device_ids, consumer):
+    """Gives up the stream leases `consumer` holds, so other replicas take over at once."""
+    r.zrem(STREAM_CONSUMERS, consumer)
+    for device_id in device_ids:
+        key = f"{STREAM_LEASE_PREFIX}:{device_id}"
+        if r.get(key) == consumer.encode():
+            r.delete(key)
+
+
+def vitals_modes(r, device_ids):
+    """Returns {device_id: vitals mode} from the VITALS_MODE_KEY hash, VITALS_MODE if unset."""
+    if not device_ids:
+        return {}
+    modes = {}
+    for device_id, mode in zip(device_ids, r.hmget(VITALS_MODE_KEY, device_ids)):
+        mode = mode.decode() if isinstance(mode, bytes) else mode
+        if mode is not None and mode not in VITALS_MODES:
+            logger.warning(f"Unknown vitals mode '{mode}' for '{device_id}'.")
+            mode = None
+        modes[device_id] = mode or VITALS_MODE
+    return modes
+
+
+# Input Raw Data Frames (N, 32, 64) -> Output slow-time samples (N,), by vitals mode
+def frames_to_signal(device_ids, frames, modes):
+    """
+    Reduces every frame to the slow-time sample of its device's vitals mode, one batched
+    pass per mode.
+
+    returns: (samples, gates), a (N,) float64 array and the N subject range bins (None
+    where the whole Doppler map was integrated)
+    """
+    samples = np.empty(len(frames))
+    gates = [None] * len(frames)
+    for mode in VITALS_MODES:
+        rows = [i for i, frame_mode in enumerate(modes) if frame_mode == mode]
+        if not rows:
+            continue
+        mode_device_ids = [device_ids[i] for i in rows]
+        mode_frames = frames if len(rows) == len(frames) else frames[rows]
+
+        if mode == "phase":
+            values, mode_gates = range_gate.phases(mode_device_ids, mode_frames)
+        elif RANGE_GATE_BINS > 0:
+            values, mode_gates = range_gate.scalars(mode_device_ids, mode_frames)
+        else:
+            values, mode_gates = frames_to_scalars(mode_frames), None
+
+        samples[rows] = values
+        if mode_gates is not None:
+            for i, gate in zip(rows, mode_gates.tolist()):
+                gates[i] = gate
+    return samples, gates
+
+
+def handle_frames(messages, raw_signal_queue, metrics, device_modes=None):
+    """
+    Decodes a batch of (device_id, msg) raw frames, reduces them to scalars in one
+    vectorized pass and hands them to the signal processor in order.
+
+    device_modes: {device_id: vitals mode}, devices not in it use VITALS_MODE
+    """
+    device_ids = []
+    timestamps = []
+    frames = []
+    total_length = 0
+    for device_id, msg in messages:
+        try:
+            # Zero-copy (32, 64) view for binary frames, legacy JSON frames are still accepted
+            timestamp, frame = decode_message(msg)
+        except ValueError as e:
+            logger.warning(f"Malformed frame: {e}. Skipping this frame.")
+            continue
+        device_ids.append(device_id)
+        timestamps.append(timestamp)
+        frames.append(frame)
+        total_length += len(msg)
+
+    if not frames:
+        return
+
+    device_modes = device_modes or {}
+    modes = [device_modes.get(device_id, VITALS_MODE) for device_id in device_ids]
+    scalars, gates = frames_to_signal(device_ids, np.stack(frames), modes)
+
+    for device_id, timestamp, data, gate, mode in zip(
+        device_ids, timestamps, scalars.tolist(), gates, modes
+    ):
+        # Send data to the processing thread. The ring buffer is bounded, if the signal
+        # stage stalls this raises queue.Full instead of blocking the frame stage forever.
+        raw_signal_queue.put(
+            {
+                "device": device_id,
+                "data": data,
+                "timestamp": timestamp,
+                "range_gate": gate,
+                "mode": mode,
+            },
+            timeout=5,
+        )
+
+    previous_count = metrics.get("process_data_count")
+    metrics.add("process_data_count", len(frames))
+    metrics.add("process_data_length", total_length)
+
+    # Periodically sample the data for the logger every 15 frames
+    if (
+        previous_count == 0
+        or previous_count // 15 != (previous_count + len(frames)) // 15
+    ):
+        metrics.set_sample("ingested_frame", f"{float(np.max(frames[-1])):.2f}")
+        metrics.set_sample("processed_scalar", f"{float(scalars[-1]):.2f}")
+        if gates[-1] is not None:
+            metrics.set_sample("range_gate", f"{device_ids[-1]} -> bin {gates[-1]}")
+
+
 def frame_processor(
     redis_host,
     redis_port,
     raw_signal_queue,
     shutdown_flag,
-    log_lock,
-    shared_state,
+    metrics,
+    worker=0,
+    num_workers=1,
 ):
-    """Main function to connect to Redis and process incoming data."""
+    """
+    Main function to connect to Redis and process incoming data. With several frame
+    workers, each one serves its share of the devices (see owned_devices).
+    """
     try:
-        r = redis.Redis(host=redis_host, port=redis_port, decode_responses=True)
+        # Raw frames are binary (see common/frame_codec.py), so responses must stay as bytes
+        r = redis.Redis(host=redis_host, port=redis_port, decode_responses=False)
     except redis.ConnectionError as e:
         logger.critical(f"Could not connect to Redis on startup: {e}")
         exit(1)
 
+    raw_keys = []
+    device_modes = {}
+    last_refresh_time = 0
+
     while not shutdown_flag.is_set():
         try:
-            # Use a small timeout instead of 0 (infinite) so the loop can check the
-            # shutdown_flag periodically if no data is coming in.
-            redis_result = r.blpop("raw_sensor_data", timeout=2)
+            # Periodically pick up new devices and drop ones that went quiet
+            if time.time() - last_refresh_time > DEVICE_REFRESH_INTERVAL:
+                device_ids = owned_devices(active_devices(r), worker, num_workers)
+                raw_keys = [
+                    f"{RAW_QUEUE_PREFIX}:{device_id}" for device_id in device_ids
+                ]
+                device_modes = vitals_modes(r, device_ids)
+                range_gate.retain(device_ids)
+                last_refresh_time = time.time()
+
+            if not raw_keys:
+                shutdown_flag.wait(timeout=1)
+                continue  # No devices yet, loop back and check shutdown_flag
+
+            # Pop up to FRAME_BATCH_SIZE frames from the first non-empty device list in one
+            # round trip. Use a small timeout instead of 0 (infinite) so the loop can check
+            # the shutdown_flag periodically if no data is coming in.
+            # The ingestor LPUSHes, so the oldest frames are popped from the right (FIFO).
+            redis_result = r.blmpop(
+                2, len(raw_keys), *raw_keys, direction="RIGHT", count=FRAME_BATCH_SIZE
+            )
             if not redis_result:
                 continue  # Timeout hit, loop back and check shutdown_flag
-            queue_name, msg = redis_result
-            msg_dict = json.loads(msg)
-            frame = np.array(msg_dict.get("data", [])).reshape(
-                32, 64
-            )  # Reshape to 2D if needed
-            if frame.shape != (32, 64):
-                logger.warning(
-                    f"Unexpected frame shape: {frame.shape}. Expected (32, 64). Skipping this frame."
+            queue_name, msgs = redis_result
+            queue_name = queue_name.decode()
+            device_id = queue_name.split(":", 1)[1]
+
+            # BLMPOP serves keys in order, rotate the served device to the back so a
+            # busy device can't starve the others
+            raw_keys.remove(queue_name)
+            raw_keys.append(queue_name)
+
+            handle_frames(
+                [(device_id, msg) for msg in msgs],
+                raw_signal_queue,
+                metrics,
+                device_modes,
+            )
+
+        except redis.ConnectionError as e:
+            logger.error(f"Redis connection error: {e}")
+            time.sleep(2)  # Back off and let Redis recover
+        except Exception as e:
+            logger.error(f"Error processing message: {e}", exc_info=True)
+            time.sleep(1)
+
+
+def stream_frame_processor(
+    redis_host,
+    redis_port,
+    raw_signal_queue,
+    shutdown_flag,
+    metrics,
+    worker=0,
+    num_workers=1,
+):
+    """
+    Same as frame_processor, but reads per-device Redis Streams through the STREAM_GROUP
+    consumer group. Entries are acknowledged once their scalar has been handed to the
+    signal processor, so frames held by a crashed replica are claimed and replayed.
+
+    Devices are split between the frame workers of every replica by stream leases (see
+    leased_devices) rather than by worker and num_workers, so one device's frames are
+    never split between processes.
+    """
+    try:
+        # Raw frames are binary (see common/frame_codec.py), so responses must stay as bytes
+        r = redis.Redis(host=redis_host, port=redis_port, decode_responses=False)
+    except redis.ConnectionError as e:
+        logger.critical(f"Could not connect to Redis on startup: {e}")
+        exit(1)
+
+    # Unique per worker process of every replica, so pending entries and stream leases
+    # can be traced back to their owner
+    consumer = f"{socket.gethostname()}-{os.getpid()}"
+    streams = {}  # stream key -> device_id
+    device_modes = {}
+    last_refresh_time = 0
+    last_claim_time = time.time()
+
+    while not shutdown_flag.is_set():
+        try:
+            # Periodically pick up new devices and drop ones that went quiet
+            if time.time() - last_refresh_time > DEVICE_REFRESH_INTERVAL:
+                # Leases split the devices between the workers of every replica
+                device_ids = leased_devices(r, active_devices(r), consumer)
+                released = set(streams.values()) - set(device_ids)
+                if released:
+                    logger.info(f"No longer reading the streams of {released}")
+                streams = {
+                    f"{RAW_STREAM_PREFIX}:{device_id}": device_id
+                    for device_id in device_ids
+                }
+                device_modes = vitals_modes(r, list(streams.values()))
+                range_gate.retain(streams.values())
+                for stream_key in streams:
+                    try:
+                        r.xgroup_create(stream_key, STREAM_GROUP, id="0", mkstream=True)
+                    except redis.ResponseError as e:
+                        if "BUSYGROUP" not in str(e):
+                            raise  # Group already existing is expected
+                last_refresh_time = time.time()
+
+            if not streams:
+                shutdown_flag.wait(timeout=1)
+                continue  # No devices yet, loop back and check shutdown_flag
+
+            entries = []
+
+            # Take over entries another consumer read but never acknowledged
+            if time.time() - last_claim_time > STREAM_CLAIM_INTERVAL:
+                for stream_key in streams:
+                    claimed = r.xautoclaim(
+                        stream_key,
+                        STREAM_GROUP,
+                        consumer,
+                        min_idle_time=STREAM_CLAIM_IDLE_MS,
+                        start_id="0-0",
+                        count=STREAM_READ_COUNT,
+                    )[1]
+                    if claimed:
+                        logger.warning(
+                            f"Claimed {len(claimed)} stuck entries from '{stream_key}'."
+                        )
+                    entries.extend((stream_key, entry) for entry in claimed)
+                last_claim_time = time.time()
+
+            # Batched read across every device stream, blocking for at most 2 seconds
+            # so the loop can check the shutdown_flag periodically
+            if not entries:
+                result = r.xreadgroup(
+                    STREAM_GROUP,
+                    consumer,
+                    {stream_key: ">" for stream_key in streams},
+                    count=STREAM_READ_COUNT,
+                    block=2000,
                 )
-                continue
-            data = frame_to_scalar(frame)
-            raw_signal_queue.put(
-                {"data": data, "timestamp": msg_dict.get("timestamp")}
-            )  # Send data to the processing thread
-
-            with log_lock:
-                shared_state["process_data_count"] += 1
-                shared_state["process_data_length"] += len(msg.encode("utf-8"))
-
-                # Periodically sample the data for the logger every 15 frames
-                if (
-                    shared_state["process_data_count"] == 1
-                    or shared_state["process_data_count"] % 15 == 0
-                ):
-                    shared_state["ingested_frame"] = f"{float(np.max(frame)):.2f}"
-                    shared_state["processed_scalar"] = f"{float(data):.2f}"
+                for stream_key, stream_entries in result or []:
+                    stream_key = stream_key.decode()
+                    entries.extend((stream_key, entry) for entry in stream_entries)
+
+            messages = []
+            acks = {}
+            for stream_key, (entry_id, fields) in entries:
+                # Trimmed entries come back from a claim without fields
+                if fields:
+                    messages.append(
+                        (
+                            streams.get(stream_key, stream_key.split(":", 1)[1]),
+                            fields[b"frame"],
+                        )
+                    )
+                acks.setdefault(stream_key, []).append(entry_id)
+
+            # The whole read is reduced to scalars in one batched FFT
+            handle_frames(messages, raw_signal_queue, metrics, device_modes)
+
+            if acks:
+                pipe = r.pipeline()
+                for stream_key, entry_ids in acks.items():
+                    pipe.xack(stream_key, STREAM_GROUP, *entry_ids)
+                pipe.execute()
 
         except redis.ConnectionError as e:
             logger.error(f"Redis connection error: {e}")
@@ -174,14 +672,123 @@ def frame_processor(
             logger.error(f"Error processing message: {e}", exc_info=True)
             time.sleep(1)
 
+    # Let other replicas take the devices over without waiting for the leases to lapse
+    try:
+        release_leases(r, list(streams.values()), consumer)
+    except redis.ConnectionError as e:
+        logger.warning(f"Could not release stream leases: {e}")
+
+
+def new_device_state(window_size):
+    """Per-device slow-time samples and the values needed for continuity between exports."""
+    return {
+        # Samples (and their timestamps) not yet pushed through the device's filters,
+        # which are kept in the BatchSignalProcessor. Plain lists: each hop hands them to
+        # push_vitals whole and starts new ones, nothing slides over them.
+        "new_samples": [],
+        "new_timestamps": [],
+        # The latest window_size filtered samples, exported whole with every estimate
+        "filtered_heart": RingBuffer(window_size),
+        "filtered_breath": RingBuffer(window_size),
+        "valid_samples": 0,  # Trackers for cold start and inactivity flush
+        "mode": None,  # Vitals mode of the buffered samples
+        "last_frame_time": time.time(),
+        "previous_export": {
+            "heart_rate": 0,
+            "breathing_rate": 0,
+        },  # To hold previous values for continuity
+    }
+
+
+def flush_device(processor, device_id, state):
+    """Drops a device's buffered and filtered signal, its next export starts a new window."""
+    state["new_samples"] = []
+    state["new_timestamps"] = []
+    state["filtered_heart"].clear()
+    state["filtered_breath"].clear()
+    processor.reset(device_id)
+    state["valid_samples"] = 0
+
+
+def push_vitals(r, processor, device_states, due, metrics):
+    """
+    Estimates and pushes the vitals of every device in `due` with as few
+    BatchSignalProcessor calls as possible, then clears `due`.
+
+    due: {device_id: {"samples", "timestamps": new samples of the hop, "data": its last
+    grid sample, "mode": their vitals mode}}
+
+    Devices with the same number of new samples share a call: all the hopping devices in
+    one, and devices exporting their first window in another.
+    """
+    groups = {}
+    for device_id, hop in due.items():
+        groups.setdefault(len(hop["samples"]), []).append(device_id)
+
+    for device_ids in groups.values():
+        states = [device_states[device_id] for device_id in device_ids]
+        hops = [due[device_id] for device_id in device_ids]
+        # Only the new samples are filtered, the filter state carries over, so a short
+        # hop costs its own samples rather than a whole window
+        result = processor.process(
+            device_ids,
+            [hop["samples"] for hop in hops],
+            [state["previous_export"]["heart_rate"] for state in states],
+            [state["previous_export"]["breathing_rate"] for state in states],
+            timestamps=[hop["timestamps"] for hop in hops],
+        )
+
+        for i, (device_id, state, hop) in enumerate(zip(device_ids, states, hops)):
+            data = hop["data"]
+            state["filtered_heart"].extend(result["filtered_heart"][i])
+            state["filtered_breath"].extend(result["filtered_breath"][i])
+            export = {
+                "timestamp": data["timestamp"],
+                # Subject range bin the samples came from (None = whole Doppler map)
+                "range_gate": data.get("range_gate"),
+                # Vitals mode of the slow-time signal ("doppler" or "phase")
+                "mode": hop["mode"],
+                "heart_rate": int(result["heart_rate_bpm"][i]),
+                "breathing_rate": int(result["breathing_rate"][i]),
+                # Sample timestamps of the beats and breaths detected since the
+                # previous export, each one is reported exactly once
+                "heart_beats": result["heart_beats"][i],
+                "breaths": result["breaths"][i],
+                # Rates at the spectral peak of the window, 0 when the peak is weak
+                "heart_rate_fft": float(result["heart_rate_fft"][i]),
+                "breathing_rate_fft": float(result["breathing_rate_fft"][i]),
+                # The whole filtered window the rates were estimated over (the dashboard
+                # plots the latest one as the last VITALS_WINDOW seconds)
+                "filtered_heart": state["filtered_heart"].window().tolist(),
+                "filtered_breath": state["filtered_breath"].window().tolist(),
+            }
+            state["previous_export"] = (
+                export  # Update previous values for the next iteration
+            )
+            r.lpush(
+                f"{PROCESSED_QUEUE_PREFIX}:{device_id}", json.dumps(export)
+            )  # Push the processed result back to Redis
+
+            metrics.add("processed_data_pushed_count")
+            metrics.set_sample(
+                "pushed_output",
+                f"{device_id} -> HR: {export['heart_rate']:.1f} "
+                f"| BR: {export['breathing_rate']:.1f}",
+            )
+
+            logger.debug(
+                f"Pushed processed data to Redis '{PROCESSED_QUEUE_PREFIX}:{device_id}': {export}"
+            )
+    due.clear()
+
 
 def signal_processor(
     redis_host,
     redis_port,
     raw_signal_queue,
     shutdown_flag,
-    log_lock,
-    shared_state,
+    metrics,
+    pipeline=None,
 ):
     """Consumes processed signal data from the queue, does further processing if needed, and then pushes results back to Redis."""
     # Connect to Redis
@@ -191,21 +798,27 @@ def signal_processor(
         logger.critical(f"Could not connect to Redis on startup: {e}")
         exit(1)
 
-    processor = SignalProcessor(sample_rate=15)
+    # 20 seconds of data at 15 fps = 300 values by default
+    buffer_size = round(VITALS_WINDOW * 15)
+    # New samples between estimates, 1 second = 15 by default
+    hop_size = max(round(VITALS_HOP * 15), 1)
 
-    # 20 seconds of data at 15 fps = 300 values
-    buffer_size = 300
-    raw_signal_np = np.zeros(buffer_size)
+    # Filter state of every device, the estimates due are made together in batches
+    processor = BatchSignalProcessor(
+        sample_rate=15, window_size=buffer_size, pipeline=pipeline
+    )
+    due = {}
 
-    # Trackers for cold start and inactivity flush
-    valid_samples = 0
-    samples_since_last_process = 0
-    last_frame_time = time.time()
+    # Slow-time buffers and export continuity are kept separately for every device
+    device_states = {}
+    last_inactivity_check = time.time()
 
-    previous_export = {
-        "heart_rate": 0,
-        "breathing_rate": 0,
-    }  # To hold previous values for continuity
+    # Puts scalars in firmware timestamp order and onto a uniform 15 Hz grid per device
+    jitter_buffer = JitterBuffer(
+        frame_rate=15, delay=JITTER_DELAY, max_gap=JITTER_MAX_GAP
+    )
+    reported_late_frames = 0
+    reported_missing_frames = 0
 
     logger.info("Signal processor started. Waiting for raw signal queue items...")
 
@@ -213,95 +826,144 @@ def signal_processor(
     while not shutdown_flag.is_set():
         try:
             data = raw_signal_queue.get(timeout=1)  # Wait for data with timeout
+            jitter_buffer.push(data)
+        except queue.Empty:
+            # Note: Removed time.sleep(1) here because queue.get(timeout=1) already provides a 1-second delay
+            pass  # No data, fall through to the release and inactivity checks
+
+        # Grid samples leave the jitter buffer in timestamp order per device
+        for data in jitter_buffer.pop_ready():
+            device_id = data["device"]
+
+            if device_id not in device_states:
+                logger.info(f"Tracking new device '{device_id}'.")
+                device_states[device_id] = new_device_state(buffer_size)
+            state = device_states[device_id]
 
             # Update activity timer
-            last_frame_time = time.time()
+            state["last_frame_time"] = time.time()
+
+            # Doppler scalars and phases don't mix, a device switching modes starts over
+            mode = data.get("mode", "doppler")
+            if mode != state["mode"]:
+                if state["mode"] is not None:
+                    logger.info(
+                        f"Device '{device_id}' switched to {mode} mode. Flushing signal buffer."
+                    )
+                    if device_id in due:
+                        # The estimate due was for the old mode's samples
+                        push_vitals(r, processor, device_states, due, metrics)
+                    flush_device(processor, device_id, state)
+                state["mode"] = mode
 
-            with log_lock:
-                shared_state["frames_processed_count"] += 1
+            metrics.add("frames_processed_count")
 
-            # Manually shift the raw_signal_np and append the new data to the end
-            raw_signal_np[:-1] = raw_signal_np[1:]  # Shift left by one
-            raw_signal_np[-1] = data["data"]  # Append new data at the end
+            # Held until the next export pushes them through the device's filters
+            state["new_samples"].append(data["data"])
+            state["new_timestamps"].append(data["timestamp"])
 
             # Increment our valid sample counter (cap it at the buffer size)
-            if valid_samples < buffer_size:
-                valid_samples += 1
-
-            # Only process and push to Redis if we have a fully saturated buffer
-            # Then reset the buffer to 10 seconds of data (150 samples) to create a sliding window effect, and keep the last 150 samples for continuity
-            if valid_samples >= buffer_size:
-                result = processor.process_signal_pipeline(
-                    raw_signal_np,
-                    prev_heart_val=previous_export["heart_rate"],
-                    prev_breath_val=previous_export["breathing_rate"],
-                )
-                export = {
-                    "timestamp": data["timestamp"],
-                    "heart_rate": (
-                        result["heart_rate_bpm"][0][1]
-                        if result["heart_rate_bpm"]
-                        else previous_export["heart_rate"]
-                    ),
-                    "breathing_rate": (
-                        result["breathing_rate"][0][1]
-                        if result["breathing_rate"]
-                        else previous_export["breathing_rate"]
-                    ),
-                    # Ensure we export the last valid point of the filtered arrays (flattened scalar for that frame)
-                    "filtered_heart": (
-                        list(result["filtered_heart"])
-                        if result["filtered_heart"] is not None
-                        and len(result["filtered_heart"]) > 0
-                        else 0
-                    ),
-                    "filtered_breath": (
-                        list(result["filtered_breath"])
-                        if result["filtered_breath"] is not None
-                        and len(result["filtered_breath"]) > 0
-                        else 0
-                    ),
-                }
-                previous_export = (
-                    export  # Update previous values for the next iteration
-                )
-                r.lpush(
-                    "processed_data", json.dumps(export)
-                )  # Push the processed result back to Redis
-
-                with log_lock:
-                    shared_state["processed_data_pushed_count"] += 1
-                    shared_state["pushed_output"] = (
-                        f"HR: {export['heart_rate']:.1f} "
-                        f"| BR: {export['breathing_rate']:.1f}"
-                    )
+            if state["valid_samples"] < buffer_size:
+                state["valid_samples"] += 1
 
-                logger.debug(
-                    f"Pushed processed data to Redis 'processed_data': {export}"
-                )
-                valid_samples = 0  # Reset to 10 seconds of data (150 samples) for sliding window effect
+            # Only process and push to Redis if we have a fully saturated buffer, then
+            # every hop_size samples over the window sliding along with them
+            if state["valid_samples"] >= buffer_size:
+                if device_id in due:
+                    # A burst brought the device's next hop before its previous
+                    # estimate was made, its filters have to take them in order
+                    push_vitals(r, processor, device_states, due, metrics)
+                due[device_id] = {
+                    "samples": state["new_samples"],
+                    "timestamps": state["new_timestamps"],
+                    "data": data,
+                    "mode": mode,
+                }
+                state["new_samples"] = []
+                state["new_timestamps"] = []
+                # The next estimate is due once hop_size more samples have arrived
+                state["valid_samples"] = buffer_size - hop_size
             else:
                 # Optional: Log the cold start progress
                 logger.debug(
-                    f"Buffering raw signal data... ({valid_samples}/{buffer_size})"
+                    f"Buffering raw signal data for '{device_id}'... ({state['valid_samples']}/{buffer_size})"
                 )
 
-        except queue.Empty:
-            # If the queue is empty, check if we've been inactive for more than 5 seconds
-            # The 'valid_samples > 0' check ensures we only flush once per inactive period
-            if valid_samples > 0 and (time.time() - last_frame_time) > 5.0:
-                logger.info("No data received for 5 seconds. Flushing signal buffer.")
-                raw_signal_np = np.zeros(buffer_size)
-                valid_samples = 0
+        # Every estimate that fell due in this pass, in one batch per hop length
+        if due:
+            push_vitals(r, processor, device_states, due, metrics)
 
-            # Note: Removed time.sleep(1) here because queue.get(timeout=1) already provides a 1-second delay
-            continue  # No data, loop back and check shutdown_flag
+        # Other devices may keep the queue busy, so inactivity is checked on a timer
+        # rather than only when the queue runs empty
+        if time.time() - last_inactivity_check > 1.0:
+            last_inactivity_check = time.time()
+            for device_id, state in list(device_states.items()):
+                idle_time = time.time() - state["last_frame_time"]
+                # The 'valid_samples > 0' check ensures we only flush once per inactive period
+                if state["valid_samples"] > 0 and idle_time > 5.0:
+                    logger.info(
+                        f"No data received from '{device_id}' for 5 seconds. Flushing signal buffer."
+                    )
+                    flush_device(processor, device_id, state)
+                # Forget devices that have left the fleet
+                if idle_time > DEVICE_TIMEOUT:
+                    del device_states[device_id]
+                    jitter_buffer.forget(device_id)
+            processor.retain(device_states)
+
+            metrics.add(
+                "late_frame_count", jitter_buffer.late_frames - reported_late_frames
+            )
+            metrics.add(
+                "missing_frame_count",
+                jitter_buffer.missing_frames - reported_missing_frames,
+            )
+            reported_late_frames = jitter_buffer.late_frames
+            reported_missing_frames = jitter_buffer.missing_frames
 
 
 # 4. The Producer (Main Thread) listening to Redis
 if __name__ == "__main__":
     redis_host = os.environ.get("REDIS_HOST", "127.0.0.1")
     redis_port = 6379
+    # Frame worker processes pulling raw frames from Redis in parallel (one FFT core each)
+    frame_workers = int(os.environ.get("FRAME_WORKERS", 1))
+
+    if FFT_PRECISION not in ("float64", "float32"):
+        logger.critical(f"Unsupported FFT_PRECISION '{FFT_PRECISION}'")
+        exit(1)
+    if VITALS_MODE not in VITALS_MODES:
+        logger.critical(f"Unsupported VITALS_MODE '{VITALS_MODE}'")
+        exit(1)
+    if not 0 < VITALS_HOP <= VITALS_WINDOW:
+        logger.critical(
+            f"VITALS_HOP ({VITALS_HOP}s) must be positive and at most VITALS_WINDOW ({VITALS_WINDOW}s)"
+        )
+        exit(1)
+    if SIGNAL_QUEUE not in ("ring", "queue"):
+        logger.critical(f"Unsupported SIGNAL_QUEUE '{SIGNAL_QUEUE}'")
+        exit(1)
+    try:
+        pipeline = load_pipeline(PIPELINE_CONFIG)
+        compile_pipeline(pipeline, sample_rate=15)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.critical(f"Invalid PIPELINE_CONFIG '{PIPELINE_CONFIG}': {e}")
+        exit(1)
+    if FFT_PRECISION == "float32" and RANGE_GATE_BINS > 0:
+        logger.warning(
+            "FFT_PRECISION=float32 only applies to whole map scalars, the range gated "
+            f"integration (RANGE_GATE_BINS={RANGE_GATE_BINS}) runs in float64."
+        )
+    if FFT_PRECISION == "float32":
+        # Make sure the single precision path still agrees with the float64 reference
+        max_error = check_fft_precision()
+        if max_error > FFT_FLOAT32_TOLERANCE:
+            logger.critical(
+                f"float32 FFT scalars are off by {max_error:.2e} dB "
+                f"(tolerance {FFT_FLOAT32_TOLERANCE:.0e}). Use FFT_PRECISION=float64."
+            )
+            exit(1)
+        logger.info(f"Using float32 FFT path (max error {max_error:.2e} dB).")
 
     # Best practice: Add a health check on startup to ensure Redis is actually there
     print(f"Connecting to Redis on {redis_host}:{redis_port}...")
@@ -316,52 +978,52 @@ if __name__ == "__main__":
     print("Listening for incoming tasks...")
 
     shutdown_flag = multiprocessing.Event()
-    log_lock = multiprocessing.Lock()
-
-    # Use a multiprocessing dict to share ALL state across processes
-    manager = multiprocessing.Manager()
-    shared_state = manager.dict()
 
-    # Initialize metrics
-    shared_state["process_data_count"] = 0
-    shared_state["process_data_length"] = 0
-    shared_state["frames_processed_count"] = 0
-    shared_state["processed_data_pushed_count"] = 0
-
-    # Initialize samples
-    shared_state["ingested_frame"] = "None"
-    shared_state["processed_scalar"] = "None"
-    shared_state["pushed_output"] = "None"
+    # Metrics live in shared memory, one slot per writer process (frame workers, signal)
+    metrics = SharedMetrics(num_slots=frame_workers + 1)
 
     # Implement a queue for handling data between threads
-    raw_signal_queue = multiprocessing.Queue()
+    if SIGNAL_QUEUE == "ring":
+        raw_signal_queue = ScalarRing(
+            capacity=SIGNAL_RING_SIZE, multi_producer=frame_workers > 1
+        )
+    else:
+        raw_signal_queue = multiprocessing.Queue()
 
     # FIX: Daemon thread is safer here, but we will still cleanly shut it down
     monitor_thread = multiprocessing.Process(
         target=logging_monitor,
         args=(
             shutdown_flag,
-            log_lock,
-            shared_state,
+            metrics,
         ),
         daemon=True,
     )
     monitor_thread.start()
 
-    # Thread for processing all the data from Redis.
-    # Must give it the redis connection.
-    frame_thread = multiprocessing.Process(
-        target=frame_processor,
-        args=(
-            redis_host,
-            redis_port,
-            raw_signal_queue,
-            shutdown_flag,
-            log_lock,
-            shared_state,
-        ),
-    )
-    frame_thread.start()
+    # Processes for processing all the data from Redis, each one pops the batches of its
+    # own share of the devices.
+    # Must give them the redis connection.
+    frame_threads = []
+    for worker in range(frame_workers):
+        frame_thread = multiprocessing.Process(
+            target=(
+                stream_frame_processor
+                if FRAME_TRANSPORT == "stream"
+                else frame_processor
+            ),
+            args=(
+                redis_host,
+                redis_port,
+                raw_signal_queue,
+                shutdown_flag,
+                metrics.slot(worker),
+                worker,
+                frame_workers,
+            ),
+        )
+        frame_thread.start()
+        frame_threads.append(frame_thread)
 
     # Thread for processing the raw signal
     signal_thread = multiprocessing.Process(
@@ -371,8 +1033,8 @@ if __name__ == "__main__":
             redis_port,
             raw_signal_queue,
             shutdown_flag,
-            log_lock,
-            shared_state,
+            metrics.slot(frame_workers),
+            pipeline,
         ),
         daemon=True,
     )
@@ -390,6 +1052,12 @@ if __name__ == "__main__":
     finally:
         logger.info("Waiting for workers to finish current tasks...")
         monitor_thread.join(timeout=2)
-        frame_thread.join(timeout=3)
+        for frame_thread in frame_threads:
+            frame_thread.join(timeout=3)
         signal_thread.join(timeout=3)
+        metrics.close()
+        metrics.unlink()
+        if SIGNAL_QUEUE == "ring":
+            raw_signal_queue.close()
+            raw_signal_queue.unlink()
         logger.info("Processor shut down complete.")
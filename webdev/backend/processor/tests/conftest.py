@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The processor runs from its own directory and imports its modules as helpers.X, the modules
+# shared between services live one directory up as common.X
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVICE_DIR)
+sys.path.append(os.path.dirname(SERVICE_DIR))
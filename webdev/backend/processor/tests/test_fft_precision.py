@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+import processor
+
+
+def random_frames(low, high, num_frames=32):
+    rng = np.random.default_rng(1)
+    return rng.integers(low, high, size=(num_frames, 32, 64)).astype(np.uint16)
+
+
+@pytest.mark.parametrize(
+    "frames",
+    [
+        random_frames(0, 4096),  # Full scale noise
+        random_frames(2040, 2056),  # Quiet frames, scalars far below the noisy ones
+        np.full((4, 32, 64), 2048, dtype=np.uint16),  # Flat, every bin at the floor
+    ],
+    ids=["full-scale", "quiet", "flat"],
+)
+@pytest.mark.parametrize("precision", ["float64", "float32"])
+def test_batched_scalars_match_frame_to_scalar(frames, precision):
+    reference = np.array([processor.frame_to_scalar(frame) for frame in frames])
+    scalars = processor.frames_to_scalars(frames, precision)
+    assert np.max(np.abs(scalars - reference)) <= processor.FFT_FLOAT32_TOLERANCE
+
+
+def test_startup_check_passes_for_float32():
+    assert processor.check_fft_precision("float32") <= processor.FFT_FLOAT32_TOLERANCE
@@ -0,0 +1,81 @@
+import json
+import queue
+import zlib
+
+import numpy as np
+import pytest
+
+import processor
+from common.frame_codec import (
+    ENCODING_DELTA12_ZLIB,
+    HEADER,
+    NUM_ELEMENTS,
+    TIMESTAMP,
+    decode_message,
+    encode_frame,
+    encode_frames,
+    decode_payload_batch,
+)
+
+
+class Metrics:
+    def __init__(self):
+        self.counts = {}
+
+    def get(self, name):
+        return self.counts.get(name, 0)
+
+    def add(self, name, value):
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    def set_sample(self, name, value):
+        pass
+
+
+def payload(timestamp_ms):
+    samples = np.random.default_rng(timestamp_ms).integers(0, 4096, NUM_ELEMENTS)
+    return TIMESTAMP.pack(timestamp_ms) + samples.astype("<u2").tobytes()
+
+
+def zlib_frame(timestamp_ms):
+    payloads = [payload(timestamp_ms)]
+    timestamps, samples = decode_payload_batch(payloads)
+    return encode_frames(payloads, timestamps, samples, ENCODING_DELTA12_ZLIB)[0]
+
+
+def test_compressed_frame_round_trips():
+    raw = payload(1000)
+    timestamp_ms, frame = decode_message(zlib_frame(1000))
+    assert timestamp_ms == 1000
+    assert np.array_equal(frame.reshape(-1), np.frombuffer(raw[8:], dtype="<u2"))
+
+
+@pytest.mark.parametrize(
+    "msg",
+    [
+        encode_frame(payload(1000))[: HEADER.size + 3],  # Cut inside the timestamp
+        encode_frame(payload(1000))[:-1],  # Cut inside the samples
+        zlib_frame(1000)[:-4],  # Truncated zlib stream
+        zlib_frame(1000)[: HEADER.size + TIMESTAMP.size] + b"not zlib",
+        b"not json",
+        json.dumps([1, 2, 3]),
+        json.dumps({"timestamp": 1000, "data": ["x"] * NUM_ELEMENTS}),
+    ],
+)
+def test_malformed_frames_raise_value_error(msg):
+    with pytest.raises(ValueError):
+        decode_message(msg)
+
+
+def test_bad_frame_does_not_drop_the_batch():
+    messages = [
+        ("a", encode_frame(payload(1000))),
+        ("a", zlib_frame(1067)[:-4]),
+        ("a", encode_frame(payload(1133))[:6]),
+        ("a", zlib_frame(1200)),
+    ]
+    signal_queue = queue.Queue()
+    processor.handle_frames(messages, signal_queue, Metrics())
+
+    items = [signal_queue.get_nowait() for _ in range(signal_queue.qsize())]
+    assert [item["timestamp"] for item in items] == [1000, 1200]
@@ -0,0 +1,53 @@
+import math
+
+from helpers.JitterBuffer import JitterBuffer
+
+PERIOD_MS = 1000 / 15
+
+
+def release(buffer, frames):
+    """Pushes (timestamp, value, mode) frames of device "a" and releases them all."""
+    for timestamp, value, mode in frames:
+        buffer.push(
+            {"device": "a", "data": value, "timestamp": timestamp, "mode": mode},
+            now=0,
+        )
+    return buffer.pop_ready(now=buffer.delay)
+
+
+def test_phase_is_unwrapped_within_phase_mode():
+    buffer = JitterBuffer(frame_rate=15, delay=0.5)
+    frames = [(i * PERIOD_MS, phase, "phase") for i, phase in enumerate((3.0, -3.0))]
+    released = release(buffer, frames)
+    # -3.0 is 2 pi - 6 rad after 3.0, the short way round is +0.28 rad
+    assert [item["data"] for item in released] == [3.0, -3.0 + 2 * math.pi]
+
+
+def test_mode_switch_restarts_the_grid():
+    buffer = JitterBuffer(frame_rate=15, delay=0.5)
+    doppler = [(i * PERIOD_MS, -80.0 + i, "doppler") for i in range(5)]
+    # The first phase frame comes after a lost frame, which would otherwise be filled by
+    # interpolating between the last dB scalar and the phase
+    phase = [((6 + i) * PERIOD_MS, 2.5 + 0.1 * i, "phase") for i in range(3)]
+    released = release(buffer, doppler + phase)
+
+    modes = [item["mode"] for item in released]
+    assert modes == ["doppler"] * 5 + ["phase"] * 3
+    values = [item["data"] for item in released]
+    assert values[:5] == [-80.0, -79.0, -78.0, -77.0, -76.0]
+    # Not unwrapped towards -76 dB, nor interpolated from it
+    assert values[5:] == [2.5, 2.6, 2.7]
+    assert released[5]["timestamp"] == round(6 * PERIOD_MS)
+
+
+def test_switch_back_to_doppler():
+    buffer = JitterBuffer(frame_rate=15, delay=0.5)
+    frames = [
+        (0, 1.0, "phase"),
+        (PERIOD_MS, 1.1, "phase"),
+        # One frame lost at the switch
+        (3 * PERIOD_MS, -70.0, "doppler"),
+        (4 * PERIOD_MS, -71.0, "doppler"),
+    ]
+    values = [item["data"] for item in release(buffer, frames)]
+    assert values == [1.0, 1.1, -70.0, -71.0]
@@ -0,0 +1,57 @@
+import time
+
+import pytest
+
+import processor
+
+fakeredis = pytest.importorskip("fakeredis")
+
+DEVICES = ["a", "b", "c", "d"]
+
+
+def owners(r):
+    return {
+        key.decode().split(":", 1)[1]: r.get(key).decode()
+        for key in r.keys(f"{processor.STREAM_LEASE_PREFIX}:*")
+    }
+
+
+def test_devices_are_shared_out_between_consumers():
+    r = fakeredis.FakeRedis()
+
+    # Alone, the first consumer takes every device
+    assert processor.leased_devices(r, DEVICES, "replica-1") == DEVICES
+
+    # A second one gets nothing until the first gives up the devices over its share
+    assert processor.leased_devices(r, DEVICES, "replica-2") == []
+    assert processor.leased_devices(r, DEVICES, "replica-1") == ["a", "b"]
+    assert processor.leased_devices(r, DEVICES, "replica-2") == ["c", "d"]
+
+    # Renewing keeps every device with exactly one owner
+    for _ in range(2):
+        processor.leased_devices(r, DEVICES, "replica-1")
+        processor.leased_devices(r, DEVICES, "replica-2")
+    assert owners(r) == {
+        "a": "replica-1",
+        "b": "replica-1",
+        "c": "replica-2",
+        "d": "replica-2",
+    }
+
+
+def test_lapsed_or_released_lease_is_taken_over(monkeypatch):
+    r = fakeredis.FakeRedis()
+    monkeypatch.setattr(processor, "STREAM_LEASE_MS", 50)
+
+    processor.leased_devices(r, DEVICES, "replica-1")
+    processor.leased_devices(r, DEVICES, "replica-2")
+    processor.leased_devices(r, DEVICES, "replica-1")
+    assert processor.leased_devices(r, DEVICES, "replica-2") == ["c", "d"]
+
+    # A replica shutting down hands its devices over at once
+    processor.release_leases(r, ["c", "d"], "replica-2")
+    assert processor.leased_devices(r, DEVICES, "replica-1") == DEVICES
+
+    # A replica that stops renewing (crashed) loses them once the leases lapse
+    time.sleep(0.1)
+    assert processor.leased_devices(r, DEVICES, "replica-3") == DEVICES